@@ -0,0 +1,160 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Template token standing for any value
+WILDCARD = '<*>'
+
+# Variable parts masked before clustering, in order (earlier masks win)
+MASKS = (
+    (re.compile(r'\b[a-zA-Z][a-zA-Z0-9+.-]*://\S*[^\s.,;:)\]}\'"]'), '<URL>'),
+    (re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'), '<UUID>'),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?'
+                r'|\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?\b'), '<TIME>'),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'), '<IP>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b'), '<HEX>'),
+    (re.compile(r'(?<![\w/])(?:[A-Za-z]:)?(?:[/\\][\w.-]+){2,}[/\\]?'), '<PATH>'),
+)
+
+_DIGIT = re.compile(r'\d')
+
+def error_tokens(message: str) -> List[str]:
+    """
+    Mask an error message's variable parts and split it into tokens.
+
+    URLs, UUIDs, timestamps, IP addresses, hex ids and file paths are
+    replaced by a placeholder naming the kind of value; any remaining
+    token containing a digit (job ids, sizes, durations) becomes WILDCARD.
+
+    Args:
+        message: Raw error message
+
+    Returns:
+        List of tokens
+    """
+    for pattern, placeholder in MASKS:
+        message = pattern.sub(placeholder, message)
+    return [WILDCARD if _DIGIT.search(token) else token for token in message.split()]
+
+class ErrorTemplates:
+    """
+    Error message templates mined at ingest, in the style of Drain.
+
+    Each message is masked (error_tokens) and routed by its token count
+    and first token to a small group of templates in error_templates; it
+    joins the most similar one (the share of positions holding the same
+    token) if at least similarity of its tokens match, turning the
+    positions that differ into WILDCARD, or starts a new template
+    otherwise. Template ids never change once assigned, so generations
+    rows store error_template_id and failures are grouped by an indexed
+    integer instead of the raw text, and messages that only differ in job
+    ids, URLs or timestamps count as one pattern.
+
+    The table is the only state: templates are read and updated inside
+    the ingest transaction, so concurrent writers (threads or processes)
+    share one consistent set.
+    """
+
+    def __init__(self, similarity: float = 0.5):
+        """
+        Args:
+            similarity: Smallest share of matching tokens for a message to
+                join an existing template
+        """
+        self.similarity = similarity
+
+    def create_table(self, cursor):
+        """Create the template table and its routing index."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS error_templates (
+                id INTEGER PRIMARY KEY,
+                token_count INTEGER NOT NULL,
+                first_token TEXT NOT NULL,
+                template TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_error_templates_route '
+                       'ON error_templates (token_count, first_token)')
+
+    def assign(self, cursor, messages: Iterable[Optional[str]]) -> Dict[str, int]:
+        """
+        Template ids of error messages (inside the caller's transaction).
+
+        Args:
+            cursor: Cursor of the open write transaction
+            messages: Error messages (None entries are skipped)
+
+        Returns:
+            Dictionary mapping each message to its template id
+        """
+        ids = {}
+        # Messages differing only in masked values have the same tokens;
+        # their template already covers them, so match each token list once
+        matched = {}
+        for message in messages:
+            if message is None or message in ids:
+                continue
+            tokens = tuple(error_tokens(message))
+            if tokens not in matched:
+                matched[tokens] = self._match(cursor, list(tokens))
+            ids[message] = matched[tokens]
+        return ids
+
+    def _match(self, cursor, tokens: List[str]) -> int:
+        """Id of the template tokens join, updating or creating it."""
+        # Messages starting with a variable part share one routing group
+        first_token = tokens[0] if tokens and tokens[0] != WILDCARD else WILDCARD
+        cursor.execute('SELECT id, template FROM error_templates '
+                       'WHERE token_count = ? AND first_token = ?', (len(tokens), first_token))
+        best = None
+        for template_id, template in cursor.fetchall():
+            parts = template.split(' ') if template else []
+            same = sum(part == token for part, token in zip(parts, tokens))
+            # Most matching tokens first, then the more general template
+            score = (same, parts.count(WILDCARD))
+            if best is None or score > best[0]:
+                best = (score, template_id, parts)
+
+        if best is not None and (not tokens or best[0][0] >= self.similarity * len(tokens)):
+            _, template_id, parts = best
+            merged = [part if part == token else WILDCARD for part, token in zip(parts, tokens)]
+            if merged != parts:
+                cursor.execute('UPDATE error_templates SET template = ? WHERE id = ?',
+                               (' '.join(merged), template_id))
+            return template_id
+
+        cursor.execute('INSERT INTO error_templates (token_count, first_token, template) VALUES (?, ?, ?)',
+                       (len(tokens), first_token, ' '.join(tokens)))
+        return cursor.lastrowid
+
+    def label(self, cursor, schema: str = 'main') -> int:
+        """
+        Fill error_template_id of rows that lack it (inside the caller's transaction).
+
+        Args:
+            cursor: Cursor of the open write transaction
+            schema: Database holding the generations table
+
+        Returns:
+            int: Rows labelled
+        """
+        cursor.execute(f'SELECT DISTINCT error_message FROM {schema}.generations '
+                       'WHERE error_message IS NOT NULL AND error_template_id IS NULL')
+        ids = self.assign(cursor, [row[0] for row in cursor.fetchall()])
+        if not ids:
+            return 0
+        # One UPDATE pass, looking each message up in the assigned ids
+        cursor.connection.create_function('error_template_of', 1, ids.get, deterministic=True)
+        cursor.execute(f'''
+            UPDATE {schema}.generations SET error_template_id = error_template_of(error_message)
+            WHERE error_message IS NOT NULL AND error_template_id IS NULL
+        ''')
+        return cursor.rowcount
+
+    def templates(self, cursor, ids: Iterable[int]) -> Dict[int, str]:
+        """Template text of each id."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        cursor.execute(f"SELECT id, template FROM error_templates WHERE id IN ({', '.join('?' * len(ids))})",
+                       ids)
+        return dict(cursor.fetchall())
@@ -0,0 +1,170 @@
+import heapq
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analytics_rollups import bucket_start
+from prompt_keywords import tokenize_prompt
+
+# Bucket of the all-time summary (day buckets are epoch seconds, never negative)
+ALL_TIME = -1
+
+class KeywordIndex:
+    """
+    Top keywords of successful prompts, kept as heavy-hitter summaries.
+
+    keyword_counts holds one Space-Saving summary per local day plus one
+    for all time, each capped at a fixed number of keywords: a keyword
+    already in a summary has its count increased; a new one takes a free
+    slot or replaces the summary's smallest entry, inheriting that count
+    (recorded as its error). Counts are therefore never underestimated,
+    overestimated by at most error, and any keyword more frequent than
+    1/capacity of the total is guaranteed to be present, while memory
+    stays bounded however large the vocabulary grows.
+
+    Summaries are updated inside the ingest transaction, so reads never
+    tokenize prompts: the all-time top K is an index range scan over K
+    rows, and a windowed top K sums the day summaries of the window (at
+    most bucket_capacity rows per day), independent of the history size.
+    """
+
+    def __init__(self, capacity: int = 1000, bucket_capacity: int = 200):
+        """
+        Args:
+            capacity: Keywords kept in the all-time summary
+            bucket_capacity: Keywords kept in each day's summary
+        """
+        self.capacity = capacity
+        self.bucket_capacity = bucket_capacity
+
+    def create_table(self, cursor):
+        """Create the summary table and its (bucket, count) index."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS keyword_counts (
+                bucket INTEGER NOT NULL,
+                keyword TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                error INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, keyword)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_keyword_counts_bucket_count '
+                       'ON keyword_counts (bucket, count)')
+
+    def _fold(self, prompts: Iterable[Tuple[str, int]]) -> Dict[int, Counter]:
+        """Keyword counts per day bucket and for ALL_TIME of (prompt, epoch) pairs."""
+        counts = defaultdict(Counter)
+        days = {}
+        for prompt, epoch in prompts:
+            keywords = tokenize_prompt(prompt)
+            if not keywords:
+                continue
+            # Events arrive in few distinct days; key the local-day lookup by date
+            date = datetime.fromtimestamp(epoch).date()
+            if date not in days:
+                days[date] = bucket_start(epoch, 'day')
+            counts[days[date]].update(keywords)
+            counts[ALL_TIME].update(keywords)
+        return counts
+
+    def add_events(self, cursor, events: Iterable):
+        """
+        Count the keywords of successful events (inside the caller's transaction).
+
+        Args:
+            cursor: Cursor of the open write transaction
+            events: GenerationEvent-like objects
+        """
+        counts = self._fold((event.prompt, int(event.timestamp.timestamp()))
+                            for event in events if event.status == 'success')
+        for bucket, bucket_counts in counts.items():
+            self._add(cursor, bucket, bucket_counts,
+                      self.capacity if bucket == ALL_TIME else self.bucket_capacity)
+
+    def _add(self, cursor, bucket: int, counts: Counter, capacity: int):
+        """Space-Saving update of one summary with a batch of keyword counts."""
+        # One lookup for which keywords the summary already holds
+        cursor.execute('SELECT keyword FROM keyword_counts WHERE bucket = ? '
+                       'AND keyword IN (SELECT value FROM json_each(?))', (bucket, json.dumps(list(counts))))
+        present = {row[0] for row in cursor.fetchall()}
+        cursor.executemany('UPDATE keyword_counts SET count = count + ? WHERE bucket = ? AND keyword = ?',
+                           [(counts[keyword], bucket, keyword) for keyword in present])
+        new = [keyword for keyword in counts if keyword not in present]
+        if not new:
+            return
+
+        cursor.execute('SELECT COUNT(*) FROM keyword_counts WHERE bucket = ?', (bucket,))
+        free = max(capacity - cursor.fetchone()[0], 0)
+        # Most frequent first, so they get the free slots
+        new.sort(key=lambda keyword: -counts[keyword])
+        rows = [(bucket, keyword, counts[keyword], 0) for keyword in new[:free]]
+
+        evicting = new[free:]
+        if evicting:
+            # Replay the rest one by one: each replaces the current smallest
+            # entry, which may be a keyword added earlier in this batch, and
+            # inherits its count as error. n replacements can only reach the
+            # n smallest stored entries, so only those are read.
+            cursor.execute('SELECT count, keyword FROM keyword_counts WHERE bucket = ? '
+                           'ORDER BY count LIMIT ?', (bucket, len(evicting)))
+            heap = cursor.fetchall() + [(count, keyword) for _, keyword, count, _ in rows]
+            heapq.heapify(heap)
+            added = {keyword: (count, error) for _, keyword, count, error in rows}
+            removed = []
+            for keyword in evicting:
+                floor, evicted = heap[0]
+                heapq.heapreplace(heap, (floor + counts[keyword], keyword))
+                if added.pop(evicted, None) is None:
+                    removed.append((bucket, evicted))
+                added[keyword] = (floor + counts[keyword], floor)
+            cursor.executemany('DELETE FROM keyword_counts WHERE bucket = ? AND keyword = ?', removed)
+            rows = [(bucket, keyword, count, error) for keyword, (count, error) in added.items()]
+        cursor.executemany('INSERT INTO keyword_counts (bucket, keyword, count, error) '
+                           'VALUES (?, ?, ?, ?)', rows)
+
+    def rebuild(self, cursor, prompts: Iterable[Tuple[str, int]]):
+        """
+        Replace every summary with exact counts of the given prompts.
+
+        Each summary keeps its capacity's most frequent keywords, with no
+        error.
+
+        Args:
+            cursor: Cursor of the open write transaction
+            prompts: (prompt, epoch) of every successful generation
+        """
+        counts = self._fold(prompts)
+        cursor.execute('DELETE FROM keyword_counts')
+        for bucket, bucket_counts in counts.items():
+            capacity = self.capacity if bucket == ALL_TIME else self.bucket_capacity
+            cursor.executemany('INSERT INTO keyword_counts (bucket, keyword, count, error) '
+                               'VALUES (?, ?, ?, 0)',
+                               [(bucket, keyword, count)
+                                for keyword, count in heapq.nlargest(capacity, bucket_counts.items(),
+                                                                     key=lambda item: item[1])])
+
+    def top(self, cursor, limit: int, since: Optional[float] = None) -> List[Tuple[str, int]]:
+        """
+        Most frequent keywords, overall or from the day of since on.
+
+        Args:
+            cursor: Database cursor
+            limit: Number of keywords
+            since: Epoch seconds; the window starts at that local day (all time if None)
+
+        Returns:
+            List of (keyword, count), most frequent first
+        """
+        if since is None:
+            cursor.execute('SELECT keyword, count FROM keyword_counts WHERE bucket = ? '
+                           'ORDER BY count DESC, keyword LIMIT ?', (ALL_TIME, limit))
+        else:
+            cursor.execute('''
+                SELECT keyword, SUM(count) AS total FROM keyword_counts
+                WHERE bucket >= ?
+                GROUP BY keyword
+                ORDER BY total DESC, keyword
+                LIMIT ?
+            ''', (bucket_start(since, 'day'), limit))
+        return cursor.fetchall()
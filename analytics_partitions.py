@@ -0,0 +1,233 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+class PartitionStore:
+    """
+    Monthly archive databases for raw generations rows.
+
+    Rows older than the retention cutoff are moved out of the hot database
+    into one SQLite file per calendar month (generations_YYYY-MM.db, same
+    table and indexes), recorded in the hot database's partitions table.
+    The hot file then only holds the recent window, so it stays small
+    enough to live in the page cache, while history remains queryable.
+
+    Partitions are ATTACHed only while they are used: archive() attaches
+    the target month to move rows in one transaction per month, and
+    scan() runs a query against the hot table and then each overlapping
+    partition in turn (SQLite allows only ten attached databases per
+    connection, so they are never attached all at once). Callers merge the
+    per-source results, which suits the GROUP BY and row-streaming queries
+    that still need raw rows; aggregates come from the rollups instead.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Where the monthly partition files are kept
+        """
+        self.directory = directory
+
+    def create_table(self, cursor):
+        """Create the partition manifest in the hot database."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS partitions (
+                month TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                first_epoch INTEGER,
+                last_epoch INTEGER,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                archived_through INTEGER
+            )
+        ''')
+
+    def path(self, month: str) -> str:
+        """Partition file of a 'YYYY-MM' month."""
+        return os.path.join(self.directory, f'generations_{month}.db')
+
+    @staticmethod
+    def month_bounds(epoch: int) -> Tuple[str, int, int]:
+        """('YYYY-MM', start epoch, next month's start epoch) of the local month holding epoch."""
+        start = datetime.fromtimestamp(epoch).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        following = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        return start.strftime('%Y-%m'), int(start.timestamp()), int(following.timestamp())
+
+    def archived_through(self, cursor) -> Optional[int]:
+        """Latest cutoff archive() has moved rows up to, or None if nothing was archived."""
+        cursor.execute('SELECT MAX(archived_through) FROM partitions')
+        return cursor.fetchone()[0]
+
+    def partitions(self, cursor, since: Optional[int] = None) -> List[Tuple[str, str]]:
+        """(month, path) of the partitions holding rows at or after since, oldest first."""
+        cursor.execute('SELECT month, path FROM partitions WHERE last_epoch >= ? ORDER BY month',
+                       (since if since is not None else -2 ** 63,))
+        return cursor.fetchall()
+
+    def _sync_schema(self, cursor, schema: str) -> List[str]:
+        """
+        Give an attached partition the hot table's columns and indexes.
+
+        Returns:
+            List of the hot table's column names
+        """
+        # Copy the hot table's definition and indexes into a new partition
+        # (sqlite_master keeps them as plain "CREATE TABLE/INDEX name ...")
+        cursor.execute("SELECT type, sql FROM main.sqlite_master "
+                       "WHERE tbl_name = 'generations' AND sql IS NOT NULL")
+        definitions = cursor.fetchall()
+        for kind, sql in definitions:
+            if kind == 'table':
+                cursor.execute(sql.replace('CREATE TABLE generations',
+                                           f'CREATE TABLE IF NOT EXISTS {schema}.generations', 1))
+
+        # Partitions written before a hot-table migration lack its new columns
+        # (added before the indexes, which may cover them)
+        cursor.execute('PRAGMA main.table_info(generations)')
+        columns = [(row[1], row[2]) for row in cursor.fetchall()]
+        cursor.execute(f'PRAGMA {schema}.table_info(generations)')
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, declared_type in columns:
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {schema}.generations ADD COLUMN {name} {declared_type}')
+
+        for kind, sql in definitions:
+            if kind == 'index':
+                cursor.execute(sql.replace('CREATE INDEX ', f'CREATE INDEX IF NOT EXISTS {schema}.', 1))
+        return [name for name, _ in columns]
+
+    def archive(self, conn, transaction, cutoff: int) -> int:
+        """
+        Move hot rows older than cutoff into their monthly partitions.
+
+        Each month is moved in its own transaction spanning the hot and the
+        attached partition database. A month interrupted by a crash is
+        redone by the next run (the copy is INSERT OR REPLACE).
+
+        Args:
+            conn: Hot database connection, outside any transaction
+            transaction: Callable returning a write-transaction context on conn
+            cutoff: Epoch seconds; older rows are archived
+
+        Returns:
+            int: Rows moved
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        moved = 0
+        while True:
+            oldest = conn.execute('SELECT MIN(epoch) FROM generations WHERE epoch < ?',
+                                  (cutoff,)).fetchone()[0]
+            if oldest is None:
+                return moved
+            month, start, end = self.month_bounds(oldest)
+            end = min(end, cutoff)
+            path = self.path(month)
+            conn.execute('ATTACH DATABASE ? AS archive', (path,))
+            try:
+                with transaction():
+                    cursor = conn.cursor()
+                    columns = ', '.join(self._sync_schema(cursor, 'archive'))
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO archive.generations ({columns})
+                        SELECT {columns} FROM main.generations WHERE epoch >= ? AND epoch < ?
+                    ''', (start, end))
+                    count = cursor.rowcount
+                    cursor.execute('DELETE FROM main.generations WHERE epoch >= ? AND epoch < ?',
+                                   (start, end))
+                    cursor.execute('SELECT MIN(epoch), MAX(epoch), COUNT(*) FROM archive.generations')
+                    first, last, total = cursor.fetchone()
+                    cursor.execute('''
+                        INSERT INTO partitions (month, path, first_epoch, last_epoch, row_count, archived_through)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(month) DO UPDATE SET
+                            path = excluded.path,
+                            first_epoch = excluded.first_epoch,
+                            last_epoch = excluded.last_epoch,
+                            row_count = excluded.row_count,
+                            archived_through = MAX(COALESCE(archived_through, 0), excluded.archived_through)
+                    ''', (month, path, first, last, total, cutoff))
+                moved += count
+            finally:
+                conn.execute('DETACH DATABASE archive')
+
+    @contextmanager
+    def attached(self, conn, month: str):
+        """
+        Attach an archived month's partition as 'archive' for the duration.
+
+        Args:
+            conn: Hot database connection, outside any transaction
+
+        Yields:
+            'archive', or None if the month has no partition
+        """
+        row = conn.execute('SELECT path FROM partitions WHERE month = ?', (month,)).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            yield None
+            return
+        conn.execute('ATTACH DATABASE ? AS archive', (row[0],))
+        try:
+            self._sync_schema(conn.cursor(), 'archive')
+            yield 'archive'
+        finally:
+            conn.execute('DETACH DATABASE archive')
+
+    def refresh(self, cursor, month: str, schema: str = 'archive'):
+        """Update a month's manifest row after writing to its attached partition."""
+        cursor.execute(f'''
+            UPDATE partitions SET (first_epoch, last_epoch, row_count) =
+                (SELECT MIN(epoch), MAX(epoch), COUNT(*) FROM {schema}.generations)
+            WHERE month = ?
+        ''', (month,))
+
+    def update(self, conn, transaction, apply: Callable[[object, str], object]):
+        """
+        Run a write step against every partition, one transaction each.
+
+        Args:
+            conn: Hot database connection, outside any transaction
+            transaction: Callable returning a write-transaction context on conn
+            apply: Called with a cursor and the partition's schema name
+        """
+        for month, path in self.partitions(conn.cursor()):
+            if not os.path.exists(path):
+                print(f"Analytics partition {month} is missing: {path}")
+                continue
+            conn.execute('ATTACH DATABASE ? AS archive', (path,))
+            try:
+                with transaction():
+                    cursor = conn.cursor()
+                    self._sync_schema(cursor, 'archive')
+                    apply(cursor, 'archive')
+            finally:
+                conn.execute('DETACH DATABASE archive')
+
+    def scan(self, conn, sql: str, params: tuple = (),
+             since: Optional[int] = None, hot: bool = True) -> Iterator[List[tuple]]:
+        """
+        Run a query against the hot table and every overlapping partition.
+
+        Args:
+            conn: Hot database connection, outside any transaction
+            sql: Query naming the table as {generations}
+            params: Query parameters
+            since: Only partitions with rows at or after this epoch
+            hot: Also query the hot table (False for the partitions only)
+
+        Yields:
+            The fetched rows of each source, hot table first
+        """
+        if hot:
+            yield conn.execute(sql.format(generations='main.generations'), params).fetchall()
+        for month, path in self.partitions(conn.cursor(), since):
+            if not os.path.exists(path):
+                print(f"Analytics partition {month} is missing: {path}")
+                continue
+            schema = 'archive_' + month.replace('-', '_')
+            conn.execute('ATTACH DATABASE ? AS ' + schema, (path,))
+            try:
+                self._sync_schema(conn.cursor(), schema)
+                rows = conn.execute(sql.format(generations=f'{schema}.generations'), params).fetchall()
+            finally:
+                conn.execute('DETACH DATABASE ' + schema)
+            yield rows
@@ -0,0 +1,350 @@
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from quantile_sketch import (DDSketch, SketchAggregate, SketchMergeAggregate, bins_to_bytes,
+                            merge_sketch_bytes, subtract_sketch_bytes)
+
+# Finest to coarsest; buckets start on local minute, hour and day boundaries
+TIERS = ('minute', 'hour', 'day')
+TIER_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Additive measures kept per (bucket, model, status, resolution)
+MEASURES = ('total_generations', 'total_processing_time', 'timed_generations',
+            'total_duration', 'total_rating', 'rated_generations')
+
+# Mergeable (not additive) measures: serialized DDSketch blobs
+SKETCHES = ('processing_time_sketch',)
+
+def bucket_start(epoch: int, tier: str) -> int:
+    """
+    Start of the tier bucket holding epoch, on local-time boundaries.
+
+    Args:
+        epoch: Epoch seconds
+        tier: 'minute', 'hour' or 'day'
+
+    Returns:
+        int: Epoch seconds of the bucket start
+    """
+    epoch = int(epoch)
+    if tier == 'minute':
+        # Every zone offset is a whole number of minutes
+        return epoch - epoch % 60
+    moment = datetime.fromtimestamp(epoch)
+    if tier == 'hour':
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(moment.timestamp())
+
+def bucket_end(epoch: int, tier: str) -> int:
+    """Smallest tier boundary at or after epoch."""
+    start = bucket_start(epoch, tier)
+    # Step half a bucket past the nominal width so 23- and 25-hour days land right
+    return start if start == epoch else bucket_start(start + TIER_SECONDS[tier] * 3 // 2, tier)
+
+class RollupTiers:
+    """
+    Minute, hour and day rollups of generation events.
+
+    Each tier is a WITHOUT ROWID table keyed by (bucket, model, status,
+    resolution) holding additive sums and counts, so every event updates
+    one row per tier with an UPSERT inside the ingest transaction, and
+    rows can be summed across tiers without double counting.
+
+    Each row also carries a DDSketch of its processing times, merged on
+    UPSERT with sketch_merge() and across rows with sketch_merge_agg(), so
+    percentiles come from any window without the raw samples.
+
+    A query window is covered with whole day buckets where it spans full
+    days, hour buckets for the remaining full hours and minute buckets for
+    the ragged edges, so a year-long window reads a few hundred buckets
+    per series instead of every event. Fine tiers only keep recent data:
+    compact() drops minute rows older than minute_retention (and hour rows
+    older than hour_retention, if set); edges older than that are widened
+    to the next coarser bucket.
+    """
+
+    # SQL functions and aggregates the tier tables need on every connection
+    FUNCTIONS = {'rollup_bucket': (2, bucket_start), 'sketch_merge': (2, merge_sketch_bytes),
+                 'sketch_subtract': (2, subtract_sketch_bytes)}
+    AGGREGATES = {'sketch_agg': (1, SketchAggregate), 'sketch_merge_agg': (1, SketchMergeAggregate)}
+
+    def __init__(self, minute_retention: float = 2 * 86400,
+                 hour_retention: Optional[float] = None):
+        """
+        Args:
+            minute_retention: Seconds of minute-tier history to keep
+            hour_retention: Seconds of hour-tier history to keep (forever if None)
+        """
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+        self._sketch = DDSketch()
+
+    def create_tables(self, cursor):
+        """Create any missing tier tables."""
+        for tier in TIERS:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS rollup_{tier} (
+                    bucket INTEGER NOT NULL,
+                    model TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    resolution TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    hour INTEGER,
+                    total_generations INTEGER NOT NULL DEFAULT 0,
+                    total_processing_time REAL NOT NULL DEFAULT 0,
+                    timed_generations INTEGER NOT NULL DEFAULT 0,
+                    total_duration REAL NOT NULL DEFAULT 0,
+                    total_rating REAL NOT NULL DEFAULT 0,
+                    rated_generations INTEGER NOT NULL DEFAULT 0,
+                    processing_time_sketch BLOB,
+                    PRIMARY KEY (bucket, model, status, resolution)
+                ) WITHOUT ROWID
+            ''')
+
+    def add_columns(self, cursor):
+        """Add columns missing from tier tables created by an older version."""
+        for tier in TIERS:
+            cursor.execute(f'PRAGMA table_info(rollup_{tier})')
+            existing = {row[1] for row in cursor.fetchall()}
+            for column in SKETCHES:
+                if column not in existing:
+                    cursor.execute(f'ALTER TABLE rollup_{tier} ADD COLUMN {column} BLOB')
+
+    def horizons(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Oldest bucket each tier is guaranteed to hold."""
+        now = time.time() if now is None else now
+        horizons = {'minute': bucket_start(now - self.minute_retention, 'hour'),
+                    'hour': 0, 'day': 0}
+        if self.hour_retention is not None:
+            horizons['hour'] = bucket_start(now - self.hour_retention, 'day')
+        return horizons
+
+    def _rows(self, events: Iterable, now: Optional[float] = None) -> Dict[str, List[tuple]]:
+        """Per-tier (key, labels, measures, sketch) rows of events, skipping buckets past retention."""
+        # Fold into minute deltas first; coarser tiers fold those, not the events.
+        # Sketches are folded as bin counts and serialized once per row.
+        folded = {'minute': defaultdict(lambda: [0, 0.0, 0, 0.0, 0.0, 0])}
+        bins = {'minute': defaultdict(Counter)}
+        for event in events:
+            epoch = int(event.timestamp.timestamp())
+            key = (epoch - epoch % 60, event.model, event.status, event.resolution)
+            delta = folded['minute'][key]
+            delta[0] += 1
+            if event.processing_time is not None:
+                delta[1] += event.processing_time
+                delta[2] += 1
+                bins['minute'][key][self._sketch.index(event.processing_time)] += 1
+            delta[3] += event.duration
+            if event.user_rating is not None:
+                delta[4] += event.user_rating
+                delta[5] += 1
+
+        for finer, tier in zip(TIERS, TIERS[1:]):
+            starts = {}
+            folded[tier] = defaultdict(lambda: [0, 0.0, 0, 0.0, 0.0, 0])
+            bins[tier] = defaultdict(Counter)
+            for (bucket, *series), delta in folded[finer].items():
+                if bucket not in starts:
+                    starts[bucket] = bucket_start(bucket, tier)
+                key = (starts[bucket], *series)
+                target = folded[tier][key]
+                for i, value in enumerate(delta):
+                    target[i] += value
+                finer_bins = bins[finer].get((bucket, *series))
+                if finer_bins:
+                    bins[tier][key].update(finer_bins)
+
+        horizons = self.horizons(now)
+        labels = {}
+        tier_rows = {}
+        for tier in TIERS:
+            rows = tier_rows[tier] = []
+            for (bucket, model, status, resolution), delta in folded[tier].items():
+                if bucket < horizons[tier]:
+                    continue
+                if bucket not in labels:
+                    moment = datetime.fromtimestamp(bucket)
+                    labels[bucket] = (moment.date().isoformat(), moment.hour)
+                date_str, hour = labels[bucket]
+                row_bins = bins[tier].get((bucket, model, status, resolution))
+                sketch = bins_to_bytes(row_bins, self._sketch.relative_accuracy) if row_bins else None
+                rows.append((bucket, model, status, resolution, date_str,
+                             None if tier == 'day' else hour, *delta, sketch))
+        return tier_rows
+
+    def add_events(self, cursor, events: Iterable, now: Optional[float] = None):
+        """
+        Add generation events to every tier (inside the caller's transaction).
+
+        Args:
+            cursor: Cursor of the open write transaction
+            events: GenerationEvent-like objects
+            now: Current time, for skipping buckets already past retention
+        """
+        for tier, rows in self._rows(events, now).items():
+            cursor.executemany(f'''
+                INSERT INTO rollup_{tier}
+                (bucket, model, status, resolution, date, hour, {', '.join(MEASURES + SKETCHES)})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(bucket, model, status, resolution) DO UPDATE SET
+                    {', '.join(f'{m} = {m} + excluded.{m}' for m in MEASURES)},
+                    {', '.join(f'{s} = sketch_merge({s}, excluded.{s})' for s in SKETCHES)}
+            ''', rows)
+
+    def remove_events(self, cursor, events: Iterable, now: Optional[float] = None):
+        """
+        Take back events added earlier (inside the caller's transaction).
+
+        Used when a stored generation is replaced: its old row is removed
+        before the new one is added, so it is never counted twice. Rows
+        left without generations are deleted.
+
+        Args:
+            cursor: Cursor of the open write transaction
+            events: GenerationEvent-like objects, as they were added
+            now: Current time, for skipping buckets already past retention
+        """
+        for tier, rows in self._rows(events, now).items():
+            cursor.executemany(f'''
+                UPDATE rollup_{tier} SET
+                    {', '.join(f'{m} = {m} - ?' for m in MEASURES)},
+                    {', '.join(f'{s} = sketch_subtract({s}, ?)' for s in SKETCHES)}
+                WHERE bucket = ? AND model = ? AND status = ? AND resolution = ?
+            ''', [(*row[6:], *row[:4]) for row in rows])
+            cursor.executemany(f'''
+                DELETE FROM rollup_{tier}
+                WHERE bucket = ? AND model = ? AND status = ? AND resolution = ?
+                    AND total_generations <= 0
+            ''', [row[:4] for row in rows])
+
+    def rebuild(self, cursor, since: Optional[int] = None, now: Optional[float] = None):
+        """
+        Recompute the tiers from the generations table.
+
+        Needs FUNCTIONS and AGGREGATES registered on the connection.
+
+        Args:
+            cursor: Cursor of the open write transaction
+            since: Local day boundary; buckets before it are kept as they
+                are (their raw rows may no longer be in generations).
+                Everything is recomputed if None.
+            now: Current time, for the tier retention horizons
+        """
+        horizons = self.horizons(now)
+        for tier in TIERS:
+            if since is None:
+                cursor.execute(f'DELETE FROM rollup_{tier}')
+            else:
+                horizons[tier] = max(horizons[tier], since)
+                cursor.execute(f'DELETE FROM rollup_{tier} WHERE bucket >= ?', (horizons[tier],))
+            # date() and strftime() with 'localtime' match datetime.fromtimestamp()
+            cursor.execute(f'''
+                INSERT INTO rollup_{tier}
+                (bucket, model, status, resolution, date, hour, {', '.join(MEASURES + SKETCHES)})
+                SELECT bucket, model, status, resolution,
+                       date(bucket, 'unixepoch', 'localtime'),
+                       {"NULL" if tier == 'day' else
+                        "CAST(strftime('%H', bucket, 'unixepoch', 'localtime') AS INTEGER)"},
+                       {', '.join(MEASURES + SKETCHES)}
+                FROM (
+                    SELECT rollup_bucket(epoch, ?) AS bucket, model, status, resolution,
+                           COUNT(*) AS total_generations,
+                           COALESCE(SUM(processing_time), 0) AS total_processing_time,
+                           COUNT(processing_time) AS timed_generations,
+                           SUM(duration) AS total_duration,
+                           COALESCE(SUM(user_rating), 0) AS total_rating,
+                           COUNT(user_rating) AS rated_generations,
+                           sketch_agg(processing_time) AS processing_time_sketch
+                    FROM generations
+                    WHERE epoch >= ?
+                    GROUP BY 1, 2, 3, 4
+                )
+            ''', (tier, horizons[tier]))
+
+    def compact(self, cursor, now: Optional[float] = None) -> int:
+        """
+        Drop fine-tier rows past their retention (inside the caller's transaction).
+
+        Returns:
+            int: Rows removed
+        """
+        horizons = self.horizons(now)
+        removed = 0
+        for tier in ('minute', 'hour'):
+            if horizons[tier] > 0:
+                cursor.execute(f'DELETE FROM rollup_{tier} WHERE bucket < ?', (horizons[tier],))
+                removed += cursor.rowcount
+        return removed
+
+    def ranges(self, start: Optional[float], end: float, coarsest: str = 'day',
+               now: Optional[float] = None) -> List[Tuple[str, int, int]]:
+        """
+        Cover [start, end) with the coarsest buckets that fit.
+
+        Edges are widened outwards to the finest tier still holding them (a
+        minute normally; an hour or a day for spans past retention).
+
+        Args:
+            start: Window start in epoch seconds (all history if None)
+            end: Window end in epoch seconds
+            coarsest: Coarsest tier to use ('hour' keeps hour-of-day detail)
+            now: Current time, for the tier retention horizons
+
+        Returns:
+            List of (tier, first bucket, end bucket) ranges, in time order
+        """
+        levels = TIERS[:TIERS.index(coarsest) + 1]
+        horizons = self.horizons(now)
+        start = 0 if start is None else int(start)
+        finest = next((tier for tier in levels if bucket_start(start, tier) >= horizons[tier]),
+                      levels[-1])
+        return self._split(bucket_start(start, finest), bucket_end(int(end), 'minute'),
+                           levels, horizons)
+
+    def _split(self, lo: int, hi: int, levels, horizons) -> List[Tuple[str, int, int]]:
+        if lo >= hi:
+            return []
+        # Tiers that still hold the bucket at lo (the coarsest always does)
+        levels = [tier for tier in levels if lo >= horizons[tier]] or [levels[-1]]
+        tier, finer = levels[-1], levels[:-1]
+        if not finer:
+            return [(tier, lo, hi)]
+        inner_lo, inner_hi = bucket_end(lo, tier), bucket_start(hi, tier)
+        if inner_lo >= inner_hi:
+            return self._split(lo, hi, finer, horizons)
+        return (self._split(lo, inner_lo, finer, horizons)
+                + [(tier, inner_lo, inner_hi)]
+                + self._split(inner_hi, hi, finer, horizons))
+
+    def query(self, cursor, select: str, group_by: str, start: Optional[float], end: float,
+              coarsest: str = 'day', now: Optional[float] = None) -> List[tuple]:
+        """
+        Aggregate rollup rows over a window.
+
+        Args:
+            cursor: Database cursor
+            select: SELECT list over the rollup columns (bucket, model, status,
+                resolution, date, hour, the MEASURES and the SKETCHES)
+            group_by: GROUP BY expression list
+            start: Window start in epoch seconds (all history if None)
+            end: Window end in epoch seconds
+            coarsest: Coarsest tier to read
+            now: Current time, for the tier retention horizons
+
+        Returns:
+            List of result rows
+        """
+        ranges = self.ranges(start, end, coarsest, now)
+        if not ranges:
+            return []
+        columns = f"bucket, model, status, resolution, date, hour, {', '.join(MEASURES + SKETCHES)}"
+        union = ' UNION ALL '.join(
+            f'SELECT {columns} FROM rollup_{tier} WHERE bucket >= ? AND bucket < ?'
+            for tier, _, _ in ranges)
+        cursor.execute(f'SELECT {select} FROM ({union}) GROUP BY {group_by}',
+                       [bound for _, lo, hi in ranges for bound in (lo, hi)])
+        return cursor.fetchall()
@@ -1,14 +1,34 @@
+import atexit
 import json
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import defaultdict, Counter
+from collections import defaultdict, deque, Counter
 import pandas as pd
 
+from analytics_errors import ErrorTemplates
+from analytics_keywords import KeywordIndex
+from analytics_partitions import PartitionStore
+from analytics_rollups import RollupTiers, bucket_start
+from quantile_sketch import DDSketch
+from sqlite_pool import DEFAULT_PRAGMAS, SQLitePool
+
+# Bumped whenever _migrate learns a new step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 6
+
+def _iso_to_epoch(value: Optional[str]) -> Optional[int]:
+    """Epoch seconds of an ISO timestamp, read the way datetime.timestamp() would."""
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
 @dataclass
 class GenerationEvent:
     """Data class for tracking video generation events."""
@@ -25,26 +45,221 @@ class GenerationEvent:
     user_rating: Optional[int] = None  # 1-5 stars
     tags: List[str] = None
 
+class BatchWriter:
+    """
+    Background writer that drains an in-memory event buffer in batches.
+
+    Producers append to a bounded deque and return immediately; a single
+    daemon thread takes up to batch_size events whenever that many are
+    waiting or flush_interval seconds have passed, and hands them to
+    write_batch (one transaction per batch). When max_pending events are
+    waiting, producers block until the writer catches up (backpressure)
+    instead of growing the buffer without bound. close() drains everything
+    that was accepted.
+    """
+    
+    def __init__(self, write_batch, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 20000):
+        """
+        Args:
+            write_batch: Callable taking a list of events and writing them
+            batch_size: Events per write transaction (and the early-flush threshold)
+            flush_interval: Longest time an event waits before being written
+            max_pending: Buffer capacity before producers are held back
+        """
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._progress = threading.Condition(self._lock)
+        self._accepted = 0
+        self._written = 0
+        self._flush_target = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='analytics-writer', daemon=True)
+        self._thread.start()
+    
+    def put(self, event):
+        """Queue an event, waiting only while the buffer is full."""
+        with self._lock:
+            while len(self._buffer) >= self.max_pending and not self._closed:
+                self._progress.wait()
+            if self._closed:
+                raise RuntimeError("BatchWriter is closed")
+            self._buffer.append(event)
+            self._accepted += 1
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every event queued before this call has been written.
+        
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._lock:
+            target = self._flush_target = self._accepted
+            self._wakeup.notify()
+            return self._progress.wait_for(lambda: self._written >= target, timeout)
+    
+    def close(self):
+        """Write all queued events and stop the writer thread."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+            self._progress.notify_all()
+        self._thread.join()
+    
+    @property
+    def pending(self) -> int:
+        """Events accepted but not yet written."""
+        with self._lock:
+            return self._accepted - self._written
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                # Sleep until a full batch, a flush request, close, or the interval
+                deadline = time.monotonic() + self.flush_interval
+                while (len(self._buffer) < self.batch_size and not self._closed
+                       and self._flush_target <= self._written):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                
+                if not self._buffer:
+                    if self._closed:
+                        return
+                    continue
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} analytics events: {e}")
+            
+            with self._lock:
+                self._written += len(batch)
+                self._progress.notify_all()
+
 class AnalyticsTracker:
     """
     Comprehensive analytics tracking system for video generation.
     Tracks usage patterns, performance metrics, and user behavior.
+    
+    Database access goes through a SQLitePool: each thread keeps one
+    connection (WAL mode, synchronous=NORMAL, enlarged page cache and mmap),
+    and every write runs in a single transaction on it.
+    
+    With async_writes, track_generation only queues the event; a BatchWriter
+    thread writes queued events in batches, so generation threads never wait
+    on disk. Reads see events once they are written (at most flush_interval
+    later, or immediately after flush()).
+    
+    Every write also updates minute/hour/day rollups (RollupTiers) in the
+    same transaction; the usage dashboards read those instead of scanning
+    generations. Likewise the keywords of successful prompts are counted
+    into per-day and all-time heavy-hitter summaries (KeywordIndex), which
+    get_popular_prompts reads. Error messages are mapped to mined
+    templates (ErrorTemplates) as they are written, and get_error_analysis
+    groups failures by template id.
+    
+    maintain() runs after a write at most every maintenance_interval
+    seconds, off the caller's thread (on the BatchWriter thread with
+    async_writes, on a short-lived background thread otherwise): it compacts expired rollup rows, moves raw rows older than
+    retention_days into monthly partition databases (PartitionStore) and
+    returns the freed pages with incremental vacuum. Archived history stays
+    in the rollups, and the queries that still need raw rows span the
+    partitions.
     """
     
-    def __init__(self, db_path: str = "analytics.db"):
+    def __init__(self, db_path: str = "analytics.db", pragmas: Optional[Dict[str, Any]] = None,
+                 async_writes: bool = False, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 20000,
+                 rollups: Optional[RollupTiers] = None, retention_days: Optional[int] = None,
+                 archive_dir: Optional[str] = None, maintenance_interval: float = 3600.0,
+                 keywords: Optional[KeywordIndex] = None,
+                 error_templates: Optional[ErrorTemplates] = None):
         """
         Initialize the analytics tracker.
         
         Args:
             db_path: Path to SQLite database file
+            pragmas: PRAGMA overrides for the connections (sqlite_pool.DEFAULT_PRAGMAS if None)
+            async_writes: Buffer generation events and write them from a background thread
+            batch_size: Events per background write transaction
+            flush_interval: Longest time a buffered event waits to be written
+            max_pending: Buffered events at which track_generation starts to wait
+            rollups: Rollup tiers and their retention (defaults if None)
+            retention_days: Days of raw generations kept in the database file
+                (older rows are archived into monthly partitions; None keeps all)
+            archive_dir: Directory for the partitions (<db name>_archive if None)
+            maintenance_interval: Seconds between automatic maintain() runs
+            keywords: Prompt keyword summaries and their capacity (defaults if None)
+            error_templates: Error message template miner (defaults if None)
         """
         self.db_path = db_path
+        self.rollups = rollups or RollupTiers()
+        self.keywords = keywords or KeywordIndex()
+        self.error_templates = error_templates or ErrorTemplates()
+        # auto_vacuum must precede journal_mode, which initializes a new file
+        pragmas = {'auto_vacuum': 'INCREMENTAL', **(DEFAULT_PRAGMAS if pragmas is None else pragmas)}
+        self.db = SQLitePool(db_path, pragmas, functions=self.rollups.FUNCTIONS,
+                             aggregates=self.rollups.AGGREGATES)
+        self.partitions = PartitionStore(archive_dir or os.path.splitext(db_path)[0] + '_archive')
+        self.retention_days = retention_days
+        self.maintenance_interval = maintenance_interval
+        self._last_maintenance = time.monotonic()
+        self._maintenance_lock = threading.Lock()
+        self._maintenance_thread = None
+        self._maintenance_start_lock = threading.Lock()
         self.init_database()
+        
+        self._writer = None
+        if async_writes:
+            self._writer = BatchWriter(self._write_events, batch_size, flush_interval, max_pending)
+            # Drain the buffer even if the caller never closes the tracker
+            atexit.register(self.close)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every buffered event has been written (no-op without async_writes).
+        
+        Returns:
+            bool: False if the timeout expired first
+        """
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+    
+    def close(self):
+        """Write any buffered events and close the tracker's database connections."""
+        if self._writer is not None:
+            self._writer.close()
+        maintenance = self._maintenance_thread
+        if maintenance is not None:
+            maintenance.join()
+        self.db.close()
     
     def init_database(self):
         """Initialize the SQLite database with required tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db.transaction() as conn:
+            self._create_tables(conn.cursor())
+            version = self._migrate(conn)
+        # These steps cover the archived partitions, which can only be
+        # attached outside a transaction
+        if version < 5:
+            self.rebuild_keywords()
+        if version < 6:
+            self.partitions.update(self.db.get(), self.db.transaction, self.error_templates.label)
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create any missing tables."""
         
         # Create generations table
         cursor.execute('''
@@ -60,7 +275,11 @@ class AnalyticsTracker:
                 error_message TEXT,
                 file_size INTEGER,
                 user_rating INTEGER,
-                tags TEXT
+                tags TEXT,
+                epoch INTEGER,
+                date TEXT,
+                hour INTEGER,
+                error_template_id INTEGER
             )
         ''')
         
@@ -75,6 +294,8 @@ class AnalyticsTracker:
                 failed_generations INTEGER DEFAULT 0,
                 avg_processing_time REAL,
                 total_duration REAL DEFAULT 0,
+                total_processing_time REAL DEFAULT 0,
+                timed_generations INTEGER DEFAULT 0,
                 PRIMARY KEY (date, hour, model)
             )
         ''')
@@ -90,28 +311,186 @@ class AnalyticsTracker:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Create quality_scores table (one row per scored clip)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS quality_scores (
+                generation_id TEXT NOT NULL,
+                video_path TEXT NOT NULL,
+                scored_at TEXT NOT NULL,
+                frames_analyzed INTEGER,
+                sharpness REAL,
+                exposure REAL,
+                underexposed_ratio REAL,
+                overexposed_ratio REAL,
+                flicker REAL,
+                frozen_ratio REAL,
+                black_ratio REAL,
+                passed INTEGER NOT NULL,
+                issues TEXT,
+                PRIMARY KEY (generation_id, video_path)
+            )
+        ''')
+        
+        self.rollups.create_tables(cursor)
+        self.keywords.create_table(cursor)
+        self.error_templates.create_table(cursor)
+        self.partitions.create_table(cursor)
+    
+    def _migrate(self, conn: sqlite3.Connection) -> int:
+        """
+        Bring a database created by an older version up to SCHEMA_VERSION.
+        
+        - generations gains epoch (integer seconds), date and hour columns,
+          backfilled from the ISO timestamp, so filters and groupings no
+          longer parse text per row
+        - usage_stats gains the sum/count columns and is rebuilt from
+          generations
+        - indexes on (epoch), (status, epoch) and (model, epoch) are created
+        - the minute/hour/day rollup tiers (with their processing-time
+          sketches) are filled from generations
+        - generations gains error_template_id, filled by mining templates
+          from the stored error messages, and a (status, error_template_id)
+          index
+        
+        The prompt keyword summaries and the partitions' template ids are
+        filled by init_database afterwards.
+        
+        Returns:
+            int: The schema version the database had
+        """
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return version
+        
+        cursor.execute('PRAGMA table_info(generations)')
+        if 'epoch' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE generations ADD COLUMN epoch INTEGER')
+            cursor.execute('ALTER TABLE generations ADD COLUMN date TEXT')
+            cursor.execute('ALTER TABLE generations ADD COLUMN hour INTEGER')
+            # Backfill in one statement; the Python function keeps naive
+            # timestamps in local time, exactly as new events are stored
+            conn.create_function('iso_to_epoch', 1, _iso_to_epoch, deterministic=True)
+            cursor.execute('''
+                UPDATE generations SET
+                    epoch = iso_to_epoch(timestamp),
+                    date = substr(timestamp, 1, 10),
+                    hour = CAST(substr(timestamp, 12, 2) AS INTEGER)
+            ''')
+        
+        cursor.execute('PRAGMA table_info(usage_stats)')
+        rebuild = 'timed_generations' not in {row[1] for row in cursor.fetchall()}
+        if rebuild:
+            cursor.execute('ALTER TABLE usage_stats ADD COLUMN total_processing_time REAL DEFAULT 0')
+            cursor.execute('ALTER TABLE usage_stats ADD COLUMN timed_generations INTEGER DEFAULT 0')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_epoch ON generations (epoch)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_status_epoch ON generations (status, epoch)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_model_epoch ON generations (model, epoch)')
+        
+        cursor.execute('PRAGMA table_info(generations)')
+        if 'error_template_id' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE generations ADD COLUMN error_template_id INTEGER')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generations_status_template '
+                       'ON generations (status, error_template_id)')
+        
+        if rebuild:
+            self._rebuild_usage_stats(cursor)
+        self.rollups.add_columns(cursor)
+        if version < 4:
+            self.rollups.rebuild(cursor)
+        if version < 6:
+            self.error_templates.label(cursor)
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        cursor.execute('ANALYZE')
+        return version
     
     def track_generation(self, event: GenerationEvent):
         """
         Track a video generation event.
         
+        With async_writes the event is only queued (this blocks solely when
+        the buffer is full); otherwise it is written before returning.
+        
         Args:
             event: GenerationEvent object with details
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Convert tags list to JSON string
-        tags_json = json.dumps(event.tags) if event.tags else None
+        if self._writer is not None:
+            self._writer.put(event)
+        else:
+            self._write_events([event])
+    
+    def track_generations(self, events: List[GenerationEvent]):
+        """
+        Track many generation events in one write transaction.
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO generations 
-            (id, timestamp, prompt, model, duration, resolution, status, 
-             processing_time, error_message, file_size, user_rating, tags)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        Args:
+            events: GenerationEvent objects
+        """
+        if self._writer is not None:
+            for event in events:
+                self._writer.put(event)
+        else:
+            self._write_events(events)
+    
+    def _write_events(self, events: List[GenerationEvent]):
+        """
+        Insert events and update their usage stats, rollups and keywords in a single transaction.
+        
+        An event whose id is already stored replaces that row (a status or
+        rating update); the old row's contribution to the aggregates is
+        taken back first, so every id is counted once. Events older than
+        the archive cutoff are written to their month's partition (one
+        transaction per month), so they replace an archived row instead of
+        leaving a second copy in the hot table.
+        """
+        # The last event of an id wins, as the row replace does
+        events = list({event.id: event for event in events}.values())
+        conn = self.db.get()
+        archived_through = self.partitions.archived_through(conn.cursor())
+        current = []
+        late = defaultdict(list)
+        for event in events:
+            epoch = int(event.timestamp.timestamp())
+            if archived_through is not None and epoch < archived_through:
+                late[PartitionStore.month_bounds(epoch)[0]].append(event)
+            else:
+                current.append(event)
+        
+        for month, month_events in late.items():
+            with self.partitions.attached(conn, month) as schema:
+                if schema is None:
+                    # Nothing archived for that month yet; maintain() moves it later
+                    current.extend(month_events)
+                else:
+                    self._write_batch(conn, month_events, schema, month)
+        if current:
+            self._write_batch(conn, current)
+        
+        if time.monotonic() - self._last_maintenance >= self.maintenance_interval:
+            self._start_maintenance()
+    
+    def _start_maintenance(self):
+        """Run maintain() without holding up the thread that tracked the event."""
+        if self._writer is not None and threading.current_thread() is self._writer._thread:
+            # Already off the generation threads; keep writes and maintenance serial
+            self.maintain()
+            return
+        with self._maintenance_start_lock:
+            running = self._maintenance_thread is not None and self._maintenance_thread.is_alive()
+            if running or time.monotonic() - self._last_maintenance < self.maintenance_interval:
+                return
+            # Claim the run now, so concurrent writers do not start another
+            self._last_maintenance = time.monotonic()
+            self._maintenance_thread = threading.Thread(target=self.maintain, name='analytics-maintenance',
+                                                        daemon=True)
+            self._maintenance_thread.start()
+    
+    def _write_batch(self, conn: sqlite3.Connection, events: List[GenerationEvent],
+                     schema: str = 'main', month: Optional[str] = None):
+        """Write events with distinct ids to schema's generations table and update the aggregates."""
+        rows = [(
             event.id,
             event.timestamp.isoformat(),
             event.prompt,
@@ -123,160 +502,354 @@ class AnalyticsTracker:
             event.error_message,
             event.file_size,
             event.user_rating,
-            tags_json
-        ))
+            # Convert tags list to JSON string
+            json.dumps(event.tags) if event.tags else None,
+            int(event.timestamp.timestamp()),
+            event.timestamp.date().isoformat(),
+            event.timestamp.hour
+        ) for event in events]
+        
+        ids = [event.id for event in events]
+        with self.db.transaction():
+            cursor = conn.cursor()
+            previous = list(self._stored_events(cursor, ids).values())
+            if schema != 'main':
+                if previous:
+                    # A hot copy written before its month was archived moves to the partition
+                    cursor.execute('DELETE FROM main.generations WHERE id IN (SELECT value FROM json_each(?))',
+                                   (json.dumps(ids),))
+                previous += self._stored_events(cursor, ids, schema).values()
+            if previous:
+                self._update_usage_stats(cursor, previous, sign=-1)
+                self.rollups.remove_events(cursor, previous)
+            template_ids = self.error_templates.assign(cursor, (event.error_message for event in events))
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO {schema}.generations 
+                (id, timestamp, prompt, model, duration, resolution, status, 
+                 processing_time, error_message, file_size, user_rating, tags,
+                 epoch, date, hour, error_template_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [row + (template_ids.get(event.error_message),) for row, event in zip(rows, events)])
+            
+            # Update usage stats, rollups and keywords in the same transaction
+            self._update_usage_stats(cursor, events)
+            self.rollups.add_events(cursor, events)
+            # Keyword summaries cannot be decremented: a prompt already counted
+            # as a success is not counted again
+            counted = {event.id for event in previous if event.status == 'success'}
+            self.keywords.add_events(cursor, [event for event in events if event.id not in counted])
+            if month is not None:
+                self.partitions.refresh(cursor, month, schema)
+    
+    def _stored_events(self, cursor: sqlite3.Cursor, ids: List[str],
+                       schema: str = 'main') -> Dict[str, GenerationEvent]:
+        """The stored generations with these ids, as the events that wrote them."""
+        cursor.execute(f'''
+            SELECT id, timestamp, prompt, model, duration, resolution, status,
+                   processing_time, error_message, file_size, user_rating
+            FROM {schema}.generations WHERE id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(ids),))
+        return {row[0]: GenerationEvent(row[0], datetime.fromisoformat(row[1]), *row[2:])
+                for row in cursor.fetchall()}
+    
+    def _update_usage_stats(self, cursor: sqlite3.Cursor, events: List[GenerationEvent], sign: int = 1):
+        """
+        Add events to the usage_stats rollups (inside the caller's transaction).
         
-        # Update usage stats
-        self._update_usage_stats(event)
+        Rollups keep sums and counts, so each row is updated with one atomic
+        UPSERT and the average is derived from them, never read back. With
+        sign=-1 the events are taken back out.
+        """
+        # Fold the events into one delta per (date, hour, model) row first
+        deltas = defaultdict(lambda: [0, 0, 0, 0.0, 0, 0.0])
+        for event in events:
+            delta = deltas[(event.timestamp.date().isoformat(), event.timestamp.hour, event.model)]
+            delta[0] += sign
+            if event.status == 'success':
+                delta[1] += sign
+            elif event.status == 'failed':
+                delta[2] += sign
+            if event.processing_time is not None:
+                delta[3] += sign * event.processing_time
+                delta[4] += sign
+            delta[5] += sign * event.duration
+        
+        cursor.executemany('''
+            INSERT INTO usage_stats 
+            (date, hour, model, total_generations, successful_generations, failed_generations,
+             total_processing_time, timed_generations, avg_processing_time, total_duration)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(date, hour, model) DO UPDATE SET
+                total_generations = total_generations + excluded.total_generations,
+                successful_generations = successful_generations + excluded.successful_generations,
+                failed_generations = failed_generations + excluded.failed_generations,
+                total_processing_time = total_processing_time + excluded.total_processing_time,
+                timed_generations = timed_generations + excluded.timed_generations,
+                avg_processing_time = (total_processing_time + excluded.total_processing_time)
+                    / NULLIF(timed_generations + excluded.timed_generations, 0),
+                total_duration = total_duration + excluded.total_duration
+        ''', [(date_str, hour, model, count, success, failed, time_sum, timed,
+               time_sum / timed if timed else None, duration)
+              for (date_str, hour, model), (count, success, failed, time_sum, timed, duration)
+              in deltas.items()])
+    
+    def rebuild_usage_stats(self):
+        """
+        Recompute the usage_stats rollups from the generations table.
         
-        conn.commit()
-        conn.close()
+        Days already archived out of generations keep their rows.
+        """
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            self._rebuild_usage_stats(cursor, self.partitions.archived_through(cursor))
     
-    def _update_usage_stats(self, event: GenerationEvent):
-        """Update aggregated usage statistics."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _rebuild_usage_stats(self, cursor: sqlite3.Cursor, since: Optional[int] = None):
+        # One GROUP BY pass over generations replaces the table (from the day of since)
+        since_date = datetime.fromtimestamp(since).date().isoformat() if since is not None else ''
+        cursor.execute('DELETE FROM usage_stats WHERE date >= ?', (since_date,))
+        cursor.execute('''
+            INSERT INTO usage_stats 
+            (date, hour, model, total_generations, successful_generations, failed_generations,
+             total_processing_time, timed_generations, avg_processing_time, total_duration)
+            SELECT 
+                date,
+                hour,
+                model,
+                COUNT(*),
+                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END),
+                COALESCE(SUM(processing_time), 0),
+                COUNT(processing_time),
+                AVG(processing_time),
+                SUM(duration)
+            FROM generations 
+            WHERE date >= ?
+            GROUP BY 1, 2, 3
+        ''', (since_date,))
+    
+    def compact_rollups(self) -> int:
+        """
+        Drop rollup rows past their tier's retention.
         
-        date_str = event.timestamp.date().isoformat()
-        hour = event.timestamp.hour
+        Returns:
+            int: Rows removed
+        """
+        with self.db.transaction() as conn:
+            return self.rollups.compact(conn.cursor())
+    
+    def rebuild_rollups(self):
+        """
+        Recompute the rollup tiers from the generations table.
         
-        # Get current stats
-        cursor.execute('''
-            SELECT total_generations, successful_generations, failed_generations,
-                   avg_processing_time, total_duration
-            FROM usage_stats 
-            WHERE date = ? AND hour = ? AND model = ?
-        ''', (date_str, hour, event.model))
+        Rollups are the only record of archived months, so those buckets
+        are kept and only the span still in generations is recomputed.
+        """
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            self.rollups.rebuild(cursor, self.partitions.archived_through(cursor))
+    
+    def rebuild_keywords(self):
+        """
+        Recount the prompt keyword summaries from generations and its partitions.
+        
+        Counts are exact afterwards (each summary keeps its most frequent
+        keywords); later ingests resume the approximate updates.
+        """
+        conn = self.db.get()
+        query = 'SELECT prompt, epoch FROM {generations} WHERE status = "success"'
+        prompts = [row for rows in self.partitions.scan(conn, query, hot=False) for row in rows]
+        with self.db.transaction():
+            # Hot rows are read in the write transaction, so no ingest is missed
+            prompts.extend(conn.execute(query.format(generations='main.generations')).fetchall())
+            self.keywords.rebuild(conn.cursor(), prompts)
+    
+    def maintain(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Compact rollups, archive expired raw rows and free their pages.
         
-        result = cursor.fetchone()
+        Runs automatically in the background after writes every
+        maintenance_interval seconds; call it directly to run it on another
+        schedule. Concurrent calls
+        return immediately while one is in progress.
         
-        if result:
-            total_gen, success_gen, failed_gen, avg_time, total_dur = result
-            
-            # Update counts
-            total_gen += 1
-            if event.status == 'success':
-                success_gen += 1
-            elif event.status == 'failed':
-                failed_gen += 1
-            
-            # Update processing time average
-            if event.processing_time and avg_time:
-                avg_time = (avg_time * (total_gen - 1) + event.processing_time) / total_gen
-            elif event.processing_time:
-                avg_time = event.processing_time
-            
-            # Update total duration
-            total_dur += event.duration
+        Args:
+            now: Current time in epoch seconds (defaults to the clock)
+        
+        Returns:
+            Dictionary with rows compacted and archived and pages freed
+        """
+        summary = {'compacted': 0, 'archived': 0, 'freed_pages': 0}
+        if not self._maintenance_lock.acquire(blocking=False):
+            return summary
+        try:
+            self._last_maintenance = time.monotonic()
+            now = time.time() if now is None else now
+            conn = self.db.get()
+            with self.db.transaction():
+                summary['compacted'] = self.rollups.compact(conn.cursor(), now)
             
-            cursor.execute('''
-                UPDATE usage_stats 
-                SET total_generations = ?, successful_generations = ?, 
-                    failed_generations = ?, avg_processing_time = ?, total_duration = ?
-                WHERE date = ? AND hour = ? AND model = ?
-            ''', (total_gen, success_gen, failed_gen, avg_time, total_dur, 
-                  date_str, hour, event.model))
-        else:
-            # Insert new record
-            success_gen = 1 if event.status == 'success' else 0
-            failed_gen = 1 if event.status == 'failed' else 0
+            if self.retention_days is not None:
+                # Archive whole days, so rollup rebuilds can start at the cutoff
+                cutoff = bucket_start(now - self.retention_days * 86400, 'day')
+                summary['archived'] = self.partitions.archive(conn, self.db.transaction, cutoff)
             
-            cursor.execute('''
-                INSERT INTO usage_stats 
-                (date, hour, model, total_generations, successful_generations, 
-                 failed_generations, avg_processing_time, total_duration)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (date_str, hour, event.model, 1, success_gen, failed_gen,
-                  event.processing_time, event.duration))
+            freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if freelist and conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                # Each step frees one page and execute() stops after the first;
+                # executescript() runs the pragma to completion
+                conn.executescript('PRAGMA incremental_vacuum;')
+                summary['freed_pages'] = freelist
+            return summary
+        except sqlite3.Error as e:
+            print(f"Error maintaining analytics database: {e}")
+            return summary
+        finally:
+            self._maintenance_lock.release()
+    
+    def vacuum(self):
+        """
+        Rebuild the database file with VACUUM, switching it to incremental
+        auto-vacuum so later maintain() runs can return freed pages.
         
-        conn.commit()
-        conn.close()
+        Takes an exclusive lock for as long as the copy runs; schedule it
+        for a quiet period.
+        """
+        conn = self.db.get()
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
     
-    def get_generation_stats(self, days: int = 30) -> Dict[str, Any]:
+    def track_quality_scores(self, scores: List[Dict[str, Any]]):
         """
-        Get comprehensive generation statistics.
+        Record clip quality scores (as produced by QualityScorer).
+        
+        Args:
+            scores: Score dicts with 'generation_id', 'video_path', the metric
+                values, 'passed' and 'issues'
+        """
+        scored_at = datetime.now().isoformat()
+        rows = [(
+            item['generation_id'],
+            item['video_path'],
+            scored_at,
+            item.get('frames_analyzed'),
+            item.get('sharpness'),
+            item.get('exposure'),
+            item.get('underexposed_ratio'),
+            item.get('overexposed_ratio'),
+            item.get('flicker'),
+            item.get('frozen_ratio'),
+            item.get('black_ratio'),
+            1 if item.get('passed') else 0,
+            json.dumps(item.get('issues') or [])
+        ) for item in scores]
+        
+        with self.db.transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO quality_scores
+                (generation_id, video_path, scored_at, frames_analyzed, sharpness, exposure,
+                 underexposed_ratio, overexposed_ratio, flicker, frozen_ratio, black_ratio,
+                 passed, issues)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+    
+    def get_quality_stats(self, days: int = 30) -> Dict[str, Any]:
+        """
+        Summarize clip quality scores.
         
         Args:
             days: Number of days to look back
         
         Returns:
-            Dictionary with various statistics
+            Dictionary with pass rate, average metrics and issue counts
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.get().cursor()
         
-        # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Total generations
+        start_date = datetime.now() - timedelta(days=days)
         cursor.execute('''
-            SELECT COUNT(*) FROM generations 
-            WHERE timestamp >= ?
+            SELECT COUNT(*), SUM(passed), AVG(sharpness), AVG(exposure),
+                   AVG(flicker), AVG(frozen_ratio), AVG(black_ratio)
+            FROM quality_scores
+            WHERE scored_at >= ?
         ''', (start_date.isoformat(),))
-        total_generations = cursor.fetchone()[0]
+        total, passed, sharpness, exposure, flicker, frozen, black = cursor.fetchone()
         
-        # Success rate
         cursor.execute('''
-            SELECT 
-                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful,
-                SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
-                SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
-            FROM generations 
-            WHERE timestamp >= ?
+            SELECT issues FROM quality_scores
+            WHERE scored_at >= ? AND passed = 0
         ''', (start_date.isoformat(),))
+        issue_counts = Counter()
+        for (issues,) in cursor.fetchall():
+            issue_counts.update(json.loads(issues or '[]'))
         
-        success_data = cursor.fetchone()
-        successful, failed, cancelled = success_data if success_data else (0, 0, 0)
-        
-        success_rate = (successful / total_generations * 100) if total_generations > 0 else 0
+        total = total or 0
+        return {
+            'total_scored': total,
+            'passed': passed or 0,
+            'pass_rate': round((passed or 0) / total * 100, 2) if total else 0,
+            'avg_sharpness': round(sharpness or 0, 2),
+            'avg_exposure': round(exposure or 0, 3),
+            'avg_flicker': round(flicker or 0, 3),
+            'avg_frozen_ratio': round(frozen or 0, 3),
+            'avg_black_ratio': round(black or 0, 3),
+            'issue_counts': dict(issue_counts.most_common()),
+            'period_days': days
+        }
+    
+    def get_generation_stats(self, days: int = 30) -> Dict[str, Any]:
+        """
+        Get comprehensive generation statistics.
         
-        # Average processing time
-        cursor.execute('''
-            SELECT AVG(processing_time) FROM generations 
-            WHERE timestamp >= ? AND processing_time IS NOT NULL
-        ''', (start_date.isoformat(),))
-        avg_processing_time = cursor.fetchone()[0] or 0
+        Everything comes from one read of the rollup tiers covering the
+        window (day buckets for whole days, hour and minute buckets at the
+        edges, so the start is resolved to the minute): rows are grouped by
+        (date, model, resolution) with conditional aggregates, and the few
+        resulting groups are folded into the totals, per-model,
+        per-resolution and per-day figures here.
         
-        # Model usage
-        cursor.execute('''
-            SELECT model, COUNT(*) as count 
-            FROM generations 
-            WHERE timestamp >= ?
-            GROUP BY model 
-            ORDER BY count DESC
-        ''', (start_date.isoformat(),))
-        model_usage = dict(cursor.fetchall())
+        Args:
+            days: Number of days to look back
         
-        # Popular resolutions
-        cursor.execute('''
-            SELECT resolution, COUNT(*) as count 
-            FROM generations 
-            WHERE timestamp >= ?
-            GROUP BY resolution 
-            ORDER BY count DESC
-            LIMIT 5
-        ''', (start_date.isoformat(),))
-        popular_resolutions = dict(cursor.fetchall())
+        Returns:
+            Dictionary with various statistics
+        """
+        cursor = self.db.get().cursor()
         
-        # Average duration
-        cursor.execute('''
-            SELECT AVG(duration) FROM generations 
-            WHERE timestamp >= ?
-        ''', (start_date.isoformat(),))
-        avg_duration = cursor.fetchone()[0] or 0
+        # Calculate date range
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
         
-        # Daily generation counts
-        cursor.execute('''
-            SELECT DATE(timestamp) as date, COUNT(*) as count 
-            FROM generations 
-            WHERE timestamp >= ?
-            GROUP BY DATE(timestamp) 
-            ORDER BY date
-        ''', (start_date.isoformat(),))
-        daily_counts = dict(cursor.fetchall())
+        rows = self.rollups.query(cursor, '''
+                date, model, resolution,
+                SUM(total_generations),
+                SUM(CASE WHEN status = 'success' THEN total_generations ELSE 0 END),
+                SUM(CASE WHEN status = 'failed' THEN total_generations ELSE 0 END),
+                SUM(CASE WHEN status = 'cancelled' THEN total_generations ELSE 0 END),
+                SUM(total_processing_time),
+                SUM(timed_generations),
+                SUM(total_duration)
+            ''', 'date, model, resolution', start_date.timestamp(), end_date.timestamp())
+        
+        total_generations = successful = failed = cancelled = timed = 0
+        processing_time_sum = duration_sum = 0.0
+        model_counts = Counter()
+        resolution_counts = Counter()
+        daily = Counter()
+        for (date, model, resolution, count, success, fail, cancel,
+             time_sum, time_count, dur_sum) in rows:
+            total_generations += count
+            successful += success
+            failed += fail
+            cancelled += cancel
+            processing_time_sum += time_sum or 0.0
+            timed += time_count
+            duration_sum += dur_sum or 0.0
+            model_counts[model] += count
+            resolution_counts[resolution] += count
+            daily[date] += count
         
-        conn.close()
+        success_rate = (successful / total_generations * 100) if total_generations > 0 else 0
+        avg_processing_time = processing_time_sum / timed if timed else 0
+        avg_duration = duration_sum / total_generations if total_generations else 0
         
         return {
             'total_generations': total_generations,
@@ -286,9 +859,9 @@ class AnalyticsTracker:
             'success_rate': round(success_rate, 2),
             'avg_processing_time': round(avg_processing_time, 2),
             'avg_duration': round(avg_duration, 2),
-            'model_usage': model_usage,
-            'popular_resolutions': popular_resolutions,
-            'daily_counts': daily_counts,
+            'model_usage': dict(model_counts.most_common()),
+            'popular_resolutions': dict(resolution_counts.most_common(5)),
+            'daily_counts': dict(sorted(daily.items())),
             'period_days': days
         }
     
@@ -302,23 +875,15 @@ class AnalyticsTracker:
         Returns:
             Dictionary mapping hour (0-23) to generation count
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.get().cursor()
         
-        start_date = datetime.now() - timedelta(days=days)
-        
-        cursor.execute('''
-            SELECT 
-                CAST(strftime('%H', timestamp) AS INTEGER) as hour,
-                COUNT(*) as count
-            FROM generations 
-            WHERE timestamp >= ?
-            GROUP BY hour
-            ORDER BY hour
-        ''', (start_date.isoformat(),))
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
         
-        hourly_data = dict(cursor.fetchall())
-        conn.close()
+        # Hour buckets at most, so every row still knows its hour of day
+        hourly_data = dict(self.rollups.query(cursor, 'hour, SUM(total_generations)', 'hour',
+                                              start_date.timestamp(), end_date.timestamp(),
+                                              coarsest='hour'))
         
         # Fill in missing hours with 0
         return {hour: hourly_data.get(hour, 0) for hour in range(24)}
@@ -327,124 +892,143 @@ class AnalyticsTracker:
         """
         Get performance metrics for each model.
         
+        Processing-time percentiles (p50/p95/p99) come from merging the
+        rollup rows' sketches, overall and per resolution; they are within
+        1% of the true sample values.
+        
         Returns:
             Dictionary with model performance data
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                model,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as successful,
-                AVG(CASE WHEN processing_time IS NOT NULL THEN processing_time END) as avg_time,
-                AVG(duration) as avg_duration,
-                AVG(CASE WHEN user_rating IS NOT NULL THEN user_rating END) as avg_rating
-            FROM generations 
-            GROUP BY model
-        ''', )
-        
-        results = cursor.fetchall()
-        conn.close()
+        cursor = self.db.get().cursor()
+        
+        # All history: day buckets plus the current day's hour and minute buckets
+        results = self.rollups.query(cursor, '''
+                model, resolution,
+                SUM(total_generations),
+                SUM(CASE WHEN status = 'success' THEN total_generations ELSE 0 END),
+                SUM(total_processing_time),
+                SUM(timed_generations),
+                SUM(total_duration),
+                SUM(total_rating),
+                SUM(rated_generations),
+                sketch_merge_agg(processing_time_sketch)
+            ''', 'model, resolution', None, time.time())
+        
+        # Fold the per-resolution rows into per-model sums and sketches
+        models = {}
+        for (model, resolution, total, successful, time_sum, timed,
+             duration_sum, rating_sum, rated, sketch_blob) in results:
+            sketch = DDSketch.from_bytes(sketch_blob) if sketch_blob else DDSketch()
+            entry = models.setdefault(model, {'sums': [0, 0, 0.0, 0, 0.0, 0.0, 0],
+                                              'sketch': DDSketch(sketch.relative_accuracy),
+                                              'resolutions': {}})
+            for i, value in enumerate((total, successful, time_sum, timed,
+                                       duration_sum, rating_sum, rated)):
+                entry['sums'][i] += value or 0
+            entry['sketch'].merge(sketch)
+            entry['resolutions'][resolution] = {'total_generations': total,
+                                                **self._processing_percentiles(sketch)}
         
         performance = {}
-        for row in results:
-            model, total, successful, avg_time, avg_duration, avg_rating = row
+        for model, entry in models.items():
+            total, successful, time_sum, timed, duration_sum, rating_sum, rated = entry['sums']
             success_rate = (successful / total * 100) if total > 0 else 0
             
             performance[model] = {
                 'total_generations': total,
                 'success_rate': round(success_rate, 2),
-                'avg_processing_time': round(avg_time or 0, 2),
-                'avg_duration': round(avg_duration or 0, 2),
-                'avg_rating': round(avg_rating or 0, 2)
+                'avg_processing_time': round(time_sum / timed if timed else 0, 2),
+                'avg_duration': round(duration_sum / total if total else 0, 2),
+                'avg_rating': round(rating_sum / rated if rated else 0, 2),
+                **self._processing_percentiles(entry['sketch']),
+                'resolutions': entry['resolutions']
             }
         
         return performance
     
-    def get_popular_prompts(self, limit: int = 10) -> List[Tuple[str, int]]:
+    @staticmethod
+    def _processing_percentiles(sketch: DDSketch) -> Dict[str, float]:
+        """p50/p95/p99 processing time of a sketch (0 when it is empty)."""
+        return {f'p{p}_processing_time': round(sketch.quantile(p / 100) or 0, 2)
+                for p in (50, 95, 99)}
+    
+    def get_popular_prompts(self, limit: int = 10, days: Optional[int] = None) -> List[Tuple[str, int]]:
         """
         Get most popular prompt patterns.
         
+        Keywords (as split by PromptEnhancer.extract_keywords) of successful
+        prompts come from the keyword summaries maintained on ingest, so
+        counts of rare keywords may be overestimated by the summaries'
+        error; the leading keywords are exact or close to it. Re-tracking a
+        successful generation does not count it again, but one re-tracked
+        as a failure keeps its keywords counted.
+        
         Args:
             limit: Number of results to return
+            days: Only count prompts from the last days (whole local days; all history if None)
         
         Returns:
             List of (prompt_pattern, count) tuples
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get all prompts
-        cursor.execute('SELECT prompt FROM generations WHERE status = "success"')
-        prompts = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        
-        # Extract keywords and patterns
-        word_counts = Counter()
-        for prompt in prompts:
-            # Simple word extraction (could be enhanced with NLP)
-            words = prompt.lower().split()
-            # Filter out common words
-            filtered_words = [w for w in words if len(w) > 3 and w not in 
-                            ['the', 'and', 'with', 'that', 'this', 'from', 'they', 'have']]
-            word_counts.update(filtered_words)
-        
-        return word_counts.most_common(limit)
+        cursor = self.db.get().cursor()
+        since = None if days is None else (datetime.now() - timedelta(days=days)).timestamp()
+        return self.keywords.top(cursor, limit, since)
     
     def get_error_analysis(self) -> Dict[str, Any]:
         """
         Analyze error patterns and common failure reasons.
         
+        Error patterns are the templates mined from the failure messages
+        (variable parts such as ids, URLs and timestamps shown as
+        placeholders), counted with a GROUP BY on the indexed template id.
+        
         Returns:
             Dictionary with error analysis
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get error messages
-        cursor.execute('''
-            SELECT error_message, COUNT(*) as count 
-            FROM generations 
-            WHERE status = 'failed' AND error_message IS NOT NULL
-            GROUP BY error_message 
-            ORDER BY count DESC
-        ''')
-        error_patterns = dict(cursor.fetchall())
-        
-        # Get failure rate by model
-        cursor.execute('''
-            SELECT 
+        cursor = self.db.get().cursor()
+        
+        # Count failures per template (per source, then summed across the partitions)
+        template_counts = Counter()
+        for rows in self.partitions.scan(self.db.get(), '''
+                SELECT error_template_id, COUNT(*) as count 
+                FROM {generations} 
+                WHERE status = 'failed' AND error_template_id IS NOT NULL
+                GROUP BY error_template_id 
+            '''):
+            for template_id, count in rows:
+                template_counts[template_id] += count
+        templates = self.error_templates.templates(cursor, template_counts)
+        error_counts = Counter()
+        for template_id, count in template_counts.items():
+            error_counts[templates.get(template_id, '')] += count
+        error_patterns = dict(error_counts.most_common())
+        
+        # Get failure rate by model (all history, from the rollups)
+        model_rows = self.rollups.query(cursor, '''
                 model,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed
-            FROM generations 
-            GROUP BY model
-        ''')
+                SUM(total_generations) as total,
+                SUM(CASE WHEN status = 'failed' THEN total_generations ELSE 0 END) as failed
+            ''', 'model', None, time.time())
         
         model_failure_rates = {}
-        for model, total, failed in cursor.fetchall():
+        for model, total, failed in model_rows:
             failure_rate = (failed / total * 100) if total > 0 else 0
             model_failure_rates[model] = round(failure_rate, 2)
         
-        # Get failure rate by time of day
-        cursor.execute('''
-            SELECT 
-                CAST(strftime('%H', timestamp) AS INTEGER) as hour,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed
-            FROM generations 
-            GROUP BY hour
-        ''')
+        # Get failure rate by time of day (hour buckets keep the hour)
+        hour_rows = self.rollups.query(cursor, '''
+                hour,
+                SUM(total_generations) as total,
+                SUM(CASE WHEN status = 'failed' THEN total_generations ELSE 0 END) as failed
+            ''', 'hour', None, time.time(), coarsest='hour')
         
         hourly_failure_rates = {}
-        for hour, total, failed in cursor.fetchall():
+        for hour, total, failed in hour_rows:
+            if hour is None:
+                continue
             failure_rate = (failed / total * 100) if total > 0 else 0
             hourly_failure_rates[hour] = round(failure_rate, 2)
         
-        conn.close()
-        
         return {
             'error_patterns': error_patterns,
             'model_failure_rates': model_failure_rates,
@@ -474,7 +1058,8 @@ class AnalyticsTracker:
             'hourly_usage': self.get_hourly_usage_pattern(days),
             'model_performance': self.get_model_performance(),
             'popular_prompts': self.get_popular_prompts(),
-            'error_analysis': self.get_error_analysis()
+            'error_analysis': self.get_error_analysis(),
+            'quality_stats': self.get_quality_stats(days)
         }
         
         # Save to file
@@ -582,21 +1167,22 @@ class AnalyticsTracker:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_file = f"analytics_data_{timestamp}.{format}"
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.get()
+        # Hot rows first, then each archived month (partitions are synced to
+        # the hot table's columns, so every source has the same layout)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(generations)')]
+        rows = [row for source in self.partitions.scan(conn, f"SELECT {', '.join(columns)} FROM {{generations}}")
+                for row in source]
         
         if format.lower() == 'csv':
-            df = pd.read_sql_query('SELECT * FROM generations', conn)
+            df = pd.DataFrame.from_records(rows, columns=columns)
             df.to_csv(output_file, index=False)
         elif format.lower() == 'json':
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM generations')
-            columns = [description[0] for description in cursor.description]
-            data = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            data = [dict(zip(columns, row)) for row in rows]
             
             with open(output_file, 'w') as f:
                 json.dump(data, f, indent=2, default=str)
         
-        conn.close()
         print(f"Analytics data exported to {output_file}")
         return output_file
 
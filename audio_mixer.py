@@ -0,0 +1,257 @@
+import hashlib
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Tuple, Optional, Dict
+
+from video_probe import VideoProbe
+
+@dataclass
+class MusicSettings:
+    """How a music track is laid under a video."""
+    volume: float = 0.5
+    fade_in: float = 0.0
+    fade_out: float = 0.0
+    loop: bool = True
+    offset: float = 0.0
+    keep_original_audio: bool = False
+    duck: bool = False
+    audio_codec: str = 'aac'
+    audio_bitrate: str = '192k'
+
+def music_filter(duration: float, settings: MusicSettings, with_original: bool) -> str:
+    """
+    Build the filter graph for one mix.
+
+    The music input (looped or not at the demuxer) is trimmed to the video
+    length, faded and scaled. With the original audio kept, the music is
+    optionally ducked under it with a sidechain compressor and then mixed in.
+
+    Args:
+        duration: Video length in seconds
+        settings: Music settings
+        with_original: Mix with the video's own audio stream
+
+    Returns:
+        str: -filter_complex graph whose output pad is [aout]
+    """
+    chain = [f"atrim=0:{duration:.6f}", "asetpts=PTS-STARTPTS"]
+    if settings.fade_in > 0:
+        chain.append(f"afade=t=in:st=0:d={settings.fade_in:.3f}")
+    if settings.fade_out > 0:
+        fade_out = min(settings.fade_out, duration)
+        chain.append(f"afade=t=out:st={duration - fade_out:.6f}:d={fade_out:.3f}")
+    if settings.volume != 1.0:
+        chain.append(f"volume={settings.volume:.4f}")
+
+    if not with_original:
+        return f"[1:a]{','.join(chain)}[aout]"
+
+    graph = f"[1:a]{','.join(chain)}[music];"
+    if settings.duck:
+        graph += ("[0:a]asplit=2[orig][key];"
+                  "[music][key]sidechaincompress=threshold=0.05:ratio=8:attack=20:release=400[ducked];"
+                  "[orig][ducked]")
+    else:
+        graph += "[0:a][music]"
+    return graph + "amix=inputs=2:duration=first:normalize=0[aout]"
+
+class AudioMixer:
+    """
+    Lays music under videos with a bounded pool of ffmpeg workers.
+
+    Each music track is decoded once into a cached PCM WAV intermediate
+    (keyed on path, size and mtime), so every later mix reads raw samples
+    instead of re-decoding the compressed source; concurrent requests for
+    the same track wait for the one decode. A mix copies the video stream,
+    loops or trims the music to the probed video length, applies fades and
+    volume in one filter graph and encodes the audio once.
+
+    Mixes without fades or original audio do not depend on the video
+    length beyond the cut point, so the track is encoded once more into a
+    cached AAC intermediate at the requested volume, and each mix then
+    loops and cuts it by stream copy. Batches run on a thread pool of at
+    most max_workers ffmpeg processes.
+    """
+
+    def __init__(self, cache_dir: str, max_workers: Optional[int] = None,
+                 probe: Optional[VideoProbe] = None):
+        """
+        Args:
+            cache_dir: Directory for decoded music intermediates
+            max_workers: Concurrent ffmpeg processes (defaults to the CPU count)
+            probe: VideoProbe for video durations (a new one if None)
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.probe = probe or VideoProbe()
+        self._lock = threading.Lock()
+        self._track_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, audio_path: str) -> str:
+        """Cache key for a music file (path, size and mtime)."""
+        path = os.path.abspath(audio_path)
+        stat = os.stat(path)
+        return hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def can_copy(settings: MusicSettings) -> bool:
+        """Whether a mix can stream-copy a pre-encoded track (no per-video filtering)."""
+        return (not settings.fade_in and not settings.fade_out
+                and not settings.keep_original_audio and settings.offset <= 0)
+
+    def _build_cached(self, cached_path: str, cmd: List[str], context: str) -> Optional[str]:
+        """Run cmd (whose last argument is replaced by a temp file) once per cached_path."""
+        with self._lock:
+            path_lock = self._track_locks.setdefault(cached_path, threading.Lock())
+
+        with path_lock:
+            if os.path.exists(cached_path):
+                return cached_path
+            # The cache dir may live in a temp dir that was cleaned up since
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            root, ext = os.path.splitext(cached_path)
+            tmp_path = f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+            result = subprocess.run(cmd + [tmp_path], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"FFmpeg error ({context}): {result.stderr.strip()}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+            os.replace(tmp_path, cached_path)
+            return cached_path
+
+    def prepare(self, audio_path: str, settings: Optional[MusicSettings] = None) -> Optional[str]:
+        """
+        Decode a music track into the cache if needed.
+
+        Args:
+            audio_path: Path to the music file
+            settings: When given and can_copy(settings), also encode the
+                stream-copyable intermediate for these settings
+
+        Returns:
+            Path of the cached intermediate (PCM, or encoded for copy mixes),
+            or None if decoding failed
+        """
+        try:
+            key = self.make_key(audio_path)
+        except OSError as e:
+            print(f"Error reading audio track {audio_path}: {e}")
+            return None
+
+        # Keep the source's sample rate and layout; resampling here would only
+        # add work to every later encode
+        pcm_path = self._build_cached(
+            os.path.join(self.cache_dir, key + '.wav'),
+            ['ffmpeg', '-y', '-loglevel', 'error', '-i', audio_path,
+             '-vn', '-map', '0:a:0', '-c:a', 'pcm_s16le'],
+            f'decode {audio_path}')
+        if pcm_path is None or settings is None or not self.can_copy(settings):
+            return pcm_path
+
+        variant = f"{settings.volume:.4f}_{settings.audio_codec}_{settings.audio_bitrate}"
+        return self._build_cached(
+            os.path.join(self.cache_dir, f"{key}_{hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]}.m4a"),
+            ['ffmpeg', '-y', '-loglevel', 'error', '-i', pcm_path,
+             '-filter:a', f'volume={settings.volume:.4f}',
+             '-c:a', settings.audio_codec, '-b:a', settings.audio_bitrate],
+            f'encode {audio_path}')
+
+    def build_command(self, video_path: str, track_path: str, output_path: str,
+                      duration: float, settings: MusicSettings,
+                      with_original: bool) -> List[str]:
+        """ffmpeg command mixing a prepared track (PCM, or encoded for copy mixes) under a video."""
+        cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_path]
+        if settings.loop:
+            cmd += ['-stream_loop', '-1']
+        if settings.offset > 0:
+            cmd += ['-ss', f'{settings.offset:.6f}']
+        cmd += ['-i', track_path]
+        if track_path.endswith('.m4a'):
+            # Pre-encoded at the right volume: loop and cut by packet copy
+            cmd += ['-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', '-t', f'{duration:.6f}']
+        else:
+            cmd += ['-filter_complex', music_filter(duration, settings, with_original),
+                    '-map', '0:v:0', '-map', '[aout]',
+                    '-c:v', 'copy', '-c:a', settings.audio_codec, '-b:a', settings.audio_bitrate]
+        if output_path.lower().endswith(('.mp4', '.m4v', '.mov')):
+            cmd += ['-movflags', '+faststart']
+        cmd.append(output_path)
+        return cmd
+
+    def mix(self, video_path: str, audio_path: str, output_path: str,
+            settings: Optional[MusicSettings] = None) -> bool:
+        """
+        Lay a music track under one video.
+
+        Args:
+            video_path: Path to input video
+            audio_path: Path to the music file
+            output_path: Path to save the result
+            settings: Music settings (defaults if None)
+
+        Returns:
+            bool: Success status
+        """
+        settings = settings or MusicSettings()
+        track_path = self.prepare(audio_path, settings)
+        if track_path is None:
+            return False
+
+        duration = self.probe.probe(video_path).get('duration') or 0.0
+        if duration <= 0:
+            print(f"Cannot determine the duration of {video_path}")
+            return False
+
+        cmd = self.build_command(video_path, track_path, output_path, duration,
+                                 settings, settings.keep_original_audio)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0 and settings.keep_original_audio:
+            # Most likely the video has no audio stream to keep; lay the music alone
+            cmd = self.build_command(video_path, track_path, output_path, duration, settings, False)
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"FFmpeg error (mix {video_path}): {result.stderr.strip()}")
+            return False
+        return True
+
+    def mix_many(self, jobs: List[Tuple[str, str, str]],
+                 settings: Optional[MusicSettings] = None,
+                 mix: Optional[Callable[..., bool]] = None) -> List[bool]:
+        """
+        Lay music under many videos concurrently.
+
+        Distinct tracks are decoded first (once each), then the mixes run on
+        the worker pool; durations are probed in the same pool.
+
+        Args:
+            jobs: (video_path, audio_path, output_path) tuples
+            settings: Music settings shared by every job
+            mix: Called as mix(video_path, audio_path, output_path,
+                settings=settings) for each job instead of self.mix, e.g. to
+                go through a caller's output cache
+
+        Returns:
+            List of success flags, in job order
+        """
+        settings = settings or MusicSettings()
+        mix = mix or self.mix
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(lambda path: self.prepare(path, settings),
+                              {audio_path for _, audio_path, _ in jobs}))
+            return list(executor.map(lambda job: mix(*job, settings=settings), jobs))
+
+    def clear(self):
+        """Remove every cached intermediate."""
+        with self._lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            for name in os.listdir(self.cache_dir):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
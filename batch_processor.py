@@ -9,6 +9,10 @@ import uuid
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
+from media_store import MediaStore
+from quality_scorer import QualityScorer
+from video_fingerprint import NearDuplicateDetector
+
 class BatchStatus(Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -28,6 +32,9 @@ class BatchJob:
     completed_at: Optional[float] = None
     error_message: Optional[str] = None
     output_path: Optional[str] = None
+    content_hash: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    quality: Optional[Dict[str, Any]] = None
     progress: float = 0.0
     
     def __post_init__(self):
@@ -40,16 +47,25 @@ class BatchProcessor:
     Supports queue management, progress tracking, and concurrent processing.
     """
     
-    def __init__(self, max_concurrent_jobs: int = 2, output_dir: str = "batch_outputs"):
+    def __init__(self, max_concurrent_jobs: int = 2, output_dir: str = "batch_outputs",
+                 media_store: Optional[MediaStore] = None,
+                 duplicate_detector: Optional[NearDuplicateDetector] = None,
+                 quality_scorer: Optional[QualityScorer] = None):
         """
         Initialize the batch processor.
         
         Args:
             max_concurrent_jobs: Maximum number of jobs to process concurrently
             output_dir: Directory to save batch outputs
+            media_store: Content-addressed store to ingest job outputs into
+            duplicate_detector: Perceptual index used to flag near-duplicate outputs
+            quality_scorer: Quality gate; jobs whose output fails it are marked failed
         """
         self.max_concurrent_jobs = max_concurrent_jobs
         self.output_dir = output_dir
+        self.media_store = media_store
+        self.duplicate_detector = duplicate_detector
+        self.quality_scorer = quality_scorer
         self.jobs: Dict[str, BatchJob] = {}
         self.queue: List[str] = []  # Job IDs in processing order
         self.active_jobs: Dict[str, threading.Thread] = {}
@@ -251,6 +267,9 @@ class BatchProcessor:
                 break
             
             time.sleep(1)  # Check every second
+        
+        if self.duplicate_detector is not None:
+            self.duplicate_detector.save()
     
     def _process_job(self, job_id: str):
         """
@@ -275,11 +294,15 @@ class BatchProcessor:
             # In a real implementation, this would call the actual generation functions
             self._simulate_generation(job)
             
+            job.output_path = os.path.join(self.output_dir, f"{job_id}.mp4")
+            self._check_quality(job)
+            
             # Mark as completed
             job.status = BatchStatus.COMPLETED
             job.completed_at = time.time()
             job.progress = 100.0
-            job.output_path = os.path.join(self.output_dir, f"{job_id}.mp4")
+            self._ingest_output(job)
+            self._flag_duplicates(job)
             
             self._notify_progress(job_id, 100.0, "Generation completed!")
             self._notify_completion(job_id, BatchStatus.COMPLETED, job.output_path)
@@ -296,6 +319,72 @@ class BatchProcessor:
         finally:
             self.save_jobs()
     
+    def _check_quality(self, job: BatchJob):
+        """
+        Score a job's output and reject it if it fails the quality gate.
+        
+        Runs before ingestion and post-processing, so bad generations are
+        dropped before any further work is spent on them.
+        
+        Args:
+            job: The job whose output was just generated
+        
+        Raises:
+            RuntimeError: If the output fails the quality checks
+        """
+        if self.quality_scorer is None or not job.output_path or not os.path.exists(job.output_path):
+            return
+        
+        job.quality = self.quality_scorer.score(job.output_path, generation_id=job.id)
+        if not job.quality['passed']:
+            raise RuntimeError(f"Quality check failed: {', '.join(job.quality['issues'])}")
+    
+    def _ingest_output(self, job: BatchJob):
+        """
+        Ingest a job's output into the media store, if one is configured.
+        
+        Identical outputs end up hardlinked to a single stored object.
+        
+        Args:
+            job: The completed job
+        """
+        if self.media_store is None or not job.output_path or not os.path.exists(job.output_path):
+            return
+        
+        try:
+            job.content_hash = self.media_store.ingest(job.output_path, metadata={
+                'job_id': job.id,
+                'prompt': job.prompt,
+                'model': job.model
+            })
+            duplicates = len(self.media_store.references(job.content_hash)) - 1
+            if duplicates:
+                print(f"Job {job.id} output is identical to {duplicates} earlier output(s); stored once")
+        except Exception as e:
+            print(f"Error ingesting output for job {job.id}: {e}")
+    
+    def _flag_duplicates(self, job: BatchJob):
+        """
+        Record whether a job's output looks like an earlier output.
+        
+        Catches visually near-identical clips (e.g. from close prompt
+        variations) that are not byte-identical.
+        
+        Args:
+            job: The completed job
+        """
+        if self.duplicate_detector is None or not job.output_path or not os.path.exists(job.output_path):
+            return
+        
+        try:
+            duplicates = self.duplicate_detector.add_video(job.id, job.output_path)
+            if duplicates:
+                job.duplicate_of, distance = duplicates[0]
+                print(f"Job {job.id} output is a near duplicate of job {job.duplicate_of} "
+                      f"(distance {distance})")
+        except Exception as e:
+            print(f"Error fingerprinting output for job {job.id}: {e}")
+    
     def _simulate_generation(self, job: BatchJob):
         """
         Simulate the video generation process with progress updates.
@@ -0,0 +1,829 @@
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+def make_synthetic_video(output_path, width=1280, height=720, frames=120, fps=24):
+    """Writes a synthetic test clip (moving gradient and circle) to output_path."""
+    import cv2
+    import numpy as np
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+    for i in range(frames):
+        frame = np.dstack([gradient, np.roll(gradient, i * 8, axis=1), gradient[:, ::-1]])
+        cv2.circle(frame, ((i * 16) % width, height // 2), height // 8, (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return output_path
+
+def _trace(label, loop):
+    """Runs loop() under tracemalloc and prints peak memory and steady-state per-frame churn."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    frames, churn = loop()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_frame = churn / (frames - 1) if frames > 1 else 0
+    print(f"{label:<10} frames={frames:<5} time={elapsed:6.2f}s  "
+          f"peak={peak / 1e6:8.2f} MB  retained={current / 1e6:6.2f} MB  "
+          f"allocated/frame={per_frame / 1e6:6.2f} MB")
+
+def bench_frame_pool(args):
+    """Compares the allocating enhance/montage loop with the FrameBufferPool loop."""
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageEnhance, ImageFilter
+    from video_processor import FrameBufferPool, VideoProcessor
+
+    settings = {'brightness': 1.1, 'contrast': 1.2, 'saturation': 1.1,
+                'sharpness': 1.1, 'denoise': True}
+    work_dir = tempfile.mkdtemp()
+    processor = VideoProcessor()
+    try:
+        video_path = make_synthetic_video(os.path.join(work_dir, 'input.mp4'),
+                                          args.width, args.height, args.frames)
+
+        def allocating_loop():
+            cap = cv2.VideoCapture(video_path)
+            frames = churn = 0
+            while True:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                pil_image = ImageEnhance.Brightness(pil_image).enhance(settings['brightness'])
+                pil_image = ImageEnhance.Contrast(pil_image).enhance(settings['contrast'])
+                pil_image = ImageEnhance.Color(pil_image).enhance(settings['saturation'])
+                pil_image = ImageEnhance.Sharpness(pil_image).enhance(settings['sharpness'])
+                pil_image = pil_image.filter(ImageFilter.MedianFilter(size=3))
+                enhanced = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+                canvas = np.zeros((args.height, args.width * 2, 3), dtype=np.uint8)
+                canvas[:, :args.width] = enhanced
+                if frames:  # first frame is warm-up (pool allocation)
+                    churn += tracemalloc.get_traced_memory()[1] - before
+                frames += 1
+            cap.release()
+            return frames, churn
+
+        def pooled_loop():
+            cap = cv2.VideoCapture(video_path)
+            pool = FrameBufferPool()
+            canvas = pool.get('canvas', (args.height, args.width * 2, 3), zero=True)
+            frames = churn = 0
+            while True:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                ret, frame = pool.read(cap)
+                if not ret:
+                    break
+                enhanced = processor._enhance_frame(frame, settings, pool)
+                canvas[:, :args.width] = enhanced
+                if frames:  # first frame is warm-up (pool allocation)
+                    churn += tracemalloc.get_traced_memory()[1] - before
+                frames += 1
+            cap.release()
+            return frames, churn
+
+        print(f"Frame pool benchmark: {args.frames} frames at {args.width}x{args.height}")
+        _trace('allocating', allocating_loop)
+        _trace('pooled', pooled_loop)
+    finally:
+        processor.cleanup_temp_files()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_fingerprint_index(args):
+    """Times Hamming-radius lookups in a FingerprintIndex of random signatures."""
+    import numpy as np
+    from video_fingerprint import FingerprintIndex, popcount64
+
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2 ** 64 - 1, args.size, dtype=np.uint64, endpoint=True)
+    index = FingerprintIndex()
+    start = time.perf_counter()
+    index.add_many([str(i) for i in range(args.size)], signatures)
+    print(f"Fingerprint index: {args.size} signatures built in {time.perf_counter() - start:.2f}s")
+
+    # Queries are indexed signatures with a few bits flipped
+    targets = rng.integers(0, args.size, args.queries)
+    queries = []
+    for target in targets:
+        signature = int(signatures[target])
+        for bit in rng.choice(64, args.flip_bits, replace=False):
+            signature ^= 1 << int(bit)
+        queries.append(signature)
+
+    index.query(queries[0], args.max_distance)  # warm-up (builds probe masks)
+    start = time.perf_counter()
+    results = [index.query(query, args.max_distance) for query in queries]
+    elapsed = time.perf_counter() - start
+    found = sum(any(item_id == str(target) for item_id, _ in result)
+                for target, result in zip(targets, results))
+
+    start = time.perf_counter()
+    for query in queries[:10]:
+        popcount64(signatures ^ np.uint64(query))
+    brute = (time.perf_counter() - start) / min(10, len(queries))
+
+    print(f"query (radius {args.max_distance}): {elapsed / len(queries) * 1e3:.3f} ms/query, "
+          f"recall {found}/{len(queries)}")
+    print(f"brute-force scan: {brute * 1e3:.3f} ms/query")
+
+def bench_quality_score(args):
+    """Measures QualityScorer throughput in clips per minute."""
+    from quality_scorer import QualityScorer
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        video_path = make_synthetic_video(os.path.join(work_dir, 'input.mp4'),
+                                          args.width, args.height, args.frames)
+        scorer = QualityScorer(max_workers=args.workers)
+        scores = scorer.score(video_path)
+        print(f"Quality scorer: {args.clips} clips of {args.frames} frames at {args.width}x{args.height}")
+        print("scores: " + ", ".join(f"{key}={value:.3f}" for key, value in scores.items()
+                                     if isinstance(value, float)))
+
+        start = time.perf_counter()
+        scorer.score_many([video_path] * args.clips)
+        elapsed = time.perf_counter() - start
+        print(f"{args.workers} workers: {elapsed:.2f}s, {args.clips / elapsed * 60:.0f} clips/minute")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_splice(args):
+    """Compares stream-copy concat/trim with decoding and re-encoding through OpenCV."""
+    from video_encoder import ffmpeg_available
+    from video_normalizer import NormalizationProfile
+    from video_processor import VideoProcessor
+
+    if not ffmpeg_available():
+        print("The splice benchmark needs ffmpeg on PATH")
+        return
+
+    work_dir = tempfile.mkdtemp()
+    processor = VideoProcessor(enable_cache=False)
+    try:
+        raw_path = make_synthetic_video(os.path.join(work_dir, 'raw.mp4'),
+                                        args.width, args.height, args.frames)
+        # Re-encode to H.264 segments, as delivered by the generation APIs
+        profile = NormalizationProfile(args.width, args.height, 24.0)
+        segments = [os.path.join(work_dir, f'segment_{i}.mp4') for i in range(args.segments)]
+        for segment in segments:
+            processor.normalize_video(raw_path, segment, profile)
+        duration = processor.get_video_info(segments[0])['duration'] * len(segments)
+
+        def timed(label, func):
+            start = time.perf_counter()
+            ok = func()
+            print(f"{label:<28} {time.perf_counter() - start:7.3f}s  ok={ok}")
+
+        print(f"Splice benchmark: {args.segments} segments of {args.frames} frames")
+        timed('concat (stream copy)', lambda: processor.concat_videos(
+            segments, os.path.join(work_dir, 'concat.mp4')))
+        timed('concat (OpenCV re-encode)', lambda: processor._concat_opencv(
+            segments, os.path.join(work_dir, 'concat_cv.mp4')))
+        concat_path = os.path.join(work_dir, 'concat.mp4')
+        start, end = duration * 0.3 + 0.01, duration * 0.7 + 0.01
+        timed('trim (boundary GOPs only)', lambda: processor.trim_video(
+            concat_path, os.path.join(work_dir, 'trim.mp4'), start, end))
+        timed('trim (keyframe copy)', lambda: processor.trim_video(
+            concat_path, os.path.join(work_dir, 'trim_fast.mp4'), start, end, accurate=False))
+        timed('trim (OpenCV re-encode)', lambda: processor._trim_opencv(
+            concat_path, os.path.join(work_dir, 'trim_cv.mp4'), start, end))
+    finally:
+        processor.cleanup_temp_files()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_frame_cache(args):
+    """Compares decoding through cv2.VideoCapture with reading a FrameCache memmap."""
+    import cv2
+    import numpy as np
+    from frame_cache import FrameCache
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        video_path = make_synthetic_video(os.path.join(work_dir, 'input.mp4'),
+                                          args.width, args.height, args.frames)
+        cache = FrameCache(os.path.join(work_dir, 'frames'))
+        indices = np.random.default_rng(0).integers(0, args.frames, args.fetches)
+        print(f"Frame cache benchmark: {args.frames} frames at {args.width}x{args.height}")
+
+        def sequential(cap):
+            frames = 0
+            buf = None
+            while True:
+                ret, frame = cap.read(image=buf) if buf is not None else cap.read()
+                if not ret:
+                    break
+                buf = frame
+                frames += 1
+            cap.release()
+            return frames
+
+        start = time.perf_counter()
+        sequential(cv2.VideoCapture(video_path))
+        decode_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cached = cache.load(video_path)
+        populate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sequential(cache.capture(video_path))
+        cached_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cap = cv2.VideoCapture(video_path)
+        for index in indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            cap.read()
+        cap.release()
+        seek_fetch = (time.perf_counter() - start) / args.fetches
+
+        start = time.perf_counter()
+        for index in indices:
+            np.array(cached[int(index)])
+        cached_fetch = (time.perf_counter() - start) / args.fetches
+
+        print(f"sequential pass: decode {decode_pass:.3f}s, cached {cached_pass:.3f}s "
+              f"(first-time population {populate:.3f}s)")
+        print(f"random fetch:    seek+decode {seek_fetch * 1e3:.2f} ms, cached {cached_fetch * 1e3:.3f} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_stabilize(args):
+    """Times both stabilization passes on a synthetic jittered clip and reports residual jitter."""
+    import cv2
+    import numpy as np
+    from video_stabilizer import VideoStabilizer, estimate_motion
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(0)
+        margin = 40
+        scene = (rng.random((args.height // 8, args.width // 8, 3)) * 255).astype(np.uint8)
+        scene = cv2.resize(scene, (args.width + 2 * margin, args.height + 2 * margin),
+                           interpolation=cv2.INTER_CUBIC)
+        video_path = os.path.join(work_dir, 'jitter.mp4')
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (args.width, args.height))
+        for _ in range(args.frames):
+            dx, dy = rng.normal(0, args.jitter, 2)
+            matrix = np.float32([[1, 0, dx - margin], [0, 1, dy - margin]])
+            writer.write(cv2.warpAffine(scene, matrix, (args.width, args.height)))
+        writer.release()
+
+        stabilizer = VideoStabilizer(segment_frames=args.segment_frames, max_workers=args.workers)
+        print(f"Stabilization benchmark: {args.frames} frames at {args.width}x{args.height}, "
+              f"{args.workers} workers")
+
+        start = time.perf_counter()
+        transforms = stabilizer.estimate(video_path)
+        estimate_time = time.perf_counter() - start
+        matrices = stabilizer.matrices(transforms, (args.width, args.height))
+
+        output_path = os.path.join(work_dir, 'stable.avi')
+        start = time.perf_counter()
+        cap = cv2.VideoCapture(video_path)
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (args.width, args.height))
+        warped = np.empty((args.height, args.width, 3), dtype=np.uint8)
+        for matrix in matrices:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(stabilizer.warp(frame, matrix, dst=warped))
+        cap.release()
+        writer.release()
+        warp_time = time.perf_counter() - start
+
+        before = np.abs(transforms[1:, :2]).mean()
+        after = np.abs(estimate_motion(output_path)[1:, :2]).mean()
+        print(f"pass 1 (motion): {estimate_time:.2f}s ({args.frames / estimate_time:.0f} fps)")
+        print(f"pass 2 (warp):   {warp_time:.2f}s ({args.frames / warp_time:.0f} fps, includes decode/encode)")
+        print(f"mean inter-frame motion: {before:.2f}px -> {after:.2f}px")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _generation_events(count, seed=0, days=30, vocabulary=None):
+    """Synthetic GenerationEvents spread over the last days (prompt words Zipf-distributed if vocabulary)."""
+    import itertools
+    import random
+    from datetime import datetime, timedelta
+    from analytics_tracker import GenerationEvent
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    models = ['RunwayML', 'ModelScope', 'ZeroScope', 'AnimateDiff']
+    resolutions = ['1280:720', '1920:1080', '768:768']
+    words = ['cat', 'city', 'ocean', 'forest', 'neon', 'sunset', 'robot', 'dragon', 'mountain', 'rain']
+    cum_weights = None
+    if vocabulary:
+        words = [f"word{i}" for i in range(vocabulary)]
+        cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(vocabulary)))
+    errors = ['Timeout after 300s', 'CUDA out of memory', 'Invalid prompt: too long',
+              'Rate limit exceeded for key 1234']
+    for i in range(count):
+        status = rng.choices(['success', 'failed', 'cancelled'], [0.85, 0.12, 0.03])[0]
+        yield GenerationEvent(
+            id=f"gen_{seed}_{i}",
+            timestamp=now - timedelta(seconds=rng.uniform(0, days * 86400)),
+            prompt=' '.join(rng.choices(words, cum_weights=cum_weights, k=6)),
+            model=rng.choice(models),
+            duration=rng.choice([4.0, 5.0, 10.0]),
+            resolution=rng.choice(resolutions),
+            status=status,
+            processing_time=rng.uniform(20, 120),
+            error_message=rng.choice(errors) if status == 'failed' else None,
+            file_size=rng.randint(10 ** 6, 10 ** 7),
+            user_rating=rng.randint(1, 5) if status == 'success' and rng.random() < 0.3 else None
+        )
+
+def bench_analytics_write(args):
+    """Compares connect-per-call writes with AnalyticsTracker's pooled and buffered writes."""
+    import sqlite3
+    import threading
+    from analytics_tracker import AnalyticsTracker
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        per_thread = args.events // args.threads
+        batches = [list(_generation_events(per_thread, seed)) for seed in range(args.threads)]
+        total = per_thread * args.threads
+        print(f"Analytics write benchmark: {total} events from {args.threads} threads")
+
+        def run(label, write):
+            threads = [threading.Thread(target=lambda batch=batch: [write(e) for e in batch])
+                       for batch in batches]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<18} {elapsed:7.2f}s  {total / elapsed:9.0f} events/s")
+
+        # Baseline: the previous access pattern (a fresh connection per call,
+        # rollback journal, full sync), with both writes on one connection
+        baseline = AnalyticsTracker(os.path.join(work_dir, 'baseline.db'),
+                                    pragmas={'journal_mode': 'DELETE', 'synchronous': 'FULL'})
+        baseline.close()
+
+        def connect_per_call(event):
+            conn = sqlite3.connect(baseline.db_path, timeout=60)
+            cursor = conn.cursor()
+            cursor.execute('INSERT OR REPLACE INTO generations (id, timestamp, prompt, model, duration, '
+                           'resolution, status, processing_time, error_message, file_size, user_rating, tags) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (event.id, event.timestamp.isoformat(), event.prompt, event.model,
+                            event.duration, event.resolution, event.status, event.processing_time,
+                            event.error_message, event.file_size, event.user_rating, None))
+            baseline._update_usage_stats(cursor, [event])
+            conn.commit()
+            conn.close()
+
+        run("connect-per-call", connect_per_call)
+
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'pooled.db'))
+        run("pooled WAL", tracker.track_generation)
+        tracker.close()
+
+        # Async: the timed part is what generation threads wait for; the
+        # drain is reported separately
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'async.db'), async_writes=True)
+        run("async (enqueue)", tracker.track_generation)
+        start = time.perf_counter()
+        tracker.close()
+        print(f"{'async (drain)':<18} {time.perf_counter() - start:7.2f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _seed_tracker(tracker, rows, chunk=50000, days=30, vocabulary=None):
+    """Bulk-loads synthetic events through the tracker's write path."""
+    for start in range(0, rows, chunk):
+        tracker.track_generations(list(_generation_events(min(chunk, rows - start), seed=start, days=days,
+                                                          vocabulary=vocabulary)))
+
+def bench_analytics_query(args):
+    """Times the dashboard queries and fails if any plan scans the generations table."""
+    from analytics_tracker import AnalyticsTracker
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'analytics.db'))
+        start = time.perf_counter()
+        _seed_tracker(tracker, args.rows)
+        print(f"Seeded {args.rows} generations in {time.perf_counter() - start:.1f}s")
+
+        conn = tracker.db.get()
+        statements = []
+        dashboards = [
+            ('get_generation_stats', lambda: tracker.get_generation_stats(args.days)),
+            ('get_hourly_usage_pattern', lambda: tracker.get_hourly_usage_pattern(args.days)),
+            ('get_error_analysis', tracker.get_error_analysis),
+            ('get_model_performance', tracker.get_model_performance),
+            ('get_popular_prompts', tracker.get_popular_prompts),
+        ]
+        # Any schema's copy (main, an attached partition), with or without an index
+        table_scan = re.compile(r'SCAN (?:\w+\.)?generations\b')
+        scans = 0
+        for name, query in dashboards:
+            del statements[:]
+            conn.set_trace_callback(statements.append)
+            start = time.perf_counter()
+            query()
+            elapsed = time.perf_counter() - start
+            conn.set_trace_callback(None)
+            print(f"\n{name}: {elapsed * 1e3:.1f} ms")
+            for sql in statements:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+                # Dashboards read rollups and indexed ranges; walking generations never scales
+                flagged = any(table_scan.match(step) for step in plan)
+                scans += flagged
+                print(f"  {'FULL SCAN ' if flagged else ''}{' '.join(sql.split())[:90]}")
+                for step in plan:
+                    print(f"      {step}")
+        tracker.close()
+        if scans:
+            raise SystemExit(f"\n{scans} dashboard queries scan the generations table")
+        print("\nNo dashboard query scans the generations table")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _seven_query_stats(conn, start_epoch):
+    """The previous get_generation_stats: one query per figure over the same window."""
+    window = (start_epoch,)
+    total = conn.execute('SELECT COUNT(*) FROM generations WHERE epoch >= ?', window).fetchone()[0]
+    statuses = conn.execute("""
+        SELECT SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END)
+        FROM generations WHERE epoch >= ?""", window).fetchone()
+    avg_time = conn.execute('SELECT AVG(processing_time) FROM generations '
+                            'WHERE epoch >= ? AND processing_time IS NOT NULL', window).fetchone()[0]
+    models = dict(conn.execute('SELECT model, COUNT(*) AS count FROM generations WHERE epoch >= ? '
+                               'GROUP BY model ORDER BY count DESC', window).fetchall())
+    resolutions = dict(conn.execute('SELECT resolution, COUNT(*) AS count FROM generations WHERE epoch >= ? '
+                                    'GROUP BY resolution ORDER BY count DESC LIMIT 5', window).fetchall())
+    avg_duration = conn.execute('SELECT AVG(duration) FROM generations WHERE epoch >= ?', window).fetchone()[0]
+    daily = dict(conn.execute('SELECT date, COUNT(*) FROM generations WHERE epoch >= ? '
+                              'GROUP BY date ORDER BY date', window).fetchall())
+    return total, statuses, avg_time, models, resolutions, avg_duration, daily
+
+def bench_analytics_stats(args):
+    """Compares the seven-query generation stats with AnalyticsTracker.get_generation_stats."""
+    from datetime import datetime, timedelta
+    from analytics_tracker import AnalyticsTracker
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'analytics.db'))
+        start = time.perf_counter()
+        _seed_tracker(tracker, args.rows)
+        print(f"Seeded {args.rows} generations in {time.perf_counter() - start:.1f}s")
+        conn = tracker.db.get()
+
+        for days in args.days:
+            start_epoch = int((datetime.now() - timedelta(days=days)).timestamp())
+            timings = {}
+            for label, query in (('seven queries', lambda: _seven_query_stats(conn, start_epoch)),
+                                 ('tracker', lambda: tracker.get_generation_stats(days))):
+                query()  # warm the page cache
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    result = query()
+                timings[label] = (time.perf_counter() - start) / args.repeat
+            print(f"{days:>3}-day window: seven queries {timings['seven queries'] * 1e3:8.1f} ms, "
+                  f"tracker {timings['tracker'] * 1e3:8.1f} ms "
+                  f"({timings['seven queries'] / timings['tracker']:.1f}x)")
+        tracker.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_analytics_rollups(args):
+    """Compares raw generations scans with the rollup-tier reads over long windows."""
+    from datetime import datetime, timedelta
+    import numpy as np
+    from analytics_tracker import AnalyticsTracker
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'analytics.db'))
+        start = time.perf_counter()
+        _seed_tracker(tracker, args.rows, days=args.span_days)
+        print(f"Seeded {args.rows} generations over {args.span_days} days "
+              f"in {time.perf_counter() - start:.1f}s")
+        conn = tracker.db.get()
+        for tier in ('minute', 'hour', 'day'):
+            count = conn.execute(f'SELECT COUNT(*) FROM rollup_{tier}').fetchone()[0]
+            print(f"rollup_{tier}: {count} rows")
+
+        def timed(query):
+            query()  # warm the page cache
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                query()
+            return (time.perf_counter() - start) / args.repeat
+
+        for days in args.days:
+            start_epoch = (datetime.now() - timedelta(days=days)).timestamp()
+            ranges = tracker.rollups.ranges(start_epoch, time.time())
+            rows = sum(conn.execute(f'SELECT COUNT(*) FROM rollup_{tier} WHERE bucket >= ? AND bucket < ?',
+                                    (lo, hi)).fetchone()[0] for tier, lo, hi in ranges)
+            raw = timed(lambda: conn.execute(
+                'SELECT date, model, resolution, status, COUNT(*), SUM(processing_time), '
+                'COUNT(processing_time), SUM(duration) FROM generations WHERE epoch >= ? '
+                'GROUP BY 1, 2, 3, 4', (int(start_epoch),)).fetchall())
+            rolled = timed(lambda: tracker.get_generation_stats(days))
+            print(f"{days:>4}-day stats:   raw scan {raw * 1e3:8.1f} ms, rollups {rolled * 1e3:6.1f} ms "
+                  f"({raw / rolled:.0f}x, {rows} rollup rows in {len(ranges)} ranges)")
+
+        raw = timed(lambda: conn.execute('SELECT hour, COUNT(*) FROM generations WHERE epoch >= ? '
+                                         'GROUP BY hour', (int(time.time()) - args.span_days * 86400,)).fetchall())
+        rolled = timed(lambda: tracker.get_hourly_usage_pattern(args.span_days))
+        print(f"hourly pattern:  raw scan {raw * 1e3:8.1f} ms, rollups {rolled * 1e3:6.1f} ms ({raw / rolled:.0f}x)")
+
+        def exact_percentiles():
+            # What percentiles cost without sketches: every sample, sorted per series
+            conn.execute('SELECT model, COUNT(*), AVG(processing_time), AVG(duration), '
+                         'AVG(user_rating) FROM generations GROUP BY model').fetchall()
+            samples = {}
+            for model, resolution, value in conn.execute(
+                    'SELECT model, resolution, processing_time FROM generations '
+                    'WHERE processing_time IS NOT NULL'):
+                samples.setdefault((model, resolution), []).append(value)
+            return {key: np.percentile(values, [50, 95, 99], method='lower')
+                    for key, values in samples.items()}
+
+        raw = timed(exact_percentiles)
+        rolled = timed(tracker.get_model_performance)
+        print(f"model perf:      raw scan {raw * 1e3:8.1f} ms, rollups {rolled * 1e3:6.1f} ms ({raw / rolled:.0f}x)")
+        performance = tracker.get_model_performance()
+        error = max(abs(performance[model]['resolutions'][resolution][f'p{p}_processing_time'] - exact) / exact
+                    for (model, resolution), values in exact_percentiles().items()
+                    for p, exact in zip((50, 95, 99), values))
+        print(f"p50/p95/p99 per model and resolution: largest relative error {error * 100:.2f}%")
+        tracker.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_analytics_retention(args):
+    """Hot database size and query times before and after archiving old raw rows."""
+    from analytics_tracker import AnalyticsTracker
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(work_dir, 'analytics.db')
+        tracker = AnalyticsTracker(db_path, retention_days=args.retention_days)
+        _seed_tracker(tracker, args.rows, days=args.span_days)
+        conn = tracker.db.get()
+
+        def report(label):
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            timings = []
+            for query in (lambda: tracker.get_generation_stats(30), tracker.get_error_analysis):
+                start = time.perf_counter()
+                query()
+                timings.append(time.perf_counter() - start)
+            hot = conn.execute('SELECT COUNT(*) FROM generations').fetchone()[0]
+            print(f"{label:<15} hot rows {hot:>8}  file {os.path.getsize(db_path) / 2 ** 20:6.1f} MiB  "
+                  f"30-day stats {timings[0] * 1e3:6.1f} ms  error analysis {timings[1] * 1e3:7.1f} ms")
+
+        print(f"{args.rows} generations over {args.span_days} days, "
+              f"{args.retention_days} days kept raw")
+        report("before")
+        start = time.perf_counter()
+        summary = tracker.maintain()
+        print(f"maintain: {summary} in {time.perf_counter() - start:.1f}s")
+        report("after")
+        partitions = conn.execute('SELECT COUNT(*) FROM partitions').fetchone()[0]
+        archive_bytes = sum(os.path.getsize(path) for _, path in tracker.partitions.partitions(conn.cursor()))
+        print(f"{partitions} monthly partitions, {archive_bytes / 2 ** 20:.1f} MiB")
+        tracker.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_analytics_keywords(args):
+    """Popular-prompt queries from the keyword summaries vs tokenizing every prompt."""
+    from collections import Counter
+    from analytics_rollups import bucket_start
+    from analytics_tracker import AnalyticsTracker
+    from prompt_keywords import tokenize_prompt
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'analytics.db'))
+        start = time.perf_counter()
+        _seed_tracker(tracker, args.rows, chunk=args.chunk, days=args.span_days, vocabulary=args.vocabulary)
+        print(f"Seeded {args.rows} generations ({args.vocabulary}-word vocabulary, "
+              f"{args.chunk} per batch) in {time.perf_counter() - start:.1f}s")
+        conn = tracker.db.get()
+        summary_rows = conn.execute('SELECT COUNT(*) FROM keyword_counts').fetchone()[0]
+        print(f"{summary_rows} keyword summary rows")
+
+        for days in [None] + args.days:
+            since = None if days is None else bucket_start(time.time() - days * 86400, 'day')
+            start = time.perf_counter()
+            exact = Counter()
+            for (prompt,) in conn.execute("SELECT prompt FROM generations WHERE status = 'success'"
+                                          + ("" if since is None else " AND epoch >= ?"),
+                                          () if since is None else (since,)):
+                exact.update(tokenize_prompt(prompt))
+            expected = exact.most_common(args.limit)
+            scan_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                top = tracker.get_popular_prompts(args.limit, days)
+            index_time = (time.perf_counter() - start) / args.repeat
+
+            overlap = len({word for word, _ in top} & {word for word, _ in expected})
+            worst = max(abs(count - exact[word]) / exact[word] for word, count in top) if top else 0
+            label = "all time" if days is None else f"{days} days"
+            print(f"{label:<10} scan {scan_time * 1e3:8.1f} ms  summaries {index_time * 1e3:7.2f} ms  "
+                  f"top-{args.limit} overlap {overlap}/{len(expected)}  max count error {worst:.2%}")
+        tracker.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_analytics_errors(args):
+    """Error analysis grouped by mined templates vs by raw message, with per-event ids in the messages."""
+    import random
+    import uuid
+    from analytics_tracker import AnalyticsTracker
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        tracker = AnalyticsTracker(os.path.join(work_dir, 'analytics.db'))
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for offset in range(0, args.rows, 50000):
+            events = list(_generation_events(min(50000, args.rows - offset), seed=offset))
+            for event in events:
+                if event.error_message:
+                    # Real failures carry job ids, URLs and timestamps
+                    event.error_message += (f" (job {uuid.UUID(int=rng.getrandbits(128))} at "
+                                            f"{event.timestamp.isoformat()}, "
+                                            f"https://api.example.com/tasks/{rng.getrandbits(32):x})")
+            tracker.track_generations(events)
+        print(f"Seeded {args.rows} generations in {time.perf_counter() - start:.1f}s")
+        conn = tracker.db.get()
+
+        start = time.perf_counter()
+        raw = conn.execute("""
+            SELECT error_message, COUNT(*) FROM generations
+            WHERE status = 'failed' AND error_message IS NOT NULL
+            GROUP BY error_message
+        """).fetchall()
+        raw_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            patterns = tracker.get_error_analysis()['error_patterns']
+        template_time = (time.perf_counter() - start) / args.repeat
+
+        failures = sum(count for _, count in raw)
+        print(f"{failures} failures")
+        print(f"raw message GROUP BY  {raw_time * 1e3:8.1f} ms  {len(raw):>8} patterns")
+        print(f"template GROUP BY     {template_time * 1e3:8.1f} ms  {len(patterns):>8} patterns "
+              f"(counts add up: {sum(patterns.values()) == failures})")
+        for template, count in patterns.items():
+            print(f"  {count:>8}  {template}")
+        tracker.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for the video processing and analytics modules."
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    frame_pool = subparsers.add_parser(
+        "frame-pool", help="tracemalloc comparison of allocating vs pooled frame loops"
+    )
+    frame_pool.add_argument("--width", type=int, default=1280, help="Synthetic clip width")
+    frame_pool.add_argument("--height", type=int, default=720, help="Synthetic clip height")
+    frame_pool.add_argument("--frames", type=int, default=120, help="Synthetic clip length in frames")
+    frame_pool.set_defaults(func=bench_frame_pool)
+
+    fingerprint = subparsers.add_parser(
+        "fingerprint-index", help="Hamming nearest-neighbour lookups over random signatures"
+    )
+    fingerprint.add_argument("--size", type=int, default=1_000_000, help="Indexed signatures")
+    fingerprint.add_argument("--queries", type=int, default=1000, help="Lookups to time")
+    fingerprint.add_argument("--flip-bits", type=int, default=6, help="Bits flipped in each query")
+    fingerprint.add_argument("--max-distance", type=int, default=10, help="Hamming search radius")
+    fingerprint.set_defaults(func=bench_fingerprint_index)
+
+    quality = subparsers.add_parser(
+        "quality-score", help="QualityScorer throughput on a synthetic clip"
+    )
+    quality.add_argument("--width", type=int, default=1280, help="Synthetic clip width")
+    quality.add_argument("--height", type=int, default=720, help="Synthetic clip height")
+    quality.add_argument("--frames", type=int, default=120, help="Synthetic clip length in frames")
+    quality.add_argument("--clips", type=int, default=50, help="Clips to score")
+    quality.add_argument("--workers", type=int, default=4, help="Scoring threads")
+    quality.set_defaults(func=bench_quality_score)
+
+    splice = subparsers.add_parser(
+        "splice", help="stream-copy concat/trim vs OpenCV re-encoding (needs ffmpeg)"
+    )
+    splice.add_argument("--width", type=int, default=1280, help="Synthetic clip width")
+    splice.add_argument("--height", type=int, default=720, help="Synthetic clip height")
+    splice.add_argument("--frames", type=int, default=120, help="Frames per segment")
+    splice.add_argument("--segments", type=int, default=6, help="Segments to join")
+    splice.set_defaults(func=bench_splice)
+
+    frame_cache = subparsers.add_parser(
+        "frame-cache", help="VideoCapture decode vs memory-mapped FrameCache reads"
+    )
+    frame_cache.add_argument("--width", type=int, default=1280, help="Synthetic clip width")
+    frame_cache.add_argument("--height", type=int, default=720, help="Synthetic clip height")
+    frame_cache.add_argument("--frames", type=int, default=120, help="Synthetic clip length in frames")
+    frame_cache.add_argument("--fetches", type=int, default=100, help="Random frame fetches to time")
+    frame_cache.set_defaults(func=bench_frame_cache)
+
+    stabilize = subparsers.add_parser(
+        "stabilize", help="Two-pass stabilization throughput and residual jitter"
+    )
+    stabilize.add_argument("--width", type=int, default=1280, help="Synthetic clip width")
+    stabilize.add_argument("--height", type=int, default=720, help="Synthetic clip height")
+    stabilize.add_argument("--frames", type=int, default=240, help="Synthetic clip length in frames")
+    stabilize.add_argument("--jitter", type=float, default=4.0, help="Camera shake std-dev in pixels")
+    stabilize.add_argument("--segment-frames", type=int, default=120, help="Frames per motion segment")
+    stabilize.add_argument("--workers", type=int, default=4, help="Threads for motion estimation")
+    stabilize.set_defaults(func=bench_stabilize)
+
+    analytics_write = subparsers.add_parser(
+        "analytics-write", help="AnalyticsTracker write throughput from several threads"
+    )
+    analytics_write.add_argument("--events", type=int, default=4000, help="Total events to write")
+    analytics_write.add_argument("--threads", type=int, default=4, help="Writer threads")
+    analytics_write.set_defaults(func=bench_analytics_write)
+
+    analytics_query = subparsers.add_parser(
+        "analytics-query", help="Dashboard query timings and query-plan checks"
+    )
+    analytics_query.add_argument("--rows", type=int, default=200000, help="Generations to seed")
+    analytics_query.add_argument("--days", type=int, default=7, help="Dashboard window in days")
+    analytics_query.set_defaults(func=bench_analytics_query)
+
+    analytics_stats = subparsers.add_parser(
+        "analytics-stats", help="get_generation_stats: seven raw queries vs the tracker"
+    )
+    analytics_stats.add_argument("--rows", type=int, default=5000000, help="Generations to seed")
+    analytics_stats.add_argument("--days", type=int, nargs="+", default=[1, 7, 30],
+                                 help="Dashboard windows in days")
+    analytics_stats.add_argument("--repeat", type=int, default=3, help="Timed runs per window")
+    analytics_stats.set_defaults(func=bench_analytics_stats)
+
+    analytics_rollups = subparsers.add_parser(
+        "analytics-rollups", help="Raw generations scans vs minute/hour/day rollup and sketch reads"
+    )
+    analytics_rollups.add_argument("--rows", type=int, default=1000000, help="Generations to seed")
+    analytics_rollups.add_argument("--span-days", type=int, default=365, help="Days the seeded events cover")
+    analytics_rollups.add_argument("--days", type=int, nargs="+", default=[1, 30, 365],
+                                   help="Dashboard windows in days")
+    analytics_rollups.add_argument("--repeat", type=int, default=3, help="Timed runs per query")
+    analytics_rollups.set_defaults(func=bench_analytics_rollups)
+
+    analytics_retention = subparsers.add_parser(
+        "analytics-retention", help="Hot database size and queries before/after archiving to partitions"
+    )
+    analytics_retention.add_argument("--rows", type=int, default=500000, help="Generations to seed")
+    analytics_retention.add_argument("--span-days", type=int, default=365, help="Days the seeded events cover")
+    analytics_retention.add_argument("--retention-days", type=int, default=30, help="Days of raw rows kept hot")
+    analytics_retention.set_defaults(func=bench_analytics_retention)
+
+    analytics_keywords = subparsers.add_parser(
+        "analytics-keywords", help="Top prompt keywords from the heavy-hitter summaries vs a full scan"
+    )
+    analytics_keywords.add_argument("--rows", type=int, default=500000, help="Generations to seed")
+    analytics_keywords.add_argument("--span-days", type=int, default=90, help="Days the seeded events cover")
+    analytics_keywords.add_argument("--vocabulary", type=int, default=50000, help="Distinct prompt words")
+    analytics_keywords.add_argument("--chunk", type=int, default=500, help="Events per write batch")
+    analytics_keywords.add_argument("--days", type=int, nargs="+", default=[1, 7, 30],
+                                    help="Query windows in days")
+    analytics_keywords.add_argument("--limit", type=int, default=20, help="Keywords per query")
+    analytics_keywords.add_argument("--repeat", type=int, default=20, help="Timed runs per query")
+    analytics_keywords.set_defaults(func=bench_analytics_keywords)
+
+    analytics_errors = subparsers.add_parser(
+        "analytics-errors", help="Error patterns from mined templates vs grouping raw messages"
+    )
+    analytics_errors.add_argument("--rows", type=int, default=1000000, help="Generations to seed")
+    analytics_errors.add_argument("--repeat", type=int, default=5, help="Timed runs of the analysis")
+    analytics_errors.set_defaults(func=bench_analytics_errors)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Tuple, Optional, Dict, Any
+
+import cv2
+import numpy as np
+
+class CachedFrames:
+    """Read-only view of one clip's decoded frames, memory-mapped from disk."""
+
+    def __init__(self, frames_path: str, meta: Dict[str, Any]):
+        self.path = frames_path
+        self.meta = meta
+        self.fps = meta['fps']
+        self.frames = np.memmap(frames_path, dtype=np.uint8, mode='r',
+                                shape=(meta['frame_count'], meta['height'], meta['width'], 3))
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index) -> np.ndarray:
+        return self.frames[index]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) of the frames."""
+        return self.meta['width'], self.meta['height']
+
+class CachedCapture:
+    """
+    cv2.VideoCapture stand-in that serves frames from a CachedFrames map.
+
+    Supports the subset the processors use: isOpened, read(image=...),
+    grab, get/set of the position, fps, size and frame count, and release.
+    read() copies into the caller's buffer (the map itself is read-only);
+    grab() only moves the position.
+    """
+
+    def __init__(self, cached: CachedFrames):
+        self.cached = cached
+        self.position = 0
+
+    def isOpened(self) -> bool:
+        return self.cached is not None
+
+    def grab(self) -> bool:
+        if self.cached is None or self.position >= len(self.cached):
+            return False
+        self.position += 1
+        return True
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.cached is None or self.position >= len(self.cached):
+            return False, None
+        frame = self.cached.frames[self.position]
+        self.position += 1
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, np.array(frame)
+
+    def get(self, prop: int) -> float:
+        if self.cached is None:
+            return 0.0
+        values = {
+            cv2.CAP_PROP_FPS: self.cached.fps,
+            cv2.CAP_PROP_FRAME_WIDTH: self.cached.size[0],
+            cv2.CAP_PROP_FRAME_HEIGHT: self.cached.size[1],
+            cv2.CAP_PROP_FRAME_COUNT: len(self.cached),
+            cv2.CAP_PROP_POS_FRAMES: self.position,
+        }
+        return float(values.get(prop, 0.0))
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != cv2.CAP_PROP_POS_FRAMES or self.cached is None:
+            return False
+        self.position = int(min(max(value, 0), len(self.cached)))
+        return True
+
+    def release(self):
+        self.cached = None
+
+class FrameCache:
+    """
+    On-disk cache of fully decoded clips for repeated editing passes.
+
+    Each clip is decoded once into a raw uint8 (frames, height, width, 3)
+    file plus a small JSON header, and later opened with np.memmap in
+    read-only mode. Worker processes that open the same clip share the pages
+    through the OS page cache, random frame access is a slice, and repeat
+    passes never touch the decoder.
+
+    Entries are keyed on the source path, size and mtime, so an edited
+    source gets a new entry. Files are written under temporary names and
+    renamed into place, and recency is tracked with the frame file's mtime
+    rather than a shared index, so several processes can use one cache
+    directory. Least-recently-used entries are evicted when the total size
+    exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 4 * 1024 ** 3,
+                 max_clip_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir: Directory holding the frame files (ideally on local disk)
+            max_bytes: Disk budget for all cached clips
+            max_clip_bytes: Largest single clip to cache (defaults to half the budget)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_clip_bytes = max_clip_bytes or max_bytes // 2
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, video_path: str) -> str:
+        """Cache key for a source file (path, size and mtime)."""
+        path = os.path.abspath(video_path)
+        stat = os.stat(path)
+        return hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + '.frames', base + '.json'
+
+    def get(self, video_path: str) -> Optional[CachedFrames]:
+        """
+        Open a clip's cached frames without decoding.
+
+        Args:
+            video_path: Source video
+
+        Returns:
+            CachedFrames, or None if the clip is not cached
+        """
+        try:
+            frames_path, meta_path = self._paths(self.make_key(video_path))
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            cached = CachedFrames(frames_path, meta)
+            os.utime(frames_path)  # mark as recently used
+            return cached
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def load(self, video_path: str) -> Optional[CachedFrames]:
+        """
+        Open a clip's cached frames, decoding it into the cache first if needed.
+
+        Args:
+            video_path: Source video
+
+        Returns:
+            CachedFrames, or None if the clip cannot be read or exceeds max_clip_bytes
+        """
+        cached = self.get(video_path)
+        if cached is not None:
+            return cached
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return None
+
+        try:
+            key = self.make_key(video_path)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            frame_bytes = width * height * 3
+            expected = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) * frame_bytes
+            if not frame_bytes or expected > self.max_clip_bytes:
+                return None
+
+            self.evict(reserve=expected)
+            frames_path, meta_path = self._paths(key)
+            suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+            count = 0
+            decode_buf = None
+            try:
+                # Stream raw frames straight to disk; only one decode buffer is live
+                with open(frames_path + suffix, 'wb') as f:
+                    while True:
+                        ret, frame = cap.read(image=decode_buf) if decode_buf is not None else cap.read()
+                        if not ret:
+                            break
+                        decode_buf = frame
+                        if frame.shape != (height, width, 3):
+                            break
+                        f.write(frame.data)
+                        count += 1
+                        if (count + 1) * frame_bytes > self.max_clip_bytes:
+                            raise OverflowError
+                if not count:
+                    os.remove(frames_path + suffix)
+                    return None
+
+                meta = {'source': os.path.abspath(video_path), 'fps': fps, 'width': width,
+                        'height': height, 'frame_count': count, 'created': time.time()}
+                with open(meta_path + suffix, 'w') as f:
+                    json.dump(meta, f)
+                # Header first, so a visible frame file always has its header
+                os.replace(meta_path + suffix, meta_path)
+                os.replace(frames_path + suffix, frames_path)
+            except (OverflowError, OSError) as e:
+                if not isinstance(e, OverflowError):
+                    print(f"Error caching frames of {video_path}: {e}")
+                for path in (frames_path + suffix, meta_path + suffix):
+                    if os.path.exists(path):
+                        os.remove(path)
+                return None
+        finally:
+            cap.release()
+
+        return CachedFrames(frames_path, meta)
+
+    def capture(self, video_path: str):
+        """
+        Open a clip for sequential reading, from the cache when possible.
+
+        Args:
+            video_path: Source video
+
+        Returns:
+            CachedCapture, or a cv2.VideoCapture if the clip cannot be cached
+        """
+        cached = self.load(video_path)
+        if cached is None:
+            return cv2.VideoCapture(video_path)
+        return CachedCapture(cached)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(last used, size, key) of every complete entry."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.frames'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len('.frames')]))
+        return entries
+
+    def total_bytes(self) -> int:
+        """Disk space used by cached frames."""
+        return sum(size for _, size, _ in self._entries())
+
+    def remove(self, key: str):
+        """Drop one entry. Processes that still have it mapped keep their view."""
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self, reserve: int = 0):
+        """
+        Remove least-recently-used entries until the cache fits its budget.
+
+        Args:
+            reserve: Extra bytes to make room for (an entry about to be written)
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            while entries and total + reserve > self.max_bytes:
+                _, size, key = entries.pop(0)
+                self.remove(key)
+                total -= size
+
+    def clear(self):
+        """Remove every cached clip."""
+        with self._lock:
+            for _, _, key in self._entries():
+                self.remove(key)
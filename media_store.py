@@ -0,0 +1,399 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import List, Dict, Any, Optional, BinaryIO
+
+CHUNK_SIZE = 1024 * 1024
+# Permissions of stored objects (and of the paths hardlinked to them)
+OBJECT_MODE = 0o444
+
+def hash_file(path: str) -> str:
+    """Streaming SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class MediaStore:
+    """
+    Content-addressed, deduplicating store for uploaded and generated media.
+
+    Each distinct file is stored once under objects/<aa>/<bb>/<sha256><ext>.
+    Ingested paths are replaced by hardlinks to the stored object (when on
+    the same filesystem), so duplicates cost no extra space. A SQLite
+    sidecar index records every object with its metadata and the paths that
+    reference it; an object is deleted when its last reference is released.
+
+    Stored objects are read-only. A referencing path shares the object's
+    inode, so writing into it in place would silently change the object,
+    and every duplicate, under the digest recorded for the old content;
+    such writes fail instead, and writers must replace the file (unlink or
+    rename over it), as the processors do.
+    """
+
+    def __init__(self, root_dir: str = "media_store"):
+        """
+        Initialize the media store.
+
+        Args:
+            root_dir: Directory holding objects/ and the index database
+        """
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, 'objects')
+        self.db_path = os.path.join(root_dir, 'index.db')
+        self._lock = threading.RLock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.init_database()
+
+    def init_database(self):
+        """Create the index tables."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS objects (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                ext TEXT NOT NULL,
+                created REAL NOT NULL,
+                metadata TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS refs (
+                path TEXT PRIMARY KEY,
+                digest TEXT NOT NULL REFERENCES objects(digest),
+                added REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_refs_digest ON refs (digest)')
+
+        conn.commit()
+        conn.close()
+
+    def object_path(self, digest: str, ext: str = '') -> str:
+        """Path of the stored object for a digest."""
+        return os.path.join(self.objects_dir, digest[:2], digest[2:4], digest + ext)
+
+    def _place_object(self, source: str, digest: str, ext: str, move: bool = False) -> str:
+        """Store source as the object for digest unless it already exists."""
+        object_path = self.object_path(digest, ext)
+        if os.path.exists(object_path):
+            if move:
+                os.remove(source)
+            os.chmod(object_path, OBJECT_MODE)
+            return object_path
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if move:
+            shutil.move(source, tmp_path)
+        else:
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copyfile(source, tmp_path)
+        # Also applies to the hardlinked source, so in-place rewrites of it fail loudly
+        os.chmod(tmp_path, OBJECT_MODE)
+        os.replace(tmp_path, object_path)
+        return object_path
+
+    @staticmethod
+    def _link_path(object_path: str, path: str) -> bool:
+        """Replace path with a hardlink to object_path; False if not possible."""
+        if os.path.exists(path) and os.path.samefile(object_path, path):
+            return True
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.link"
+        try:
+            os.link(object_path, tmp_path)
+        except OSError:
+            return False
+        os.replace(tmp_path, path)
+        return True
+
+    def _record(self, digest: str, size: int, ext: str, path: str,
+                metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Index an object and a reference to it; returns the digest the path referenced before."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT digest FROM refs WHERE path = ?', (path,))
+        row = cursor.fetchone()
+        previous = row[0] if row else None
+
+        cursor.execute('''
+            INSERT OR IGNORE INTO objects (digest, size, ext, created, metadata)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (digest, size, ext, time.time(), json.dumps(metadata or {})))
+        if metadata:
+            self._merge_metadata(cursor, digest, metadata)
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO refs (path, digest, added) VALUES (?, ?, ?)
+        ''', (path, digest, time.time()))
+
+        conn.commit()
+        conn.close()
+        return previous if previous != digest else None
+
+    @staticmethod
+    def _merge_metadata(cursor, digest: str, metadata: Dict[str, Any]):
+        cursor.execute('SELECT metadata FROM objects WHERE digest = ?', (digest,))
+        row = cursor.fetchone()
+        merged = json.loads(row[0] or '{}') if row else {}
+        merged.update(metadata)
+        cursor.execute('UPDATE objects SET metadata = ? WHERE digest = ?',
+                       (json.dumps(merged), digest))
+
+    def ingest(self, path: str, metadata: Optional[Dict[str, Any]] = None,
+               link_source: bool = True) -> str:
+        """
+        Add a file to the store.
+
+        Args:
+            path: File to ingest
+            metadata: Metadata to merge into the object's sidecar record
+            link_source: Replace path with a hardlink to the stored object, so a
+                duplicate file stops taking its own space
+
+        Returns:
+            str: SHA-256 digest of the content
+        """
+        path = os.path.abspath(path)
+        digest = hash_file(path)
+        ext = os.path.splitext(path)[1].lower()
+
+        with self._lock:
+            object_path = self._place_object(path, digest, ext)
+            if link_source:
+                self._link_path(object_path, path)
+            previous = self._record(digest, os.path.getsize(object_path), ext, path, metadata)
+            if previous:
+                self._collect(previous)
+        return digest
+
+    def ingest_stream(self, stream: BinaryIO, path: str,
+                      metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Store data from a file-like object, hashing while it is written.
+
+        The content is written once into the store; path is then created as a
+        hardlink (or copy) of the stored object.
+
+        Args:
+            stream: Binary file-like object (e.g. an upload)
+            path: Where the caller expects the file to appear
+            metadata: Metadata to merge into the object's sidecar record
+
+        Returns:
+            str: SHA-256 digest of the content
+        """
+        path = os.path.abspath(path)
+        ext = os.path.splitext(path)[1].lower()
+        digest = hashlib.sha256()
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.ingest')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            hex_digest = digest.hexdigest()
+
+            with self._lock:
+                object_path = self._place_object(tmp_path, hex_digest, ext, move=True)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if not self._link_path(object_path, path):
+                    shutil.copyfile(object_path, path)
+                previous = self._record(hex_digest, os.path.getsize(object_path), ext, path, metadata)
+                if previous:
+                    self._collect(previous)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return hex_digest
+
+    def lookup(self, path: str) -> Optional[str]:
+        """
+        Get the digest a path refers to.
+
+        A reference whose file was replaced or removed since ingest is
+        dropped and None is returned.
+
+        Args:
+            path: Previously ingested path
+
+        Returns:
+            Digest, or None if the path is not (or no longer) in the store
+        """
+        path = os.path.abspath(path)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT r.digest, o.ext FROM refs r JOIN objects o ON o.digest = r.digest
+            WHERE r.path = ?
+        ''', (path,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+
+        digest, ext = row
+        object_path = self.object_path(digest, ext)
+        try:
+            same = os.path.samefile(object_path, path)
+        except OSError:
+            same = False
+        if not same and not (os.path.exists(path) and os.path.getsize(path) == os.path.getsize(object_path)
+                             and hash_file(path) == digest):
+            self.release(path, remove_file=False)
+            return None
+        return digest
+
+    def resolve(self, digest: str) -> Optional[str]:
+        """
+        Get the stored object's path for a digest.
+
+        Args:
+            digest: Content digest
+
+        Returns:
+            Object path, or None if unknown
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT ext FROM objects WHERE digest = ?', (digest,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+        object_path = self.object_path(digest, row[0])
+        return object_path if os.path.exists(object_path) else None
+
+    def add_reference(self, digest: str, path: str) -> bool:
+        """
+        Materialize a stored object at path (hardlink, or copy across filesystems).
+
+        Args:
+            digest: Content digest
+            path: Destination path
+
+        Returns:
+            bool: False if the digest is unknown
+        """
+        object_path = self.resolve(digest)
+        if object_path is None:
+            return False
+        path = os.path.abspath(path)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not self._link_path(object_path, path):
+                shutil.copyfile(object_path, path)
+            previous = self._record(digest, os.path.getsize(object_path),
+                                    os.path.splitext(object_path)[1], path, None)
+            if previous:
+                self._collect(previous)
+        return True
+
+    def release(self, path: str, remove_file: bool = True) -> bool:
+        """
+        Drop a path's reference, deleting the object when nothing references it.
+
+        Args:
+            path: Previously ingested path
+            remove_file: Also delete the file at path
+
+        Returns:
+            bool: True if the path was referenced
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT digest FROM refs WHERE path = ?', (path,))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute('DELETE FROM refs WHERE path = ?', (path,))
+            conn.commit()
+            conn.close()
+
+            if remove_file and os.path.exists(path):
+                os.remove(path)
+            if row:
+                self._collect(row[0])
+        return row is not None
+
+    def _collect(self, digest: str):
+        """Delete an object that no path references any more."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM refs WHERE digest = ?', (digest,))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('SELECT ext FROM objects WHERE digest = ?', (digest,))
+            row = cursor.fetchone()
+            cursor.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+            if row:
+                object_path = self.object_path(digest, row[0])
+                if os.path.exists(object_path):
+                    os.remove(object_path)
+        conn.commit()
+        conn.close()
+
+    def get_metadata(self, digest: str) -> Dict[str, Any]:
+        """Get the sidecar metadata for an object."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT metadata FROM objects WHERE digest = ?', (digest,))
+        row = cursor.fetchone()
+        conn.close()
+        return json.loads(row[0] or '{}') if row else {}
+
+    def set_metadata(self, digest: str, **metadata):
+        """Merge keys into the sidecar metadata for an object."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        self._merge_metadata(cursor, digest, metadata)
+        conn.commit()
+        conn.close()
+
+    def references(self, digest: str) -> List[str]:
+        """Paths that reference an object."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT path FROM refs WHERE digest = ? ORDER BY added', (digest,))
+        paths = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return paths
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Summarize store usage.
+
+        Returns:
+            Dict with object/reference counts and bytes stored vs referenced
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects')
+        objects, stored_bytes = cursor.fetchone()
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(o.size), 0)
+            FROM refs r JOIN objects o ON o.digest = r.digest
+        ''')
+        refs, referenced_bytes = cursor.fetchone()
+        conn.close()
+        return {
+            'objects': objects,
+            'references': refs,
+            'stored_bytes': stored_bytes,
+            'referenced_bytes': referenced_bytes,
+            'saved_bytes': referenced_bytes - stored_bytes
+        }
@@ -0,0 +1,282 @@
+import math
+import queue
+import threading
+from typing import List, Tuple, Optional, Dict, Any, Iterator
+
+import cv2
+import numpy as np
+
+DEFAULT_FPS = 30.0
+
+class MontageDecoder(threading.Thread):
+    """
+    Decodes a single montage input on its own thread.
+
+    Frames are resized to the montage cell size on the decoder thread and
+    handed to the compositor through a bounded queue as (timestamp, frame)
+    pairs, followed by a None sentinel at end of stream. Frames live in a
+    small ring of preallocated cell buffers; the ring is sized so that a
+    buffer is never rewritten while it is queued or held by the consumer.
+    """
+
+    def __init__(self, path: str, cell_size: Tuple[int, int], queue_size: int = 4,
+                 info: Optional[Dict[str, Any]] = None):
+        """
+        Open an input for decoding.
+
+        Args:
+            path: Path to the input video
+            cell_size: (width, height) to resize frames to
+            queue_size: Maximum number of decoded frames buffered ahead
+            info: Probed metadata (fps, frame_count); read from the capture if None
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.cell_size = cell_size
+        self.frames: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+
+        self.cap = cv2.VideoCapture(path)
+        if info:
+            self.fps = info.get('fps') or DEFAULT_FPS
+            self.frame_count = int(info.get('frame_count', 0))
+        else:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+            self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.duration = self.frame_count / self.fps if self.frame_count > 0 else 0.0
+
+        # Queue + current/pending frames held by the consumer + frame being written
+        width, height = cell_size
+        self._ring = [np.empty((height, width, 3), dtype=np.uint8)
+                      for _ in range(queue_size + 3)]
+
+    def is_opened(self) -> bool:
+        """Whether the underlying capture opened successfully."""
+        return self.cap.isOpened()
+
+    def _put(self, item) -> bool:
+        """Put an item on the queue, giving up if the decoder is stopped."""
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        decode_buf = None
+        index = 0
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read(image=decode_buf) if decode_buf is not None else self.cap.read()
+                if not ret:
+                    break
+                decode_buf = frame
+
+                slot = self._ring[index % len(self._ring)]
+                cv2.resize(frame, self.cell_size, dst=slot, interpolation=cv2.INTER_AREA)
+                if not self._put((index / self.fps, slot)):
+                    return
+                index += 1
+        except Exception as e:
+            print(f"Error decoding montage input {self.path}: {e}")
+        finally:
+            self.cap.release()
+            self._put(None)
+
+    def stop(self):
+        """Stop decoding and release the capture."""
+        self.stop_event.set()
+
+class _ClipCursor:
+    """Timestamp-based frame selection over a decoder's output queue."""
+
+    def __init__(self, decoder: MontageDecoder):
+        self.decoder = decoder
+        self.current: Optional[Tuple[float, np.ndarray]] = None
+        self.pending: Optional[Tuple[float, np.ndarray]] = None
+        self.exhausted = False
+
+    def frame_at(self, t: float) -> Optional[np.ndarray]:
+        """
+        Get the latest frame whose timestamp is at or before t.
+
+        Past the end of the stream the last frame is held.
+        """
+        # Half a source frame of slack so rounding never skips a frame
+        limit = t + 0.5 / self.decoder.fps
+        while not self.exhausted:
+            if self.pending is None:
+                item = self.decoder.frames.get()
+                if item is None:
+                    self.exhausted = True
+                    break
+                self.pending = item
+            if self.pending[0] <= limit or self.current is None:
+                self.current, self.pending = self.pending, None
+            else:
+                break
+        return self.current[1] if self.current is not None else None
+
+class MontageEngine:
+    """
+    Streaming N-way grid montage compositor.
+
+    Every input gets its own MontageDecoder thread, so decoding and resizing
+    run in parallel and the compositor only blits ready cell frames into one
+    reused canvas. Output frames are selected by timestamp, so inputs with
+    different frame rates stay in sync at the output rate (the highest input
+    fps). When there are more inputs than grid cells, each cell plays its
+    inputs in turn and crossfades between consecutive clips over
+    transition_duration seconds. Shorter cells hold their last frame until
+    the longest cell finishes.
+    """
+
+    def __init__(self, video_paths: List[str], grid_size: Tuple[int, int] = (2, 2),
+                 cell_size: Tuple[int, int] = (640, 360),
+                 transition_duration: float = 0.5, queue_size: int = 4,
+                 video_info: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Configure a montage.
+
+        Args:
+            video_paths: Input videos, assigned to cells in row-major order
+            grid_size: (rows, cols) for the grid layout
+            cell_size: (width, height) of a grid cell
+            transition_duration: Crossfade duration between clips sharing a cell
+            queue_size: Frames each decoder may buffer ahead
+            video_info: Probed metadata per path, to avoid re-reading it
+        """
+        self.video_paths = video_paths
+        self.video_info = video_info or {}
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.transition_duration = max(0.0, transition_duration)
+        self.queue_size = queue_size
+
+        self.decoders: List[MontageDecoder] = []
+        self.cells: List[List[Dict[str, Any]]] = []
+        self.fps = DEFAULT_FPS
+        self.duration = 0.0
+
+    @property
+    def frame_size(self) -> Tuple[int, int]:
+        """(width, height) of the output frames."""
+        rows, cols = self.grid_size
+        return cols * self.cell_size[0], rows * self.cell_size[1]
+
+    @property
+    def frame_total(self) -> int:
+        """Number of output frames."""
+        return int(math.ceil(self.duration * self.fps))
+
+    def open(self) -> bool:
+        """
+        Open all inputs and build the per-cell timelines.
+
+        Returns:
+            bool: True if at least one input could be opened
+        """
+        for path in self.video_paths:
+            decoder = MontageDecoder(path, self.cell_size, self.queue_size,
+                                     info=self.video_info.get(path))
+            if not decoder.is_opened():
+                print(f"Could not open video: {path}")
+                decoder.cap.release()
+                continue
+            self.decoders.append(decoder)
+
+        if not self.decoders:
+            return False
+
+        self.fps = max(decoder.fps for decoder in self.decoders)
+
+        # Clips sharing a cell overlap by the transition duration
+        cell_count = self.grid_size[0] * self.grid_size[1]
+        self.cells = []
+        for cell_index in range(min(cell_count, len(self.decoders))):
+            timeline = []
+            start = 0.0
+            for decoder in self.decoders[cell_index::cell_count]:
+                if timeline:
+                    previous = timeline[-1]
+                    overlap = min(self.transition_duration,
+                                  previous['duration'] / 2, decoder.duration / 2)
+                    start = previous['start'] + previous['duration'] - overlap
+                    previous['fade_out'] = overlap
+                timeline.append({
+                    'decoder': decoder,
+                    'start': start,
+                    'duration': decoder.duration,
+                    'fade_out': 0.0,
+                    'cursor': None
+                })
+            self.cells.append(timeline)
+
+        self.duration = max(timeline[-1]['start'] + timeline[-1]['duration']
+                            for timeline in self.cells)
+        return True
+
+    def frames(self) -> Iterator[np.ndarray]:
+        """
+        Decode and composite the montage.
+
+        Yields:
+            np.ndarray: The montage canvas for each output frame; the same
+            array is reused, so consume it before advancing the iterator
+        """
+        for decoder in self.decoders:
+            decoder.start()
+
+        width, height = self.cell_size
+        cols = self.grid_size[1]
+        output_width, output_height = self.frame_size
+        canvas = np.zeros((output_height, output_width, 3), dtype=np.uint8)
+
+        for frame_idx in range(self.frame_total):
+            t = frame_idx / self.fps
+            for cell_index, timeline in enumerate(self.cells):
+                y_start = (cell_index // cols) * height
+                x_start = (cell_index % cols) * width
+                cell = canvas[y_start:y_start + height, x_start:x_start + width]
+                self._composite_cell(cell, timeline, t)
+            yield canvas
+
+    def _composite_cell(self, cell: np.ndarray, timeline: List[Dict[str, Any]], t: float):
+        """Blit the active clip(s) of a cell at time t, crossfading when two overlap."""
+        active = []
+        for position, clip in enumerate(timeline):
+            is_last = position == len(timeline) - 1
+            end = clip['start'] + clip['duration']
+            if t < clip['start']:
+                break
+            if t >= end and not is_last:
+                # Clip is finished; release its decoder
+                clip['decoder'].stop()
+                clip['cursor'] = None
+                continue
+            if clip['cursor'] is None:
+                clip['cursor'] = _ClipCursor(clip['decoder'])
+            frame = clip['cursor'].frame_at(t - clip['start'])
+            if frame is not None:
+                active.append((clip, frame))
+
+        if not active:
+            return
+        if len(active) == 1:
+            np.copyto(cell, active[0][1])
+            return
+
+        (outgoing, outgoing_frame), (_, incoming_frame) = active[-2], active[-1]
+        fade_start = outgoing['start'] + outgoing['duration'] - outgoing['fade_out']
+        alpha = min(1.0, max(0.0, (t - fade_start) / outgoing['fade_out'])) if outgoing['fade_out'] else 1.0
+        cv2.addWeighted(outgoing_frame, 1.0 - alpha, incoming_frame, alpha, 0.0, dst=cell)
+
+    def close(self):
+        """Stop all decoder threads."""
+        for decoder in self.decoders:
+            decoder.stop()
+        for decoder in self.decoders:
+            if decoder.is_alive():
+                decoder.join(timeout=1.0)
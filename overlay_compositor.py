@@ -0,0 +1,269 @@
+import bisect
+from dataclasses import dataclass
+from typing import List, Tuple, Optional, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+@dataclass
+class TextOverlay:
+    """A timed text caption, burned in from start to end (seconds)."""
+    text: str
+    position: Tuple[int, int] = (50, 50)  # baseline-left of the first line, like cv2.putText
+    font_scale: float = 1.0  # Hershey font scale (ignored for TrueType fonts)
+    color: Tuple[int, int, int] = (255, 255, 255)  # RGB
+    start: float = 0.0
+    end: Optional[float] = None  # None for the rest of the video
+    font_path: Optional[str] = None  # TrueType/OpenType font; Hershey simplex if None
+    font_size: int = 32  # pixel size for TrueType fonts
+    thickness: int = 2
+    shadow: bool = False
+    shadow_offset: Tuple[int, int] = (2, 2)
+    shadow_color: Tuple[int, int, int] = (0, 0, 0)  # RGB
+    shadow_blur: int = 0  # Gaussian blur radius of the shadow in pixels
+    opacity: float = 1.0
+    line_spacing: float = 1.2
+
+@dataclass
+class ImageOverlay:
+    """A timed image overlay (e.g. a logo watermark), alpha channel respected."""
+    image_path: str
+    position: Tuple[int, int] = (10, 10)  # top-left corner
+    start: float = 0.0
+    end: Optional[float] = None
+    scale: float = 1.0
+    opacity: float = 1.0
+
+Overlay = Union[TextOverlay, ImageOverlay]
+
+class OverlaySprite:
+    """
+    An overlay rasterized once into premultiplied form.
+
+    The sprite is cropped to its visible pixels and, once placed on a frame
+    size, blends only its region of interest with integer NumPy arithmetic:
+    out = (frame * (255 - alpha) + color * alpha) / 255.
+    """
+
+    def __init__(self, bgra: np.ndarray, top_left: Tuple[int, int],
+                 start: float = 0.0, end: Optional[float] = None):
+        """
+        Args:
+            bgra: Straight-alpha BGRA sprite (uint8)
+            top_left: Frame position of the sprite's top-left pixel
+            start: Time (s) the sprite appears
+            end: Time (s) the sprite disappears, None for never
+        """
+        alpha = bgra[:, :, 3:4].astype(np.uint16)
+        self.premultiplied = bgra[:, :, :3].astype(np.uint16) * alpha + 127
+        self.inverse_alpha = 255 - alpha
+        self.top_left = top_left
+        self.start = start
+        self.end = end
+        self._frame_slice = None
+        self._sprite_slice = None
+        self._work = None
+
+    def place(self, frame_width: int, frame_height: int) -> bool:
+        """
+        Clip the sprite to a frame size and allocate its blend buffer.
+
+        Returns:
+            bool: False if the sprite lies entirely outside the frame
+        """
+        height, width = self.inverse_alpha.shape[:2]
+        x, y = self.top_left
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+        if x0 >= x1 or y0 >= y1:
+            return False
+
+        self._frame_slice = (slice(y0, y1), slice(x0, x1))
+        self._sprite_slice = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        self.premultiplied = np.ascontiguousarray(self.premultiplied[self._sprite_slice])
+        self.inverse_alpha = np.ascontiguousarray(self.inverse_alpha[self._sprite_slice])
+        self._work = np.empty(self.premultiplied.shape, dtype=np.uint16)
+        return True
+
+    def blend(self, frame: np.ndarray):
+        """Alpha-blend the sprite onto a BGR frame in place."""
+        roi = frame[self._frame_slice]
+        work = self._work
+        np.multiply(roi, self.inverse_alpha, out=work)
+        work += self.premultiplied
+        work //= 255
+        np.copyto(roi, work, casting='unsafe')
+
+def _text_lines(overlay: TextOverlay):
+    return overlay.text.split('\n')
+
+def _render_text_alpha(overlay: TextOverlay, canvas_size: Tuple[int, int],
+                       origin: Tuple[int, int]) -> np.ndarray:
+    """Rasterize the overlay's text as an 8-bit coverage mask, first baseline at origin."""
+    width, height = canvas_size
+    lines = _text_lines(overlay)
+
+    if overlay.font_path:
+        font = ImageFont.truetype(overlay.font_path, overlay.font_size)
+        ascent, descent = font.getmetrics()
+        step = int(round((ascent + descent) * overlay.line_spacing))
+        mask = Image.new('L', (width, height), 0)
+        draw = ImageDraw.Draw(mask)
+        for i, line in enumerate(lines):
+            draw.text((origin[0], origin[1] + i * step), line, fill=255, font=font, anchor='ls')
+        return np.asarray(mask).copy()
+
+    (_, text_height), baseline = cv2.getTextSize('Ag', cv2.FONT_HERSHEY_SIMPLEX,
+                                                 overlay.font_scale, overlay.thickness)
+    step = int(round((text_height + baseline) * overlay.line_spacing))
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for i, line in enumerate(lines):
+        cv2.putText(mask, line, (origin[0], origin[1] + i * step), cv2.FONT_HERSHEY_SIMPLEX,
+                    overlay.font_scale, 255, overlay.thickness, cv2.LINE_AA)
+    return mask
+
+def _text_extent(overlay: TextOverlay) -> Tuple[int, int, int]:
+    """Approximate (width, height, ascent) of the overlay text block."""
+    lines = _text_lines(overlay)
+    if overlay.font_path:
+        font = ImageFont.truetype(overlay.font_path, overlay.font_size)
+        ascent, descent = font.getmetrics()
+        step = int(round((ascent + descent) * overlay.line_spacing))
+        width = max(int(font.getlength(line)) for line in lines)
+    else:
+        (_, ascent), descent = cv2.getTextSize('Ag', cv2.FONT_HERSHEY_SIMPLEX,
+                                               overlay.font_scale, overlay.thickness)
+        step = int(round((ascent + descent) * overlay.line_spacing))
+        width = max(cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX,
+                                    overlay.font_scale, overlay.thickness)[0][0] for line in lines)
+    height = step * (len(lines) - 1) + ascent + descent
+    return width, height, ascent
+
+def render_text_sprite(overlay: TextOverlay) -> Optional[OverlaySprite]:
+    """
+    Rasterize a text overlay (and its shadow) once into a sprite.
+
+    Args:
+        overlay: Text overlay description
+
+    Returns:
+        OverlaySprite, or None if the text has no visible pixels
+    """
+    text_width, text_height, ascent = _text_extent(overlay)
+    dx, dy = overlay.shadow_offset if overlay.shadow else (0, 0)
+    margin = max(abs(dx), abs(dy)) + 2 * overlay.shadow_blur + 2 * overlay.thickness + 4
+    canvas_size = (text_width + 2 * margin, text_height + 2 * margin)
+    origin = (margin, margin + ascent)
+
+    text_alpha = _render_text_alpha(overlay, canvas_size, origin).astype(np.float32) / 255.0
+    color = np.array(overlay.color[::-1], dtype=np.float32)
+    premultiplied = text_alpha[:, :, None] * color
+    alpha = text_alpha
+
+    if overlay.shadow:
+        shadow_alpha = _render_text_alpha(overlay, canvas_size,
+                                          (origin[0] + dx, origin[1] + dy)).astype(np.float32) / 255.0
+        if overlay.shadow_blur > 0:
+            kernel = 2 * overlay.shadow_blur + 1
+            shadow_alpha = cv2.GaussianBlur(shadow_alpha, (kernel, kernel), 0)
+        shadow_alpha = shadow_alpha * (1.0 - text_alpha)
+        premultiplied = premultiplied + shadow_alpha[:, :, None] * np.array(
+            overlay.shadow_color[::-1], dtype=np.float32)
+        alpha = text_alpha + shadow_alpha
+
+    alpha = alpha * overlay.opacity
+    premultiplied = premultiplied * overlay.opacity
+
+    visible = np.argwhere(alpha > 0.5 / 255.0)
+    if visible.size == 0:
+        return None
+    (y0, x0), (y1, x1) = visible.min(axis=0), visible.max(axis=0) + 1
+
+    alpha = alpha[y0:y1, x0:x1]
+    # Un-premultiply into straight-alpha BGRA for OverlaySprite
+    straight = premultiplied[y0:y1, x0:x1] / np.maximum(alpha, 1e-6)[:, :, None]
+    bgra = np.dstack([np.clip(straight + 0.5, 0, 255),
+                      np.clip(alpha * 255.0 + 0.5, 0, 255)]).astype(np.uint8)
+
+    top_left = (overlay.position[0] - origin[0] + int(x0),
+                overlay.position[1] - origin[1] + int(y0))
+    return OverlaySprite(bgra, top_left, overlay.start, overlay.end)
+
+def render_image_sprite(overlay: ImageOverlay) -> Optional[OverlaySprite]:
+    """
+    Load an image overlay once into a sprite.
+
+    Args:
+        overlay: Image overlay description
+
+    Returns:
+        OverlaySprite, or None if the image could not be read
+    """
+    image = cv2.imread(overlay.image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        print(f"Could not read overlay image: {overlay.image_path}")
+        return None
+    if image.dtype == np.uint16:
+        # 16-bit PNG/TIFF; the blend works on 8-bit channels
+        image = (image >> 8).astype(np.uint8)
+
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+
+    if overlay.scale != 1.0:
+        image = cv2.resize(image, None, fx=overlay.scale, fy=overlay.scale,
+                           interpolation=cv2.INTER_AREA)
+    if overlay.opacity != 1.0:
+        image[:, :, 3] = (image[:, :, 3].astype(np.float32) * overlay.opacity + 0.5).astype(np.uint8)
+
+    return OverlaySprite(image, tuple(overlay.position), overlay.start, overlay.end)
+
+class OverlayTimeline:
+    """
+    A set of timed overlays, pre-rendered once and composited per frame.
+
+    Frames must be composited in increasing time order; the active set is
+    maintained with a sweep over start times rather than scanning every
+    overlay on every frame.
+    """
+
+    def __init__(self, overlays: List[Overlay]):
+        self.overlays = overlays
+        self.sprites: List[OverlaySprite] = []
+        self._starts: List[float] = []
+        self._next = 0
+        self._active: List[OverlaySprite] = []
+
+    def prepare(self, frame_width: int, frame_height: int):
+        """Render every overlay into a sprite placed on the given frame size."""
+        sprites = []
+        for overlay in self.overlays:
+            if isinstance(overlay, ImageOverlay):
+                sprite = render_image_sprite(overlay)
+            else:
+                sprite = render_text_sprite(overlay)
+            if sprite is not None and sprite.place(frame_width, frame_height):
+                sprites.append(sprite)
+
+        self.sprites = sorted(sprites, key=lambda sprite: sprite.start)
+        self._starts = [sprite.start for sprite in self.sprites]
+        self._next = 0
+        self._active = []
+
+    def active_at(self, t: float) -> List[OverlaySprite]:
+        """Sprites visible at time t (t must not decrease between calls)."""
+        upto = bisect.bisect_right(self._starts, t)
+        if upto > self._next:
+            self._active.extend(self.sprites[self._next:upto])
+            self._next = upto
+        self._active = [sprite for sprite in self._active
+                        if sprite.end is None or t < sprite.end]
+        return self._active
+
+    def composite(self, frame: np.ndarray, t: float):
+        """Blend all overlays active at time t onto a BGR frame in place."""
+        for sprite in self.active_at(t):
+            sprite.blend(frame)
@@ -1,9 +1,10 @@
 import openai
 import json
-import re
 from typing import List, Dict, Optional, Tuple
 import random
 
+from prompt_keywords import tokenize_prompt
+
 class PromptEnhancer:
     """
     Advanced prompt enhancement system for better AI video generation.
@@ -316,15 +317,7 @@ class PromptEnhancer:
         Returns:
             List of extracted keywords
         """
-        # Remove common words and punctuation
-        stop_words = {'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        
-        # Clean and split the prompt
-        cleaned_prompt = re.sub(r'[^\w\s]', '', prompt.lower())
-        words = cleaned_prompt.split()
-        
-        # Filter out stop words and short words
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
+        keywords = tokenize_prompt(prompt)
         
         return keywords[:10]  # Return top 10 keywords
     
@@ -0,0 +1,25 @@
+import re
+from typing import List
+
+# Words too common to describe what a prompt asks for
+STOP_WORDS = frozenset({'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+                        'of', 'with', 'by'})
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+def tokenize_prompt(prompt: str) -> List[str]:
+    """
+    Split a prompt into its keywords.
+
+    Lowercases, strips punctuation and drops stop words and words of two
+    letters or fewer. Shared by PromptEnhancer.extract_keywords and the
+    analytics keyword index, so both count the same words.
+
+    Args:
+        prompt: The prompt to split
+
+    Returns:
+        Keywords in prompt order (repeats included)
+    """
+    words = _PUNCTUATION.sub('', prompt.lower()).split()
+    return [word for word in words if word not in STOP_WORDS and len(word) > 2]
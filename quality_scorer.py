@@ -0,0 +1,251 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Dict, Any
+
+import cv2
+import numpy as np
+
+def stack_metrics(stack: np.ndarray, black_level: float = 16.0,
+                  frozen_delta: float = 0.5) -> Dict[str, np.ndarray]:
+    """
+    Per-frame quality metrics for a stack of grayscale frames.
+
+    Everything is computed with whole-array NumPy operations over the
+    (frames, height, width) stack rather than frame by frame.
+
+    Args:
+        stack: (N, H, W) uint8 grayscale frames
+        black_level: Luma at or below which a pixel counts as crushed and a
+            flat frame (by its mean) as black; pixels at or above
+            255 - black_level count as clipped
+        frozen_delta: Mean absolute luma change below which a frame counts as
+            a repeat of the previous one
+
+    Returns:
+        Dict of per-frame arrays: 'luma', 'contrast', 'sharpness',
+        'underexposed', 'overexposed', 'black', plus 'delta' and 'frozen'
+        (one shorter, for consecutive pairs)
+    """
+    frames = stack.astype(np.float32)
+    luma = frames.mean(axis=(1, 2))
+    contrast = frames.std(axis=(1, 2))
+
+    # 4-neighbour Laplacian over every frame at once
+    laplacian = (4 * frames[:, 1:-1, 1:-1] - frames[:, :-2, 1:-1] - frames[:, 2:, 1:-1]
+                 - frames[:, 1:-1, :-2] - frames[:, 1:-1, 2:])
+    sharpness = laplacian.var(axis=(1, 2))
+
+    delta = np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2))
+    return {
+        'luma': luma,
+        'contrast': contrast,
+        'sharpness': sharpness,
+        'underexposed': (stack <= black_level).mean(axis=(1, 2)),
+        'overexposed': (stack >= 255 - black_level).mean(axis=(1, 2)),
+        'black': (luma <= black_level) & (contrast < 8),
+        'delta': delta,
+        'frozen': delta < frozen_delta
+    }
+
+class QualityScorer:
+    """
+    Automatic quality gate for generated videos.
+
+    Each clip is decoded once at analysis_fps into a small grayscale frame
+    stack (skipped frames are only grabbed, never decoded to BGR), and all
+    metrics are computed over the stack in one vectorized pass:
+
+    - sharpness: median Laplacian variance (at the analysis resolution)
+    - exposure: mean luma in [0, 1] and the fraction of crushed/clipped pixels
+    - flicker: mean frame-to-frame change of mean luma
+    - frozen_ratio: fraction of samples identical to the previous one
+    - black_ratio: fraction of flat, near-black samples
+
+    Scores are optionally written to an AnalyticsTracker. score_many runs
+    clips on a thread pool (OpenCV decodes without holding the GIL).
+    """
+
+    def __init__(self, tracker=None, analysis_width: int = 160,
+                 analysis_fps: float = 6.0, max_samples: int = 180,
+                 min_sharpness: float = 25.0, exposure_range: Tuple[float, float] = (0.12, 0.88),
+                 max_flicker: float = 6.0, max_frozen_ratio: float = 0.5,
+                 max_black_ratio: float = 0.2, max_workers: int = 4):
+        """
+        Args:
+            tracker: AnalyticsTracker to record scores in (None to skip)
+            analysis_width: Width frames are downscaled to before analysis
+            analysis_fps: Sampling rate for analysis
+            max_samples: Upper bound on analysed frames per clip (the sampling
+                step grows for long clips)
+            min_sharpness: Lowest acceptable median Laplacian variance
+            exposure_range: Acceptable (min, max) mean luma in [0, 1]
+            max_flicker: Highest acceptable mean luma change between samples
+            max_frozen_ratio: Highest acceptable fraction of frozen samples
+            max_black_ratio: Highest acceptable fraction of black samples
+            max_workers: Threads for score_many
+        """
+        self.tracker = tracker
+        self.analysis_width = analysis_width
+        self.analysis_fps = analysis_fps
+        self.max_samples = max_samples
+        self.min_sharpness = min_sharpness
+        self.exposure_range = exposure_range
+        self.max_flicker = max_flicker
+        self.max_frozen_ratio = max_frozen_ratio
+        self.max_black_ratio = max_black_ratio
+        self.max_workers = max_workers
+
+    def decode_stack(self, input_path: str) -> Tuple[Optional[np.ndarray], float]:
+        """
+        Decode a clip into a downsampled grayscale frame stack.
+
+        Args:
+            input_path: Path to input video
+
+        Returns:
+            Tuple of ((N, H, W) uint8 stack or None, seconds between samples)
+        """
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            return None, 0.0
+
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if not width or not height:
+                return None, 0.0
+
+            step = max(1, int(round(fps / self.analysis_fps)))
+            if frame_count > 0:
+                step = max(step, -(-frame_count // self.max_samples))
+            size = (self.analysis_width, max(3, int(round(height * self.analysis_width / width))))
+
+            stack = np.empty((self.max_samples, size[1], size[0]), dtype=np.uint8)
+            small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            decode_buf = None
+            count = frame_index = 0
+
+            while count < self.max_samples:
+                if frame_index % step:
+                    if not cap.grab():
+                        break
+                    frame_index += 1
+                    continue
+
+                ret, frame = cap.read(image=decode_buf) if decode_buf is not None else cap.read()
+                if not ret:
+                    break
+                decode_buf = frame
+                # Downscale before the color conversion so it only touches small frames
+                cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=stack[count])
+                count += 1
+                frame_index += 1
+        finally:
+            cap.release()
+
+        if not count:
+            return None, 0.0
+        return stack[:count], step / fps
+
+    def score_stack(self, stack: np.ndarray) -> Dict[str, Any]:
+        """
+        Score a grayscale frame stack and apply the quality thresholds.
+
+        Args:
+            stack: (N, H, W) uint8 grayscale frames
+
+        Returns:
+            Dict of scores plus 'passed' and the list of failed checks in 'issues'
+        """
+        metrics = stack_metrics(stack)
+        pairs = len(metrics['delta'])
+        scores = {
+            'frames_analyzed': len(stack),
+            'sharpness': float(np.median(metrics['sharpness'])),
+            'exposure': float(metrics['luma'].mean() / 255.0),
+            'underexposed_ratio': float(metrics['underexposed'].mean()),
+            'overexposed_ratio': float(metrics['overexposed'].mean()),
+            'flicker': float(np.abs(np.diff(metrics['luma'])).mean()) if pairs else 0.0,
+            'frozen_ratio': float(metrics['frozen'].mean()) if pairs else 0.0,
+            'black_ratio': float(metrics['black'].mean())
+        }
+
+        issues = []
+        if scores['black_ratio'] > self.max_black_ratio:
+            issues.append('black_frames')
+        if scores['frozen_ratio'] > self.max_frozen_ratio:
+            issues.append('frozen')
+        if scores['sharpness'] < self.min_sharpness:
+            issues.append('blurry')
+        if not self.exposure_range[0] <= scores['exposure'] <= self.exposure_range[1]:
+            issues.append('underexposed' if scores['exposure'] < self.exposure_range[0] else 'overexposed')
+        if scores['flicker'] > self.max_flicker:
+            issues.append('flicker')
+
+        scores['passed'] = not issues
+        scores['issues'] = issues
+        return scores
+
+    def score(self, input_path: str, generation_id: Optional[str] = None,
+              record: bool = True) -> Dict[str, Any]:
+        """
+        Score one video.
+
+        Args:
+            input_path: Path to input video
+            generation_id: ID of the generation the clip belongs to (recorded
+                with the scores; defaults to the file name)
+            record: Write the scores to the tracker, if one is configured
+
+        Returns:
+            Dict of scores ({'passed': False, 'issues': ['unreadable']} if the
+            clip cannot be decoded)
+        """
+        start = time.perf_counter()
+        stack, sample_interval = self.decode_stack(input_path)
+        if stack is None:
+            scores = {'frames_analyzed': 0, 'passed': False, 'issues': ['unreadable']}
+        else:
+            scores = self.score_stack(stack)
+            scores['sample_interval'] = round(sample_interval, 4)
+        scores['video_path'] = input_path
+        scores['generation_id'] = generation_id or os.path.basename(input_path)
+        scores['scoring_time'] = time.perf_counter() - start
+
+        if record and self.tracker is not None:
+            self.tracker.track_quality_scores([scores])
+        return scores
+
+    def score_many(self, input_paths: List[str],
+                   generation_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Score many videos in parallel and record them in one tracker write.
+
+        Args:
+            input_paths: Paths to input videos
+            generation_ids: Matching generation IDs (file names if None)
+
+        Returns:
+            List of score dicts, in input order
+        """
+        generation_ids = generation_ids or [None] * len(input_paths)
+
+        def score_one(item):
+            path, generation_id = item
+            try:
+                return self.score(path, generation_id, record=False)
+            except Exception as e:
+                print(f"Error scoring {path}: {e}")
+                return {'video_path': path, 'generation_id': generation_id or os.path.basename(path),
+                        'frames_analyzed': 0, 'passed': False, 'issues': ['error']}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(score_one, zip(input_paths, generation_ids)))
+
+        if self.tracker is not None and results:
+            self.tracker.track_quality_scores(results)
+        return results
@@ -0,0 +1,208 @@
+import math
+import struct
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values below this (including zero) are counted as this value
+MIN_VALUE = 1e-3
+
+# relative accuracy, index of the first bin, bytes per bin count
+_HEADER = struct.Struct('<diB')
+
+class DDSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmic bins whose bounds grow by
+    gamma = (1 + a) / (1 - a), so every quantile estimate is within
+    relative accuracy a of a real sample value, however skewed the
+    distribution. Two sketches with the same accuracy merge exactly by
+    adding bin counts, which is what lets per-bucket sketches be summed
+    across time buckets. Bins are stored densely between the lowest and
+    highest occupied index: at 1% accuracy one decade of values spans
+    about 115 bins.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        """
+        Args:
+            relative_accuracy: Largest relative error of a quantile estimate
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def index(self, value: float) -> int:
+        """Bin index of a value."""
+        return int(math.ceil(math.log(max(value, MIN_VALUE)) / self._log_gamma))
+
+    @property
+    def count(self) -> int:
+        """Number of values added."""
+        return int(self.counts.sum())
+
+    def _extend(self, low: int, high: int):
+        """Make room for bins low..high."""
+        if not len(self.counts):
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        end = self.offset + len(self.counts) - 1
+        if low >= self.offset and high <= end:
+            return
+        new_offset = min(low, self.offset)
+        counts = np.zeros(max(high, end) - new_offset + 1, dtype=np.int64)
+        counts[self.offset - new_offset:self.offset - new_offset + len(self.counts)] = self.counts
+        self.offset, self.counts = new_offset, counts
+
+    def add(self, value: float, count: int = 1):
+        """Add one value (count times)."""
+        index = self.index(value)
+        self._extend(index, index)
+        self.counts[index - self.offset] += count
+
+    def add_many(self, values: Iterable[float]):
+        """Add a batch of values in one vectorized pass."""
+        values = np.maximum(np.asarray(list(values), dtype=np.float64), MIN_VALUE)
+        if not values.size:
+            return
+        indexes = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        self._extend(int(indexes.min()), int(indexes.max()))
+        self.counts += np.bincount(indexes - self.offset, minlength=len(self.counts))
+
+    def merge(self, other: 'DDSketch'):
+        """Add another sketch's counts to this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if not len(other.counts):
+            return
+        self._extend(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+    def subtract(self, other: 'DDSketch'):
+        """Remove counts of values another sketch holds (counts never drop below zero)."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot subtract sketches with different relative accuracy")
+        low = max(self.offset, other.offset)
+        high = min(self.offset + len(self.counts), other.offset + len(other.counts))
+        if low >= high:
+            return
+        own = self.counts[low - self.offset:high - self.offset]
+        np.maximum(own - other.counts[low - other.offset:high - other.offset], 0, out=own)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            The estimate, or None if the sketch is empty
+        """
+        cumulative = np.cumsum(self.counts)
+        if not len(cumulative) or not cumulative[-1]:
+            return None
+        rank = q * (cumulative[-1] - 1)
+        index = self.offset + int(np.searchsorted(cumulative, rank, side='right'))
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compact blob (occupied bin range only)."""
+        nonzero = np.flatnonzero(self.counts)
+        if not len(nonzero):
+            return _HEADER.pack(self.relative_accuracy, 0, 4)
+        counts = self.counts[nonzero[0]:nonzero[-1] + 1]
+        dtype = '<u4' if counts.max() < 2 ** 32 else '<u8'
+        return (_HEADER.pack(self.relative_accuracy, self.offset + int(nonzero[0]), np.dtype(dtype).itemsize)
+                + counts.astype(dtype).tobytes())
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'DDSketch':
+        """Deserialize a blob written by to_bytes()."""
+        accuracy, offset, itemsize = _HEADER.unpack_from(blob)
+        sketch = cls(accuracy)
+        sketch.offset = offset
+        sketch.counts = np.frombuffer(blob, dtype=f'<u{itemsize}', offset=_HEADER.size).astype(np.int64)
+        return sketch
+
+def bins_to_bytes(bins: Dict[int, int],
+                  relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> bytes:
+    """
+    Serialize bin counts (keyed by DDSketch.index()) without building a sketch.
+
+    Same format as DDSketch.to_bytes(); cheaper for the few-value sketches
+    written on every ingest.
+    """
+    low, high = min(bins), max(bins)
+    counts = [bins.get(index, 0) for index in range(low, high + 1)]
+    fmt = 'I' if max(counts) < 2 ** 32 else 'Q'
+    return (_HEADER.pack(relative_accuracy, low, struct.calcsize(fmt))
+            + struct.pack(f'<{len(counts)}{fmt}', *counts))
+
+def merge_sketch_bytes(left: Optional[bytes], right: Optional[bytes]) -> Optional[bytes]:
+    """SQL scalar function: merge two serialized sketches (NULL counts as empty)."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    sketch = DDSketch.from_bytes(left)
+    sketch.merge(DDSketch.from_bytes(right))
+    return sketch.to_bytes()
+
+def subtract_sketch_bytes(left: Optional[bytes], right: Optional[bytes]) -> Optional[bytes]:
+    """SQL scalar function: left without right's values (NULL when nothing is left)."""
+    if left is None or right is None:
+        return left
+    sketch = DDSketch.from_bytes(left)
+    sketch.subtract(DDSketch.from_bytes(right))
+    return sketch.to_bytes() if sketch.count else None
+
+class SketchAggregate:
+    """SQL aggregate sketch_agg(value): a serialized sketch of the non-NULL values."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self) -> Optional[bytes]:
+        if not self.values:
+            return None
+        sketch = DDSketch()
+        sketch.add_many(self.values)
+        return sketch.to_bytes()
+
+class SketchMergeAggregate:
+    """SQL aggregate sketch_merge_agg(blob): the merge of serialized sketches."""
+
+    def __init__(self):
+        self.sketch = None
+
+    def step(self, blob):
+        if blob is None:
+            return
+        accuracy, offset, itemsize = _HEADER.unpack_from(blob)
+        counts = np.frombuffer(blob, dtype=f'<u{itemsize}', offset=_HEADER.size)
+        if self.sketch is None:
+            self.sketch = DDSketch(accuracy)
+        elif accuracy != self.sketch.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if not len(counts):
+            return
+        # Add the raw counts in place; merge() would copy every blob into a sketch first
+        sketch = self.sketch
+        sketch._extend(offset, offset + len(counts) - 1)
+        start = offset - sketch.offset
+        sketch.counts[start:start + len(counts)] += counts
+
+    def finalize(self) -> Optional[bytes]:
+        return None if self.sketch is None else self.sketch.to_bytes()
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Applied to every new connection (journal_mode=WAL also persists in the file)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,      # KiB when negative: 64 MiB page cache
+    'mmap_size': 256 * 1024 ** 2,  # map up to 256 MiB of the file
+    'temp_store': 'MEMORY',
+}
+
+class SQLitePool:
+    """
+    Per-thread SQLite connections with tuned pragmas.
+
+    Each thread (and each process, after a fork) lazily opens one connection
+    and keeps it while the thread lives, so callers pay for connect and pragma setup once rather
+    than per operation, and the sqlite3 module's per-connection statement
+    cache turns repeated SQL into prepared-statement reuse. WAL mode lets
+    readers proceed while one writer commits; writes go through
+    transaction(), which takes the write lock up front (BEGIN IMMEDIATE) so
+    concurrent writers queue on the busy timeout instead of failing on a
+    lock upgrade.
+
+    Connections are recorded with their owning thread; opening a new one
+    closes those of threads that have exited, so short-lived worker threads
+    do not accumulate open connections (and file descriptors).
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, object]] = None,
+                 timeout: float = 30.0, cached_statements: int = 256,
+                 functions: Optional[Dict[str, Tuple[int, Callable]]] = None,
+                 aggregates: Optional[Dict[str, Tuple[int, type]]] = None):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            pragmas: PRAGMA name -> value applied on connect (DEFAULT_PRAGMAS if None)
+            timeout: Seconds to wait for a lock held by another connection
+            cached_statements: Size of each connection's prepared statement cache
+            functions: SQL function name -> (argument count, deterministic
+                Python callable) registered on every connection
+            aggregates: SQL aggregate name -> (argument count, class with
+                step() and finalize()) registered on every connection
+        """
+        self.db_path = db_path
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.functions = dict(functions or {})
+        self.aggregates = dict(aggregates or {})
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[Tuple[int, threading.Thread, sqlite3.Connection]] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly by transaction()
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=self.cached_statements)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        for name, (num_args, function) in self.functions.items():
+            conn.create_function(name, num_args, function, deterministic=True)
+        for name, (num_args, aggregate) in self.aggregates.items():
+            conn.create_aggregate(name, num_args, aggregate)
+        pid = os.getpid()
+        with self._lock:
+            # Only this process's threads can be checked; a fork's inherited
+            # connections belong to the parent
+            kept, stale = [], []
+            for entry in self._connections:
+                owner, thread, pooled = entry
+                if owner == pid and not thread.is_alive():
+                    stale.append(pooled)
+                else:
+                    kept.append(entry)
+            kept.append((pid, threading.current_thread(), conn))
+            self._connections = kept
+        for pooled in stale:
+            try:
+                pooled.close()
+            except sqlite3.Error:
+                pass
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Connections must not cross a fork; open a fresh one in the child
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """This thread's connection, for reads (no transaction is opened)."""
+        yield self.get()
+
+    @contextmanager
+    def transaction(self):
+        """
+        A write transaction on this thread's connection.
+
+        Commits on success and rolls back on error. Nested use joins the
+        outer transaction.
+        """
+        conn = self.get()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def close(self):
+        """Close every connection this process opened through the pool."""
+        pid = os.getpid()
+        with self._lock:
+            connections = [conn for owner, _, conn in self._connections if owner == pid]
+            self._connections = []
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
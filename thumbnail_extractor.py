@@ -0,0 +1,289 @@
+import heapq
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Dict, Any
+
+import cv2
+import numpy as np
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+def frame_histogram(frame: np.ndarray, bins: Tuple[int, int] = (16, 8)) -> np.ndarray:
+    """
+    Normalized hue/saturation histogram of a BGR frame.
+
+    Args:
+        frame: BGR frame (ideally already downscaled)
+        bins: (hue_bins, saturation_bins)
+
+    Returns:
+        np.ndarray: Flattened histogram summing to 1
+    """
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, list(bins), [0, 180, 0, 256]).ravel()
+    total = hist.sum()
+    return hist / total if total else hist
+
+class ThumbnailExtractor:
+    """
+    Scene-aware keyframe and thumbnail extractor.
+
+    Frames are sampled at analysis_fps, downscaled, and scored by the
+    histogram distance to the previous sample. Samples whose score clears
+    scene_threshold (and that are at least min_scene_gap seconds after the
+    previous keyframe) become keyframes; quiet clips are topped up with
+    evenly spaced frames. Only the selected thumbnails are kept in memory,
+    and they are encoded in parallel on a thread pool, optionally also as a
+    single sprite sheet / preview strip.
+    """
+
+    def __init__(self, thumb_width: int = 320, max_keyframes: int = 12,
+                 min_keyframes: int = 4, scene_threshold: float = 0.35,
+                 min_scene_gap: float = 1.0, analysis_fps: float = 5.0,
+                 image_format: str = 'jpg', quality: int = 85,
+                 sprite: bool = True, sprite_columns: Optional[int] = None,
+                 max_workers: int = 4):
+        """
+        Args:
+            thumb_width: Width of output thumbnails (height keeps aspect)
+            max_keyframes: Maximum keyframes per video
+            min_keyframes: Minimum keyframes per video (evenly spaced fill)
+            scene_threshold: Histogram distance (0-1) that counts as a cut
+            min_scene_gap: Minimum seconds between scene keyframes
+            analysis_fps: Sampling rate for scene analysis
+            image_format: 'jpg' or 'webp'
+            quality: Encoder quality (0-100)
+            sprite: Also write a sprite sheet of all keyframes
+            sprite_columns: Sprite sheet columns (None for a single-row strip)
+            max_workers: Threads for image encoding and directory runs
+        """
+        if image_format not in ('jpg', 'webp'):
+            raise ValueError(f"Unsupported thumbnail format '{image_format}'. Use 'jpg' or 'webp'.")
+        self.thumb_width = thumb_width
+        self.max_keyframes = max_keyframes
+        self.min_keyframes = min(min_keyframes, max_keyframes)
+        self.scene_threshold = scene_threshold
+        self.min_scene_gap = min_scene_gap
+        self.analysis_fps = analysis_fps
+        self.image_format = image_format
+        self.quality = quality
+        self.sprite = sprite
+        self.sprite_columns = sprite_columns
+        self.max_workers = max_workers
+
+    def _encode_params(self) -> List[int]:
+        if self.image_format == 'webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+
+    def select_keyframes(self, input_path: str) -> List[Dict[str, Any]]:
+        """
+        Decode a video once and select its keyframes.
+
+        Args:
+            input_path: Path to input video
+
+        Returns:
+            List of keyframes ({'time', 'frame_index', 'score', 'image'}) in time order
+        """
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            return []
+
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if not width or not height:
+                return []
+
+            step = max(1, int(round(fps / self.analysis_fps)))
+            thumb_size = (self.thumb_width, max(2, int(round(height * self.thumb_width / width))))
+            analysis_size = (64, max(2, int(round(height * 64 / width))))
+
+            # Evenly spaced fallback frames, chosen up front from the frame count
+            fill_indices = set()
+            if frame_count > 0 and self.min_keyframes:
+                fill_indices = {int(i) // step * step for i in
+                                np.linspace(0, frame_count - 1, self.min_keyframes)}
+
+            scene_heap: List[Tuple[float, int, Dict[str, Any]]] = []
+            fill: Dict[int, Dict[str, Any]] = {}
+            previous_hist = None
+            last_keyframe_time = -np.inf
+            decode_buf = None
+            frame_index = 0
+
+            while True:
+                if frame_index % step:
+                    if not cap.grab():
+                        break
+                    frame_index += 1
+                    continue
+
+                ret, frame = cap.read(image=decode_buf) if decode_buf is not None else cap.read()
+                if not ret:
+                    break
+                decode_buf = frame
+
+                small = cv2.resize(frame, analysis_size, interpolation=cv2.INTER_AREA)
+                hist = frame_histogram(small)
+                # Total-variation distance to the previous sample, in [0, 1]
+                score = 1.0 if previous_hist is None else float(0.5 * np.abs(hist - previous_hist).sum())
+                previous_hist = hist
+                t = frame_index / fps
+
+                is_scene = score >= self.scene_threshold and t - last_keyframe_time >= self.min_scene_gap
+                if is_scene or frame_index in fill_indices:
+                    keyframe = {
+                        'time': round(t, 3),
+                        'frame_index': frame_index,
+                        'score': round(score, 4),
+                        'image': cv2.resize(frame, thumb_size, interpolation=cv2.INTER_AREA)
+                    }
+                    if is_scene:
+                        last_keyframe_time = t
+                        # Keep only the strongest max_keyframes cuts
+                        entry = (score, -frame_index, keyframe)
+                        if len(scene_heap) < self.max_keyframes:
+                            heapq.heappush(scene_heap, entry)
+                        else:
+                            heapq.heappushpop(scene_heap, entry)
+                    else:
+                        fill[frame_index] = keyframe
+
+                frame_index += 1
+        finally:
+            cap.release()
+
+        selected = {keyframe['frame_index']: keyframe for _, _, keyframe in scene_heap}
+        if len(selected) < self.min_keyframes:
+            for index, keyframe in sorted(fill.items()):
+                if len(selected) >= self.min_keyframes:
+                    break
+                near = any(abs(keyframe['time'] - other['time']) < self.min_scene_gap / 2
+                           for other in selected.values())
+                if index not in selected and not near:
+                    selected[index] = keyframe
+
+        return [selected[index] for index in sorted(selected)]
+
+    def build_sprite(self, images: List[np.ndarray]) -> Tuple[np.ndarray, int]:
+        """
+        Tile thumbnails into a sprite sheet.
+
+        Args:
+            images: Equally sized thumbnails
+
+        Returns:
+            Tuple of (sprite image, number of columns)
+        """
+        columns = self.sprite_columns or len(images)
+        rows = (len(images) + columns - 1) // columns
+        tile_height, tile_width = images[0].shape[:2]
+        sprite = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+        for i, image in enumerate(images):
+            y, x = (i // columns) * tile_height, (i % columns) * tile_width
+            sprite[y:y + tile_height, x:x + tile_width] = image
+        return sprite, columns
+
+    def extract(self, input_path: str, output_dir: str,
+                executor: Optional[ThreadPoolExecutor] = None) -> Dict[str, Any]:
+        """
+        Extract keyframe thumbnails (and a sprite sheet) for one video.
+
+        Args:
+            input_path: Path to input video
+            output_dir: Directory to write thumbnails and the manifest into
+            executor: Thread pool for image encoding (a private one if None)
+
+        Returns:
+            Manifest dict with keyframe times, scores and image paths
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        keyframes = self.select_keyframes(input_path)
+        manifest: Dict[str, Any] = {'video': input_path, 'keyframes': [], 'sprite': None}
+        if not keyframes:
+            print(f"No keyframes extracted from {input_path}")
+            return manifest
+
+        params = self._encode_params()
+        jobs = []
+        for i, keyframe in enumerate(keyframes):
+            path = os.path.join(output_dir, f"keyframe_{i:04d}.{self.image_format}")
+            jobs.append((path, keyframe['image']))
+            manifest['keyframes'].append({
+                'time': keyframe['time'],
+                'frame_index': keyframe['frame_index'],
+                'score': keyframe['score'],
+                'path': path
+            })
+
+        if self.sprite:
+            sprite, columns = self.build_sprite([keyframe['image'] for keyframe in keyframes])
+            sprite_path = os.path.join(output_dir, f"sprite.{self.image_format}")
+            jobs.append((sprite_path, sprite))
+            tile_height, tile_width = keyframes[0]['image'].shape[:2]
+            manifest['sprite'] = {'path': sprite_path, 'columns': columns,
+                                  'tile_width': tile_width, 'tile_height': tile_height}
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(cv2.imwrite, path, image, params) for path, image in jobs]
+            for (path, _), future in zip(jobs, futures):
+                if not future.result():
+                    print(f"Could not write thumbnail: {path}")
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+        with open(os.path.join(output_dir, 'keyframes.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"Extracted {len(keyframes)} keyframes from {input_path} to {output_dir}")
+        return manifest
+
+    def extract_directory(self, input_dir: str, output_dir: str,
+                          recursive: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract keyframes for every video in a directory.
+
+        Videos are decoded concurrently and share one encoding pool. Each
+        video's thumbnails go into output_dir/<video name>/.
+
+        Args:
+            input_dir: Directory containing videos
+            output_dir: Root directory for thumbnails
+            recursive: Also search subdirectories
+
+        Returns:
+            Dict mapping each video path to its manifest
+        """
+        video_paths = []
+        for root, dirs, files in os.walk(input_dir):
+            for name in sorted(files):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    video_paths.append(os.path.join(root, name))
+            if not recursive:
+                break
+
+        def target_dir(path):
+            relative = os.path.splitext(os.path.relpath(path, input_dir))[0]
+            return os.path.join(output_dir, relative)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as encode_pool, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as decode_pool:
+            futures = {path: decode_pool.submit(self.extract, path, target_dir(path), encode_pool)
+                       for path in video_paths}
+            results = {}
+            for path, future in futures.items():
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    print(f"Error extracting keyframes from {path}: {e}")
+                    results[path] = {'video': path, 'keyframes': [], 'sprite': None}
+        return results
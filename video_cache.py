@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, is_dataclass
+from enum import Enum
+from typing import List, Dict, Any, Optional
+
+def normalize_params(value: Any) -> Any:
+    """
+    Normalize operation parameters into a canonical JSON-able form.
+
+    Dicts are key-sorted by json.dumps, tuples become lists, floats are
+    rounded so that 1.1 and 1.1000000001 share a key, and dataclasses and
+    enums are reduced to plain values.
+    """
+    if is_dataclass(value) and not isinstance(value, type):
+        value = asdict(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): normalize_params(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_params(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 6)
+    if hasattr(value, 'item'):  # NumPy scalars
+        return normalize_params(value.item())
+    return value
+
+class VideoCache:
+    """
+    Content-addressed cache of processed video outputs.
+
+    Entries are keyed on the inputs' content hashes, the operation name and
+    its normalized parameters. Content hashes are memoized per (size, mtime)
+    so an unchanged input is only hashed once. Outputs are kept in
+    cache_dir with a JSON index and evicted least-recently-used when the
+    total size exceeds max_bytes.
+
+    Hits only update last_access/hits in memory and mark the index dirty;
+    it is written on put, evict and clear, and by a hit at most once per
+    save_interval, so a run of cache hits does not rewrite the whole index
+    each time. flush() writes pending hits explicitly.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3,
+                 hash_content: bool = True, save_interval: float = 30.0):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding cached outputs and the index
+            max_bytes: Disk budget for cached outputs
+            hash_content: Hash input contents; if False, inputs are identified
+                by path, size and mtime only
+            save_interval: Seconds between index writes triggered by hits
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self.save_interval = save_interval
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._hash_memo: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load_index()
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes currently held by cached outputs."""
+        return sum(entry['size'] for entry in self.entries.values())
+
+    def file_fingerprint(self, path: str) -> str:
+        """
+        Identify an input file.
+
+        Args:
+            path: Path to the input file
+
+        Returns:
+            str: SHA-256 of the content, or a path/size/mtime key in stat mode
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        if not self.hash_content:
+            return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+        memo = self._hash_memo.get(path)
+        if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()
+        self._hash_memo[path] = (stat.st_size, stat.st_mtime_ns, fingerprint)
+        return fingerprint
+
+    def make_key(self, operation: str, input_paths: List[str], params: Dict[str, Any]) -> str:
+        """
+        Build the cache key for an operation.
+
+        Args:
+            operation: Operation name (e.g. 'enhance_video_quality')
+            input_paths: Input files the output depends on
+            params: Operation parameters
+
+        Returns:
+            str: Hex cache key
+        """
+        payload = json.dumps({
+            'operation': operation,
+            'inputs': [self.file_fingerprint(path) for path in input_paths],
+            'params': normalize_params(params)
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached output.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Path to the cached output, or None on a miss
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            path = os.path.join(self.cache_dir, entry['file'])
+            if not os.path.exists(path) or os.path.getsize(path) != entry['size']:
+                # Missing or truncated; drop the stale entry
+                self._remove(key)
+                self.save_index()
+                return None
+
+            entry['last_access'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self.save_index()
+            return path
+
+    def put(self, key: str, output_path: str, operation: str = '') -> Optional[str]:
+        """
+        Add a freshly rendered output to the cache.
+
+        The output is hardlinked into the cache directory when possible and
+        copied otherwise, so output_path stays where the caller expects it.
+
+        Args:
+            key: Cache key from make_key
+            output_path: Rendered output
+            operation: Operation name, recorded for inspection
+
+        Returns:
+            Path to the cached output, or None if it exceeds the budget
+        """
+        size = os.path.getsize(output_path)
+        if size > self.max_bytes:
+            return None
+
+        filename = key + os.path.splitext(output_path)[1]
+        path = os.path.join(self.cache_dir, filename)
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._link_or_copy(output_path, path)
+            now = time.time()
+            self.entries[key] = {
+                'file': filename,
+                'size': size,
+                'operation': operation,
+                'created': now,
+                'last_access': now,
+                'hits': 0
+            }
+            self._evict(keep=key)
+            self.save_index()
+        return path
+
+    def materialize(self, cached_path: str, output_path: str):
+        """
+        Place a cached output at output_path, hardlinking when possible.
+
+        Args:
+            cached_path: Path returned by get/put
+            output_path: Destination path
+        """
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(output_dir, exist_ok=True)
+        self._link_or_copy(cached_path, output_path)
+
+    @staticmethod
+    def _link_or_copy(source: str, destination: str):
+        # Unlink first: writing through an existing hardlink would alter the other copy
+        if os.path.lexists(destination):
+            os.remove(destination)
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Evict least-recently-used entries until the cache fits its budget.
+
+        The index is written if anything was evicted or hits are pending.
+
+        Args:
+            keep: Key that must not be evicted (e.g. the entry just added)
+
+        Returns:
+            int: Number of entries evicted
+        """
+        with self._lock:
+            evicted = self._evict(keep)
+            if evicted or self._dirty:
+                self.save_index()
+        return evicted
+
+    def _evict(self, keep: Optional[str] = None) -> int:
+        evicted = 0
+        with self._lock:
+            total = self.total_bytes
+            for key in sorted(self.entries, key=lambda k: self.entries[k]['last_access']):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                total -= self.entries[key]['size']
+                self._remove(key)
+                evicted += 1
+        return evicted
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(os.path.join(self.cache_dir, entry['file']))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every cached output."""
+        with self._lock:
+            for key in list(self.entries):
+                self._remove(key)
+            self.save_index()
+
+    def flush(self):
+        """Write the index if hits are pending."""
+        with self._lock:
+            if self._dirty:
+                self.save_index()
+
+    def load_index(self):
+        """Load the index from disk, dropping entries whose files are gone."""
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, 'r') as f:
+                entries = json.load(f)
+            self.entries = {key: entry for key, entry in entries.items()
+                            if os.path.exists(os.path.join(self.cache_dir, entry['file']))}
+        except Exception as e:
+            print(f"Error loading video cache index: {e}")
+            self.entries = {}
+
+    def save_index(self):
+        """Atomically write the index to disk."""
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        try:
+            with self._lock:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = index_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.entries, f, indent=2)
+                os.replace(tmp_path, index_path)
+                self._dirty = False
+                self._saved_at = time.monotonic()
+        except Exception as e:
+            print(f"Error saving video cache index: {e}")
@@ -0,0 +1,218 @@
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass, field, replace
+from typing import List, Tuple, Optional, Union
+
+import cv2
+import numpy as np
+
+# libvpx has no x264-style presets; map them onto deadline/cpu-used
+VPX_SPEED = {
+    'ultrafast': ('realtime', 8), 'superfast': ('realtime', 7), 'veryfast': ('realtime', 6),
+    'faster': ('good', 5), 'fast': ('good', 4), 'medium': ('good', 3),
+    'slow': ('good', 2), 'slower': ('good', 1), 'veryslow': ('best', 0)
+}
+
+FASTSTART_CONTAINERS = ('.mp4', '.m4v', '.mov')
+
+@dataclass
+class EncoderSettings:
+    """Settings for encoding raw frames through ffmpeg."""
+    codec: str = 'libx264'  # libx264, libx265, libvpx-vp9 or libvpx
+    preset: str = 'medium'  # x264/x265 preset name, mapped to cpu-used for libvpx
+    crf: int = 23
+    pixel_format: str = 'yuv420p'  # '' keeps the input's format
+    threads: int = 0  # 0 lets ffmpeg choose
+    faststart: bool = True  # move the moov atom to the front of MP4/MOV outputs
+    extra_args: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_preset(cls, name: str, **overrides) -> 'EncoderSettings':
+        """
+        Build settings from a named preset.
+
+        Args:
+            name: One of ENCODER_PRESETS
+            **overrides: Fields to override on the preset
+
+        Returns:
+            EncoderSettings
+        """
+        if name not in ENCODER_PRESETS:
+            raise ValueError(f"Unknown encoder preset '{name}'. Available: {', '.join(ENCODER_PRESETS)}")
+        return replace(ENCODER_PRESETS[name], **overrides)
+
+ENCODER_PRESETS = {
+    'preview': EncoderSettings(preset='ultrafast', crf=28),
+    'balanced': EncoderSettings(preset='medium', crf=23),
+    'final': EncoderSettings(preset='slow', crf=18),
+    'hevc': EncoderSettings(codec='libx265', preset='slow', crf=24),
+    'webm': EncoderSettings(codec='libvpx-vp9', preset='medium', crf=32),
+}
+
+def ffmpeg_available() -> bool:
+    """Whether an ffmpeg binary is on PATH."""
+    return shutil.which('ffmpeg') is not None
+
+def build_ffmpeg_command(output_path: str, fps: float, frame_size: Tuple[int, int],
+                         settings: EncoderSettings) -> List[str]:
+    """
+    Build the ffmpeg command line that encodes raw BGR frames from stdin.
+
+    Args:
+        output_path: Output file
+        fps: Output frame rate
+        frame_size: (width, height) of the raw frames
+        settings: Encoder settings
+
+    Returns:
+        List[str]: ffmpeg argv
+    """
+    width, height = frame_size
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+        '-s', f'{width}x{height}', '-r', f'{fps:g}',
+        '-i', '-',
+        '-an',
+    ]
+
+    if settings.pixel_format.startswith(('yuv420', 'nv12')) and (width % 2 or height % 2):
+        # 4:2:0 chroma subsampling needs even dimensions
+        cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+
+    cmd += encoder_args(output_path, settings)
+    cmd.append(output_path)
+    return cmd
+
+def encoder_args(output_path: str, settings: EncoderSettings) -> List[str]:
+    """
+    ffmpeg output options (codec, rate control, container flags) for settings.
+
+    Args:
+        output_path: Output file (its extension decides container flags)
+        settings: Encoder settings
+
+    Returns:
+        List[str]: ffmpeg arguments to place before the output path
+    """
+    cmd = ['-c:v', settings.codec]
+    if settings.pixel_format:
+        cmd += ['-pix_fmt', settings.pixel_format]
+    cmd += ['-threads', str(settings.threads)]
+
+    if settings.codec.startswith('libvpx'):
+        deadline, cpu_used = VPX_SPEED.get(settings.preset, ('good', 3))
+        cmd += ['-crf', str(settings.crf), '-b:v', '0',
+                '-deadline', deadline, '-cpu-used', str(cpu_used), '-row-mt', '1']
+    else:
+        cmd += ['-preset', settings.preset, '-crf', str(settings.crf)]
+        if settings.codec == 'libx265' and output_path.lower().endswith(FASTSTART_CONTAINERS):
+            # Plays in Safari/QuickTime only with the hvc1 tag
+            cmd += ['-tag:v', 'hvc1']
+
+    if settings.faststart and output_path.lower().endswith(FASTSTART_CONTAINERS):
+        cmd += ['-movflags', '+faststart']
+
+    cmd += list(settings.extra_args)
+    return cmd
+
+class FFmpegWriter:
+    """
+    cv2.VideoWriter-compatible writer that pipes raw frames into ffmpeg.
+
+    Supports isOpened(), write(frame) and release(), so it is a drop-in
+    replacement wherever the processors used cv2.VideoWriter.
+    """
+
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int],
+                 settings: Optional[EncoderSettings] = None):
+        """
+        Start the ffmpeg encoder process.
+
+        Args:
+            output_path: Output file
+            fps: Output frame rate
+            frame_size: (width, height) of the frames that will be written
+            settings: Encoder settings (defaults to EncoderSettings())
+        """
+        self.output_path = output_path
+        self.frame_size = frame_size
+        self.settings = settings or EncoderSettings()
+        self.frames_written = 0
+        self.failed = False
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            build_ffmpeg_command(output_path, fps, frame_size, self.settings),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr
+        )
+
+    def isOpened(self) -> bool:
+        return self.process.poll() is None and not self.failed
+
+    def write(self, frame: np.ndarray):
+        """Write one BGR frame (must match frame_size)."""
+        if self.failed:
+            return
+        height, width = frame.shape[:2]
+        if (width, height) != tuple(self.frame_size):
+            raise ValueError(f"Frame size {width}x{height} does not match writer size "
+                             f"{self.frame_size[0]}x{self.frame_size[1]}")
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+            self.frames_written += 1
+        except (BrokenPipeError, OSError):
+            self.failed = True
+
+    def release(self) -> bool:
+        """
+        Flush and close the encoder. Safe to call more than once.
+
+        Returns:
+            bool: True if ffmpeg exited cleanly
+        """
+        if self._stderr.closed:
+            # Already released
+            return not self.failed
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError):
+                self.failed = True
+        returncode = self.process.wait()
+        if returncode != 0:
+            self.failed = True
+            self._stderr.seek(0)
+            message = self._stderr.read().decode('utf-8', 'replace').strip()
+            print(f"FFmpeg encoder error ({self.output_path}): {message}")
+        self._stderr.close()
+        return not self.failed
+
+def create_video_writer(output_path: str, fps: float, frame_size: Tuple[int, int],
+                        settings: Optional[Union[EncoderSettings, str]] = None):
+    """
+    Open a video writer for output_path.
+
+    Uses an ffmpeg pipe with the given settings (or preset name) when ffmpeg
+    is installed, and falls back to OpenCV's mp4v writer otherwise.
+
+    Args:
+        output_path: Output file
+        fps: Output frame rate
+        frame_size: (width, height) of the frames
+        settings: EncoderSettings, a preset name, or None for OpenCV's writer
+
+    Returns:
+        FFmpegWriter or cv2.VideoWriter
+    """
+    if isinstance(settings, str):
+        settings = EncoderSettings.from_preset(settings)
+
+    if settings is not None and ffmpeg_available():
+        return FFmpegWriter(output_path, fps, frame_size, settings)
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_path, fourcc, fps, frame_size)
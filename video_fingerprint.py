@@ -0,0 +1,337 @@
+import json
+import os
+import threading
+from typing import List, Tuple, Optional, Dict, Any
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+
+# Bit counts of every byte value, for popcount on uint64 arrays
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Flat indices into a 9x9 DCT corner of the HASH_BITS lowest-frequency AC
+# coefficients, in zigzag order (by u + v, then u); index 0 would be DC
+_PHASH_COEFFICIENTS = np.array(sorted(range(81), key=lambda i: (i // 9 + i % 9, i // 9))[1:HASH_BITS + 1])
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each element of a uint64 array."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(values).astype(np.int64)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+def _bits_to_uint64(bits: np.ndarray) -> np.ndarray:
+    """Pack (..., 64) boolean arrays into uint64 values."""
+    packed = np.packbits(bits.astype(np.uint8), axis=-1, bitorder='little')
+    return packed.view(np.uint64).reshape(bits.shape[:-1])
+
+def phash_bits(gray: np.ndarray) -> np.ndarray:
+    """
+    64-bit perceptual hash bits of a grayscale image.
+
+    The image is reduced to 32x32 and transformed with a DCT; the 64
+    lowest-frequency coefficients after DC (zigzag order) are compared
+    with their median. DC only carries the mean brightness, so it is left
+    out of both the bits and the median.
+
+    Returns:
+        np.ndarray: (64,) boolean array
+    """
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:9, :9].ravel()[_PHASH_COEFFICIENTS]
+    return low > np.median(low)
+
+def dhash_bits(gray: np.ndarray) -> np.ndarray:
+    """
+    64-bit difference hash bits of a grayscale image (horizontal gradient signs).
+
+    Returns:
+        np.ndarray: (64,) boolean array
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+def compute_fingerprint(video_path: str, samples: int = 16,
+                        method: str = 'phash') -> Optional[Dict[str, Any]]:
+    """
+    Compute a perceptual fingerprint of a video from evenly sampled frames.
+
+    Args:
+        video_path: Path to the video
+        samples: Number of frames to sample across the clip
+        method: 'phash' or 'dhash'
+
+    Returns:
+        Dict with 'signature' (64-bit majority vote of the frame hashes) and
+        'frame_hashes' (per-sample uint64 hashes), or None if unreadable
+    """
+    hash_bits = phash_bits if method == 'phash' else dhash_bits
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count > 0:
+            targets = np.unique(np.linspace(0, frame_count - 1, samples).astype(int))
+        else:
+            targets = np.arange(samples)
+
+        bits = []
+        frame_index = 0
+        target_iter = iter(targets)
+        target = next(target_iter, None)
+        while target is not None:
+            if frame_index < target:
+                if not cap.grab():
+                    break
+                frame_index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            bits.append(hash_bits(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+            frame_index += 1
+            target = next(target_iter, None)
+    finally:
+        cap.release()
+
+    if not bits:
+        return None
+
+    bits = np.array(bits)
+    return {
+        'signature': int(_bits_to_uint64(bits.mean(axis=0) >= 0.5)),
+        'frame_hashes': _bits_to_uint64(bits).tolist(),
+        'method': method
+    }
+
+def _chunk_variants(radius: int) -> np.ndarray:
+    """XOR masks of all CHUNK_BITS-bit values with at most radius bits set."""
+    masks = np.arange(1 << CHUNK_BITS, dtype=np.uint32)
+    weights = np.array([bin(m).count('1') for m in range(1 << CHUNK_BITS)])
+    return masks[weights <= radius].astype(np.uint16)
+
+class FingerprintIndex:
+    """
+    Hamming-distance nearest-neighbour index over 64-bit signatures.
+
+    Uses multi-index hashing: each signature is split into four 16-bit
+    chunks, and each chunk position keeps a sorted key array. Two signatures
+    within distance r must agree to within r // 4 bits on at least one chunk,
+    so a query only probes the chunk values within that radius (via
+    searchsorted) and verifies the candidates with a vectorized popcount.
+    New entries collect in a small pending buffer that is scanned directly
+    and merged into the sorted arrays once it grows past merge_threshold.
+    """
+
+    def __init__(self, merge_threshold: int = 4096):
+        self.merge_threshold = merge_threshold
+        self.ids: List[str] = []
+        self.signatures = np.empty(0, dtype=np.uint64)
+        self._sorted_keys: List[np.ndarray] = [np.empty(0, dtype=np.uint16)] * CHUNKS
+        self._sorted_order: List[np.ndarray] = [np.empty(0, dtype=np.int64)] * CHUNKS
+        self._pending: List[int] = []
+        self._variants: Dict[int, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, item_id: str, signature: int):
+        """Add a signature to the index."""
+        with self._lock:
+            self.ids.append(item_id)
+            self._pending.append(signature)
+            if len(self._pending) >= self.merge_threshold:
+                self._merge()
+
+    def add_many(self, item_ids: List[str], signatures: np.ndarray):
+        """Bulk-add signatures (merged into the sorted arrays at once)."""
+        with self._lock:
+            self._merge()
+            self.ids.extend(item_ids)
+            self.signatures = np.concatenate([self.signatures, np.asarray(signatures, dtype=np.uint64)])
+            self._rebuild()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        self.signatures = np.concatenate([self.signatures, np.array(self._pending, dtype=np.uint64)])
+        self._pending = []
+        self._rebuild()
+
+    def _rebuild(self):
+        for chunk in range(CHUNKS):
+            keys = ((self.signatures >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+            order = np.argsort(keys, kind='stable')
+            self._sorted_keys[chunk] = keys[order]
+            self._sorted_order[chunk] = order
+
+    def query(self, signature: int, max_distance: int = 10, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Find indexed signatures within a Hamming distance.
+
+        Args:
+            signature: 64-bit query signature
+            max_distance: Maximum Hamming distance (0-64)
+            limit: Maximum number of results
+
+        Returns:
+            List of (id, distance), nearest first
+        """
+        with self._lock:
+            signature = np.uint64(signature)
+            radius = max_distance // CHUNKS
+            variants = self._variants.get(radius)
+            if variants is None:
+                variants = self._variants[radius] = _chunk_variants(radius)
+
+            candidates = []
+            for chunk in range(CHUNKS):
+                keys = self._sorted_keys[chunk]
+                if not len(keys):
+                    break
+                value = np.uint16((int(signature) >> (chunk * CHUNK_BITS)) & 0xFFFF)
+                probes = variants ^ value
+                lo = np.searchsorted(keys, probes, side='left')
+                lengths = np.searchsorted(keys, probes, side='right') - lo
+                total = int(lengths.sum())
+                if total:
+                    # Expand the [lo, lo + length) ranges into one position array
+                    starts = np.repeat(lo - (np.cumsum(lengths) - lengths), lengths)
+                    candidates.append(self._sorted_order[chunk][starts + np.arange(total)])
+
+            results = []
+            if candidates:
+                # Verify first: deduplicating the few survivors is far cheaper
+                # than running np.unique over every candidate
+                indices = np.concatenate(candidates)
+                distances = popcount64(self.signatures[indices] ^ signature)
+                keep = distances <= max_distance
+                results.extend(dict(zip(indices[keep].tolist(), distances[keep].tolist())).items())
+
+            if self._pending:
+                pending = np.array(self._pending, dtype=np.uint64)
+                distances = popcount64(pending ^ signature)
+                offset = len(self.signatures)
+                for i in np.nonzero(distances <= max_distance)[0]:
+                    results.append((offset + int(i), int(distances[i])))
+
+            results.sort(key=lambda item: item[1])
+            if limit is not None:
+                results = results[:limit]
+            return [(self.ids[index], distance) for index, distance in results]
+
+    def save(self, path: str):
+        """Save the index to an .npz file."""
+        with self._lock:
+            self._merge()
+            with open(path, 'wb') as f:
+                np.savez(f, ids=np.array(self.ids, dtype=str), signatures=self.signatures)
+
+    @classmethod
+    def load(cls, path: str, merge_threshold: int = 4096) -> 'FingerprintIndex':
+        """Load an index saved with save()."""
+        index = cls(merge_threshold)
+        if os.path.exists(path):
+            data = np.load(path)
+            index.ids = data['ids'].tolist()
+            index.signatures = data['signatures'].astype(np.uint64)
+            index._rebuild()
+        return index
+
+class NearDuplicateDetector:
+    """
+    Flags visually near-identical videos as they are added.
+
+    Keeps a FingerprintIndex of video signatures plus the per-frame hashes
+    (in a JSON sidecar) for a finer check of signature matches.
+    """
+
+    def __init__(self, index_path: Optional[str] = None, max_distance: int = 10,
+                 frame_distance: int = 12, samples: int = 16):
+        """
+        Args:
+            index_path: .npz file to persist the index to (in memory only if None)
+            max_distance: Signature Hamming distance treated as a near duplicate
+            frame_distance: Mean per-frame hash distance a match must also meet
+            samples: Frames sampled per video
+        """
+        self.index_path = index_path
+        self.max_distance = max_distance
+        self.frame_distance = frame_distance
+        self.samples = samples
+        self.index = FingerprintIndex.load(index_path) if index_path else FingerprintIndex()
+        self.frame_hashes: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+        if index_path and os.path.exists(self._frames_path):
+            with open(self._frames_path, 'r') as f:
+                self.frame_hashes = json.load(f)
+
+    @property
+    def _frames_path(self) -> str:
+        return os.path.splitext(self.index_path)[0] + '_frames.json'
+
+    def _frame_distance(self, a: List[int], b: List[int]) -> float:
+        count = min(len(a), len(b))
+        if not count:
+            return float(HASH_BITS)
+        xa = np.array(a[:count], dtype=np.uint64)
+        xb = np.array(b[:count], dtype=np.uint64)
+        return float(popcount64(xa ^ xb).mean())
+
+    def find_duplicates(self, video_path: str,
+                        fingerprint: Optional[Dict[str, Any]] = None) -> List[Tuple[str, int]]:
+        """
+        Find indexed videos that look like video_path.
+
+        Args:
+            video_path: Path to the video
+            fingerprint: Precomputed fingerprint (computed if None)
+
+        Returns:
+            List of (video_id, signature distance), nearest first
+        """
+        fingerprint = fingerprint or compute_fingerprint(video_path, self.samples)
+        if fingerprint is None:
+            return []
+        matches = self.index.query(fingerprint['signature'], self.max_distance)
+        return [(video_id, distance) for video_id, distance in matches
+                if video_id not in self.frame_hashes
+                or self._frame_distance(fingerprint['frame_hashes'],
+                                        self.frame_hashes[video_id]) <= self.frame_distance]
+
+    def add_video(self, video_id: str, video_path: str) -> List[Tuple[str, int]]:
+        """
+        Fingerprint a video, report its near duplicates, then index it.
+
+        Args:
+            video_id: Identifier to store (e.g. a job ID)
+            video_path: Path to the video
+
+        Returns:
+            List of (video_id, distance) for previously indexed near duplicates
+        """
+        fingerprint = compute_fingerprint(video_path, self.samples)
+        if fingerprint is None:
+            return []
+        with self._lock:
+            duplicates = self.find_duplicates(video_path, fingerprint)
+            self.index.add(video_id, fingerprint['signature'])
+            self.frame_hashes[video_id] = fingerprint['frame_hashes']
+        return duplicates
+
+    def save(self):
+        """Persist the index and frame hashes (no-op without index_path)."""
+        if not self.index_path:
+            return
+        with self._lock:
+            self.index.save(self.index_path)
+            with open(self._frames_path, 'w') as f:
+                json.dump(self.frame_hashes, f)
@@ -0,0 +1,325 @@
+import subprocess
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator, Tuple, Optional, Dict, Any
+
+import cv2
+import numpy as np
+
+from video_encoder import EncoderSettings, encoder_args
+
+FIT_MODES = ('pad', 'crop', 'stretch')
+FPS_MODES = ('duplicate', 'blend', 'motion')
+
+@dataclass
+class NormalizationProfile:
+    """Target geometry, frame rate, pixel format and audio format that clips are conformed to."""
+    width: int = 1280
+    height: int = 720
+    fps: float = 24.0
+    pixel_format: str = 'yuv420p'
+    fit: str = 'pad'  # pad (letterbox), crop (fill) or stretch
+    fps_mode: str = 'duplicate'  # duplicate/drop, blend or motion (optical-flow interpolation)
+    audio_sample_rate: int = 48000
+    audio_channels: int = 2
+    add_silence: bool = False  # give clips without audio a silent track, to join them with clips that have one
+
+    @classmethod
+    def from_preset(cls, name: str, **overrides) -> 'NormalizationProfile':
+        """
+        Build a profile from a named preset.
+
+        Args:
+            name: One of NORMALIZATION_PROFILES
+            **overrides: Fields to override on the preset
+
+        Returns:
+            NormalizationProfile
+        """
+        if name not in NORMALIZATION_PROFILES:
+            raise ValueError(f"Unknown normalization profile '{name}'. "
+                             f"Available: {', '.join(NORMALIZATION_PROFILES)}")
+        return replace(NORMALIZATION_PROFILES[name], **overrides)
+
+    def matches(self, info: Dict[str, Any]) -> bool:
+        """Whether probed video info already has this profile's size and frame rate."""
+        return (info.get('width') == self.width and info.get('height') == self.height
+                and abs((info.get('fps') or 0) - self.fps) < 0.01)
+
+NORMALIZATION_PROFILES = {
+    '480p24': NormalizationProfile(854, 480, 24.0),
+    '720p24': NormalizationProfile(1280, 720, 24.0),
+    '720p30': NormalizationProfile(1280, 720, 30.0),
+    '1080p24': NormalizationProfile(1920, 1080, 24.0),
+    '1080p30': NormalizationProfile(1920, 1080, 30.0),
+}
+
+def resolve_profile(profile) -> NormalizationProfile:
+    """Accept a NormalizationProfile or a preset name."""
+    if isinstance(profile, str):
+        return NormalizationProfile.from_preset(profile)
+    return profile
+
+def scale_interpolation(source_size: Tuple[int, int], target_size: Tuple[int, int]) -> int:
+    """INTER_AREA when shrinking, Lanczos when enlarging."""
+    if target_size[0] <= source_size[0] and target_size[1] <= source_size[1]:
+        return cv2.INTER_AREA
+    return cv2.INTER_LANCZOS4
+
+def fit_geometry(source_size: Tuple[int, int], profile: NormalizationProfile):
+    """
+    Work out how a source frame maps onto the profile's canvas.
+
+    Args:
+        source_size: (width, height) of the source
+        profile: Target profile
+
+    Returns:
+        Tuple of (scaled (width, height), (x, y) paste offset in the canvas,
+        (x, y) crop offset in the scaled frame)
+    """
+    width, height = source_size
+    if profile.fit == 'stretch':
+        return (profile.width, profile.height), (0, 0), (0, 0)
+
+    scale_x, scale_y = profile.width / width, profile.height / height
+    scale = min(scale_x, scale_y) if profile.fit == 'pad' else max(scale_x, scale_y)
+    scaled = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    if profile.fit == 'pad':
+        return scaled, ((profile.width - scaled[0]) // 2, (profile.height - scaled[1]) // 2), (0, 0)
+    return scaled, (0, 0), ((scaled[0] - profile.width) // 2, (scaled[1] - profile.height) // 2)
+
+def build_filter_chain(source_info: Dict[str, Any], profile: NormalizationProfile) -> str:
+    """
+    Build the ffmpeg -vf chain that conforms a clip to profile.
+
+    Args:
+        source_info: Probed source info (width, height, fps)
+        profile: Target profile
+
+    Returns:
+        str: ffmpeg filter graph
+    """
+    w, h = profile.width, profile.height
+    source_size = (source_info.get('width') or w, source_info.get('height') or h)
+    flags = 'area' if scale_interpolation(source_size, (w, h)) == cv2.INTER_AREA else 'lanczos'
+
+    if profile.fit == 'pad':
+        filters = [f'scale={w}:{h}:force_original_aspect_ratio=decrease:flags={flags}',
+                   f'pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:color=black']
+    elif profile.fit == 'crop':
+        filters = [f'scale={w}:{h}:force_original_aspect_ratio=increase:flags={flags}',
+                   f'crop={w}:{h}']
+    else:
+        filters = [f'scale={w}:{h}:flags={flags}']
+    filters.append('setsar=1')
+
+    source_fps = source_info.get('fps') or profile.fps
+    if abs(source_fps - profile.fps) >= 0.01:
+        if profile.fps_mode == 'motion':
+            filters.append(f'minterpolate=fps={profile.fps:g}:mi_mode=mci:mc_mode=aobmc:me_mode=bidir')
+        elif profile.fps_mode == 'blend':
+            filters.append(f'framerate=fps={profile.fps:g}')
+        else:
+            filters.append(f'fps={profile.fps:g}')
+
+    filters.append(f'format={profile.pixel_format}')
+    return ','.join(filters)
+
+def normalize_ffmpeg(input_path: str, output_path: str, source_info: Dict[str, Any],
+                     profile: NormalizationProfile,
+                     settings: Optional[EncoderSettings] = None) -> bool:
+    """
+    Conform a clip in a single ffmpeg pass (decode, filter and encode in C).
+
+    Audio, if present, is re-encoded to AAC at the profile's sample rate
+    and channel count alongside; with profile.add_silence, a clip probed
+    without audio gets a silent track instead.
+
+    Args:
+        input_path: Path to input video
+        output_path: Path to save the normalized video
+        source_info: Probed source info
+        profile: Target profile
+        settings: Encoder settings (the profile's pixel format wins)
+
+    Returns:
+        bool: Success status
+    """
+    settings = replace(settings or EncoderSettings(), pixel_format=profile.pixel_format)
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-i', input_path]
+    if profile.add_silence and 'audio_codec' in source_info and not source_info['audio_codec']:
+        cmd += ['-f', 'lavfi', '-i', f'anullsrc=r={profile.audio_sample_rate}:cl=stereo',
+                '-map', '0:v:0', '-map', '1:a', '-shortest']
+    else:
+        cmd += ['-map', '0:v:0', '-map', '0:a?']
+    cmd += [
+        '-vf', build_filter_chain(source_info, profile),
+        '-r', f'{profile.fps:g}',
+        '-c:a', 'aac', '-b:a', '192k',
+        '-ar', str(profile.audio_sample_rate), '-ac', str(profile.audio_channels),
+    ]
+    cmd += encoder_args(output_path, settings)
+    cmd.append(output_path)
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"FFmpeg normalization error ({input_path}): {result.stderr.strip()}")
+        return False
+    return True
+
+class FrameRateConverter:
+    """
+    Streaming frame-rate converter.
+
+    Output frame k sits at source position k * source_fps / target_fps and
+    is built from the two source frames around it:
+
+    - duplicate: the nearest source frame (repeats when raising the rate,
+      drops when lowering it)
+    - blend: a linear crossfade between the neighbours
+    - motion: both neighbours warped along Farneback optical flow (estimated
+      once per source pair on downscaled grayscale) and then blended
+
+    Only two source frames are held; output frames are written into a reused
+    buffer and are valid until the next one is produced.
+    """
+
+    def __init__(self, source_fps: float, target_fps: float,
+                 mode: str = 'duplicate', flow_width: int = 320):
+        """
+        Args:
+            source_fps: Frame rate of the incoming frames
+            target_fps: Frame rate to produce
+            mode: 'duplicate', 'blend' or 'motion'
+            flow_width: Width frames are downscaled to for flow estimation
+        """
+        if mode not in FPS_MODES:
+            raise ValueError(f"Unknown fps mode '{mode}'. Use one of: {', '.join(FPS_MODES)}")
+        self.step = source_fps / target_fps
+        self.mode = mode
+        self.flow_width = flow_width
+        self._frames = None
+        self._out = None
+        self._flow = None
+        self._grid = None
+
+    def _interpolate(self, a: np.ndarray, b: np.ndarray, weight: float) -> np.ndarray:
+        if self.mode == 'duplicate' or weight <= 1e-3 or weight >= 1 - 1e-3:
+            return a if weight < 0.5 else b
+        if self.mode == 'blend':
+            return cv2.addWeighted(a, 1.0 - weight, b, weight, 0, dst=self._out)
+
+        if self._flow is None:
+            height, width = a.shape[:2]
+            size = (self.flow_width, max(2, int(round(height * self.flow_width / width))))
+            small_a = cv2.cvtColor(cv2.resize(a, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            small_b = cv2.cvtColor(cv2.resize(b, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            flow = cv2.calcOpticalFlowFarneback(small_a, small_b, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            self._flow = cv2.resize(flow, (width, height), interpolation=cv2.INTER_LINEAR) * (width / size[0])
+            if self._grid is None:
+                self._grid = np.meshgrid(np.arange(width, dtype=np.float32),
+                                         np.arange(height, dtype=np.float32))
+
+        grid_x, grid_y = self._grid
+        flow_x, flow_y = self._flow[..., 0], self._flow[..., 1]
+        warped_a = cv2.remap(a, grid_x - weight * flow_x, grid_y - weight * flow_y,
+                             cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        warped_b = cv2.remap(b, grid_x + (1.0 - weight) * flow_x, grid_y + (1.0 - weight) * flow_y,
+                             cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        return cv2.addWeighted(warped_a, 1.0 - weight, warped_b, weight, 0, dst=self._out)
+
+    def convert(self, frames: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Convert a stream of frames to the target rate.
+
+        Args:
+            frames: Source frames (may be reused buffers; they are copied)
+
+        Yields:
+            np.ndarray: Output frames (reused buffers)
+        """
+        position = 0.0  # source position of the next output frame
+        index = -1  # source index of the newest buffered frame
+        for frame in frames:
+            if self._frames is None:
+                self._frames = [np.empty_like(frame), np.empty_like(frame)]
+                self._out = np.empty_like(frame)
+            index += 1
+            np.copyto(self._frames[index % 2], frame)
+            self._flow = None
+            if index == 0:
+                continue
+
+            a, b = self._frames[(index - 1) % 2], self._frames[index % 2]
+            while position < index:
+                yield self._interpolate(a, b, position - (index - 1))
+                position += self.step
+
+        # The last source frame covers [index, index + 1)
+        while index >= 0 and position < index + 1:
+            yield self._frames[index % 2]
+            position += self.step
+
+def normalize_opencv(input_path: str, writer, profile: NormalizationProfile) -> int:
+    """
+    Conform a clip with OpenCV: resize into a reused canvas, then convert
+    the frame rate, writing each output frame to writer.
+
+    Frames are resized once per source frame, before frame-rate conversion,
+    so duplicated or interpolated frames never hit the scaler again.
+
+    Args:
+        input_path: Path to input video
+        writer: Open writer (cv2.VideoWriter or FFmpegWriter) at profile size and fps
+        profile: Target profile
+
+    Returns:
+        int: Number of frames written (0 if the input could not be read)
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        return 0
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or profile.fps
+    source_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if not source_size[0] or not source_size[1]:
+        cap.release()
+        return 0
+
+    scaled, paste, crop = fit_geometry(source_size, profile)
+    interpolation = scale_interpolation(source_size, scaled)
+    canvas = np.zeros((profile.height, profile.width, 3), dtype=np.uint8)
+    paste_view = canvas[paste[1]:paste[1] + scaled[1], paste[0]:paste[0] + scaled[0]]
+    scaled_buf = None
+    if profile.fit == 'crop' and scaled != (profile.width, profile.height):
+        scaled_buf = np.empty((scaled[1], scaled[0], 3), dtype=np.uint8)
+
+    def conformed_frames():
+        decode_buf = None
+        while True:
+            ret, frame = cap.read(image=decode_buf) if decode_buf is not None else cap.read()
+            if not ret:
+                break
+            decode_buf = frame
+            if scaled_buf is not None:
+                cv2.resize(frame, scaled, dst=scaled_buf, interpolation=interpolation)
+                np.copyto(canvas, scaled_buf[crop[1]:crop[1] + profile.height,
+                                             crop[0]:crop[0] + profile.width])
+            elif frame.shape[1::-1] == scaled:
+                np.copyto(paste_view, frame)
+            else:
+                cv2.resize(frame, scaled, dst=paste_view, interpolation=interpolation)
+            yield canvas
+
+    written = 0
+    try:
+        if abs(source_fps - profile.fps) < 0.01:
+            frames = conformed_frames()
+        else:
+            frames = FrameRateConverter(source_fps, profile.fps, profile.fps_mode).convert(conformed_frames())
+        for frame in frames:
+            writer.write(frame)
+            written += 1
+    finally:
+        cap.release()
+    return written
@@ -0,0 +1,510 @@
+import json
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.3gp')
+# Boxes we descend into on the way to the video track's sample table
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+def _iter_boxes(data: bytes, offset: int = 0, end: Optional[int] = None):
+    """Yield (type, payload_start, payload_end) for the ISO-BMFF boxes in data[offset:end]."""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, min(offset + size, end)
+        offset += size
+
+def _read_moov(path: str) -> Optional[bytes]:
+    """Read the moov box of an MP4/MOV file, seeking over mdat and other top-level boxes."""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 8:
+                return None
+            size, box_type = struct.unpack_from('>I4s', header)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack_from('>Q', header, 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - offset
+            if size < header_size:
+                return None
+            if box_type == b'moov':
+                f.seek(offset + header_size)
+                return f.read(size - header_size)
+            offset += size
+    return None
+
+# chroma_format_idc of avcC/hvcC -> ffmpeg pixel format name (8-bit)
+CHROMA_FORMATS = {0: 'gray', 1: 'yuv420p', 2: 'yuv422p', 3: 'yuv444p'}
+# H.264 profiles whose avcC carries the chroma format and bit depth
+AVC_HIGH_PROFILES = {100, 110, 122, 144, 244, 44, 83, 86, 118, 128, 134, 135, 138, 139}
+
+def _pixel_format(box_type: bytes, config: bytes) -> Optional[str]:
+    """Pixel format named in an avcC or hvcC decoder configuration (None if unknown)."""
+    try:
+        if box_type == b'hvcC':
+            chroma, depth = config[16] & 3, 8 + (config[17] & 7)
+        elif box_type == b'avcC':
+            if config[1] not in AVC_HIGH_PROFILES:
+                # Baseline/Main/Extended are always 8-bit 4:2:0
+                chroma, depth = 1, 8
+            else:
+                # Skip the SPS and PPS lists to the high-profile extension
+                offset = 6
+                for count_mask in (0x1f, 0xff):
+                    count = config[offset - 1] & count_mask
+                    for _ in range(count):
+                        offset += 2 + struct.unpack_from('>H', config, offset)[0]
+                    offset += 1
+                chroma, depth = config[offset - 1] & 3, 8 + (config[offset] & 7)
+        else:
+            return None
+    except (IndexError, struct.error):
+        return None
+    return CHROMA_FORMATS[chroma] + (f'{depth}le' if depth > 8 else '')
+
+def _parse_track(moov: bytes, start: int, end: int) -> Dict[str, Any]:
+    """Collect header fields of one trak box (handler b'vide', b'soun', ...)."""
+    track: Dict[str, Any] = {}
+
+    def walk(offset, limit):
+        for box_type, payload, box_end in _iter_boxes(moov, offset, limit):
+            if box_type in MP4_CONTAINER_BOXES:
+                walk(payload, box_end)
+            elif box_type == b'tkhd':
+                # Width/height are 16.16 fixed point at the end of tkhd
+                width, height = struct.unpack_from('>II', moov, box_end - 8)
+                track['width'], track['height'] = width >> 16, height >> 16
+            elif box_type == b'mdhd':
+                if moov[payload] == 1:
+                    timescale, duration = struct.unpack_from('>IQ', moov, payload + 20)
+                else:
+                    timescale, duration = struct.unpack_from('>II', moov, payload + 12)
+                track['timescale'], track['media_duration'] = timescale, duration
+            elif box_type == b'hdlr':
+                # The media handler (mdia) comes first; QuickTime adds a data handler in minf
+                track.setdefault('handler', moov[payload + 8:payload + 12])
+            elif box_type == b'stsd':
+                entry_count = struct.unpack_from('>I', moov, payload + 4)[0]
+                if entry_count:
+                    entry = payload + 8
+                    entry_end = min(entry + struct.unpack_from('>I', moov, entry)[0], box_end)
+                    track['codec'] = moov[entry + 4:entry + 8].decode('ascii', 'replace')
+                    if track.get('handler') == b'soun':
+                        # AudioSampleEntry: channel count, then 16.16 sample rate
+                        track['channels'] = struct.unpack_from('>H', moov, entry + 24)[0]
+                        track['sample_rate'] = struct.unpack_from('>I', moov, entry + 32)[0] >> 16
+                    else:
+                        # VisualSampleEntry: 86 fixed bytes, then avcC/hvcC/... boxes
+                        for config_type, config, config_end in _iter_boxes(moov, entry + 86, entry_end):
+                            pixel_format = _pixel_format(config_type, moov[config:config_end])
+                            if pixel_format:
+                                track['pixel_format'] = pixel_format
+            elif box_type == b'stts':
+                entry_count = struct.unpack_from('>I', moov, payload + 4)[0]
+                frames = ticks = 0
+                for i in range(entry_count):
+                    count, delta = struct.unpack_from('>II', moov, payload + 8 + i * 8)
+                    frames += count
+                    ticks += count * delta
+                track['frame_count'], track['sample_ticks'] = frames, ticks
+
+    walk(start, end)
+    return track
+
+def probe_mp4(path: str) -> Dict[str, Any]:
+    """
+    Read video properties straight from MP4/MOV container headers.
+
+    Only the moov box is read; sample data is never touched.
+
+    Args:
+        path: Path to an MP4/MOV file
+
+    Returns:
+        Dict with video information, or {} if no usable video track was found
+    """
+    moov = _read_moov(path)
+    if not moov:
+        return {}
+
+    video = audio = None
+    for box_type, payload, box_end in _iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        track = _parse_track(moov, payload, box_end)
+        if track.get('handler') == b'soun':
+            audio = audio or track
+        elif (video is None and track.get('handler') == b'vide'
+              and track.get('frame_count') and track.get('timescale')):
+            video = track
+    if video is None:
+        return {}
+
+    duration = video['media_duration'] / video['timescale']
+    ticks = video['sample_ticks'] or video['media_duration']
+    fps = video['frame_count'] * video['timescale'] / ticks if ticks else 0.0
+    return {
+        'width': video.get('width', 0),
+        'height': video.get('height', 0),
+        'fps': round(fps, 3),
+        'frame_count': video['frame_count'],
+        'duration': duration,
+        'codec': video.get('codec', ''),
+        'pixel_format': video.get('pixel_format'),
+        'audio_codec': audio.get('codec', '') if audio else '',
+        'audio_sample_rate': audio.get('sample_rate', 0) if audio else 0,
+        'audio_channels': audio.get('channels', 0) if audio else 0,
+        'file_size': os.path.getsize(path),
+        'probe': 'mp4'
+    }
+
+def _parse_sample_times(moov: bytes, start: int, end: int) -> Optional[Dict[str, Any]]:
+    """Collect the sample timing tables of one trak box; None unless it is a video track."""
+    tables: Dict[str, Any] = {'media_time': 0}
+
+    def table(payload, fields):
+        entry_count = struct.unpack_from('>I', moov, payload + 4)[0]
+        return np.frombuffer(moov, dtype='>u4', count=entry_count * fields,
+                             offset=payload + 8).reshape(-1, fields)
+
+    def walk(offset, limit):
+        for box_type, payload, box_end in _iter_boxes(moov, offset, limit):
+            if box_type in MP4_CONTAINER_BOXES or box_type == b'edts':
+                walk(payload, box_end)
+            elif box_type == b'hdlr':
+                tables.setdefault('handler', moov[payload + 8:payload + 12])
+            elif box_type == b'mdhd':
+                offset_ = payload + 20 if moov[payload] == 1 else payload + 12
+                tables['timescale'] = struct.unpack_from('>I', moov, offset_)[0]
+            elif box_type == b'elst':
+                # First non-empty edit: media_time is where presentation starts
+                version = moov[payload]
+                entry_count = struct.unpack_from('>I', moov, payload + 4)[0]
+                entry = payload + 8
+                for _ in range(entry_count):
+                    if version == 1:
+                        media_time = struct.unpack_from('>q', moov, entry + 8)[0]
+                        entry += 20
+                    else:
+                        media_time = struct.unpack_from('>i', moov, entry + 4)[0]
+                        entry += 12
+                    if media_time >= 0:
+                        tables['media_time'] = media_time
+                        break
+            elif box_type == b'stts':
+                tables['stts'] = table(payload, 2)
+            elif box_type == b'ctts':
+                tables['ctts'] = table(payload, 2)
+            elif box_type == b'stss':
+                entry_count = struct.unpack_from('>I', moov, payload + 4)[0]
+                tables['stss'] = np.frombuffer(moov, dtype='>u4', count=entry_count, offset=payload + 8)
+
+    walk(start, end)
+    return tables if tables.get('handler') == b'vide' else None
+
+def probe_keyframes_mp4(path: str) -> List[float]:
+    """
+    Read keyframe (sync sample) presentation times from MP4/MOV sample tables.
+
+    Decode times come from stts, composition offsets from ctts and the
+    presentation start from the edit list, so the times match what a player
+    (and ffmpeg's -ss) sees.
+
+    Args:
+        path: Path to an MP4/MOV file
+
+    Returns:
+        Sorted keyframe times in seconds ([] if no video track was found)
+    """
+    moov = _read_moov(path)
+    if not moov:
+        return []
+
+    for box_type, payload, box_end in _iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        tables = _parse_sample_times(moov, payload, box_end)
+        if not tables or 'stts' not in tables or not tables.get('timescale'):
+            continue
+
+        stts = tables['stts'].astype(np.int64)
+        deltas = np.repeat(stts[:, 1], stts[:, 0])
+        pts = np.concatenate([[0], np.cumsum(deltas)[:-1]]) if len(deltas) else deltas
+        if 'ctts' in tables:
+            ctts = tables['ctts']
+            # Version 1 offsets are signed; reading both versions as int32 covers either
+            offsets = np.repeat(ctts[:, 1].astype(np.uint32).view(np.int32).astype(np.int64),
+                                ctts[:, 0].astype(np.int64))
+            pts = pts + offsets[:len(pts)] if len(offsets) >= len(pts) else pts
+        pts = pts - tables['media_time']
+
+        # Without an stss box every sample is a sync sample
+        sync = tables['stss'].astype(np.int64) - 1 if 'stss' in tables else np.arange(len(pts))
+        sync = sync[(sync >= 0) & (sync < len(pts))]
+        return sorted(max(0.0, t) for t in (pts[sync] / tables['timescale']).tolist())
+    return []
+
+def probe_keyframes_ffprobe(path: str) -> List[float]:
+    """
+    Read keyframe times from ffprobe's packet flags (no decoding).
+
+    Args:
+        path: Path to a video file
+
+    Returns:
+        Sorted keyframe times in seconds ([] if ffprobe is unavailable or fails)
+    """
+    if shutil.which('ffprobe') is None:
+        return []
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return []
+
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            times.append(float(pts_time))
+    return sorted(times)
+
+def probe_ffprobe(path: str) -> Dict[str, Any]:
+    """
+    Read video properties with ffprobe's JSON output.
+
+    Args:
+        path: Path to a video file
+
+    Returns:
+        Dict with video information, or {} if ffprobe is unavailable or fails
+    """
+    if shutil.which('ffprobe') is None:
+        return {}
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'stream=codec_type,width,height,codec_name,pix_fmt,avg_frame_rate,r_frame_rate,'
+                         'nb_frames,duration,sample_rate,channels:format=duration',
+        '-of', 'json',
+        path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {}
+
+    data = json.loads(result.stdout or '{}')
+    streams = data.get('streams') or []
+    videos = [stream for stream in streams if stream.get('codec_type') == 'video']
+    if not videos:
+        return {}
+    stream = videos[0]
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), {})
+
+    fps = 0.0
+    for key in ('avg_frame_rate', 'r_frame_rate'):
+        rate = stream.get(key, '0/0')
+        if rate and not rate.endswith('/0'):
+            fps = float(Fraction(rate))
+            if fps:
+                break
+
+    duration = float(stream.get('duration') or data.get('format', {}).get('duration') or 0.0)
+    frame_count = int(stream.get('nb_frames') or round(duration * fps))
+    return {
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'fps': round(fps, 3),
+        'frame_count': frame_count,
+        'duration': duration,
+        'codec': stream.get('codec_name', ''),
+        'pixel_format': stream.get('pix_fmt'),
+        'audio_codec': audio.get('codec_name', ''),
+        'audio_sample_rate': int(audio.get('sample_rate') or 0),
+        'audio_channels': int(audio.get('channels') or 0),
+        'file_size': os.path.getsize(path),
+        'probe': 'ffprobe'
+    }
+
+def probe_opencv(path: str) -> Dict[str, Any]:
+    """
+    Read video properties by opening a cv2.VideoCapture (slowest fallback).
+
+    Args:
+        path: Path to a video file
+
+    Returns:
+        Dict with video information, or {} if the file cannot be opened
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return {}
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        return {
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': fps,
+            'frame_count': frame_count,
+            'duration': frame_count / fps if fps > 0 else 0.0,
+            'codec': ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00'),
+            'file_size': os.path.getsize(path),
+            'probe': 'opencv'
+        }
+    finally:
+        cap.release()
+
+class VideoProbe:
+    """
+    Memoized video metadata probe.
+
+    Tries MP4 box parsing first (for MP4/MOV files), then ffprobe, then
+    OpenCV. Results are cached per absolute path and invalidated when the
+    file's mtime or size changes.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        """
+        Args:
+            max_workers: Thread count for probe_many
+        """
+        self.max_workers = max_workers
+        self._cache: Dict[str, tuple] = {}
+        self._keyframes: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def probe(self, path: str) -> Dict[str, Any]:
+        """
+        Get metadata for one video.
+
+        Args:
+            path: Path to video file
+
+        Returns:
+            Dict with video information ({} if unreadable)
+        """
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return {}
+
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return dict(cached[2])
+
+        info = {}
+        backends = [probe_ffprobe, probe_opencv]
+        if key.lower().endswith(MP4_EXTENSIONS):
+            backends.insert(0, probe_mp4)
+        for backend in backends:
+            try:
+                info = backend(key)
+            except Exception as e:
+                print(f"Error probing {path} with {backend.__name__}: {e}")
+                info = {}
+            if info:
+                break
+
+        if info:
+            with self._lock:
+                self._cache[key] = (stat.st_mtime_ns, stat.st_size, info)
+        return dict(info)
+
+    def keyframes(self, path: str) -> List[float]:
+        """
+        Get the keyframe times of one video (memoized like probe()).
+
+        Args:
+            path: Path to video file
+
+        Returns:
+            Sorted keyframe times in seconds ([] if they cannot be read)
+        """
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return []
+
+        with self._lock:
+            cached = self._keyframes.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return list(cached[2])
+
+        times = []
+        backends = [probe_keyframes_ffprobe]
+        if key.lower().endswith(MP4_EXTENSIONS):
+            backends.insert(0, probe_keyframes_mp4)
+        for backend in backends:
+            try:
+                times = backend(key)
+            except Exception as e:
+                print(f"Error reading keyframes of {path} with {backend.__name__}: {e}")
+                times = []
+            if times:
+                break
+
+        if times:
+            with self._lock:
+                self._keyframes[key] = (stat.st_mtime_ns, stat.st_size, times)
+        return list(times)
+
+    def probe_many(self, paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Probe many videos in parallel.
+
+        Args:
+            paths: Paths to video files
+
+        Returns:
+            Dict mapping each path to its info
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self.probe, paths)
+            return dict(zip(paths, results))
+
+    def invalidate(self, path: Optional[str] = None):
+        """Drop cached metadata for one path, or for all paths if None."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+                self._keyframes.clear()
+            else:
+                self._cache.pop(os.path.abspath(path), None)
+                self._keyframes.pop(os.path.abspath(path), None)
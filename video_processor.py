@@ -1,19 +1,268 @@
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
 import os
 import json
-from typing import List, Tuple, Optional, Dict, Any
-import subprocess
+import functools
+import hashlib
+import inspect
+from typing import Callable, List, Tuple, Optional, Dict, Any, Union
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from montage_engine import MontageEngine
+from overlay_compositor import Overlay, OverlayTimeline, TextOverlay
+from video_cache import VideoCache
+from video_encoder import EncoderSettings, create_video_writer, ffmpeg_available
+from video_normalizer import NormalizationProfile, normalize_ffmpeg, normalize_opencv, resolve_profile
+from video_splicer import concat_copy, streams_compatible, trim_keyframes, trim_spliced
+from video_probe import VideoProbe
+from thumbnail_extractor import ThumbnailExtractor
+from media_store import MediaStore
+from frame_cache import FrameCache
+from video_stabilizer import VideoStabilizer
+from audio_mixer import AudioMixer, MusicSettings
+
+# PIL's ImageFilter.SMOOTH kernel, used as the blur reference for sharpness
+SMOOTH_KERNEL = np.array([[1, 1, 1],
+                          [1, 5, 1],
+                          [1, 1, 1]], dtype=np.float32) / 13.0
+
+class FrameBufferPool:
+    """
+    Preallocated, reusable frame buffers for per-frame processing loops.
+
+    Buffers are keyed by name and reallocated only when the requested shape
+    or dtype changes, so decode, conversion and compositing steps can write
+    into the same memory on every iteration instead of allocating new arrays.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8,
+            zero: bool = False) -> np.ndarray:
+        """
+        Get a named buffer of the given shape, allocating it on first use.
+
+        Args:
+            name: Buffer name (one buffer per name)
+            shape: Required array shape
+            dtype: Required array dtype
+            zero: Allocate with zeros instead of uninitialized memory
+
+        Returns:
+            np.ndarray: The pooled buffer
+        """
+        shape = tuple(shape)
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != np.dtype(dtype):
+            buf = np.zeros(shape, dtype=dtype) if zero else np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def read(self, cap: cv2.VideoCapture, name: str = 'frame') -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Decode the next frame of a capture into a pooled buffer.
+
+        Args:
+            cap: Open video capture
+            name: Buffer name to decode into
+
+        Returns:
+            Tuple of (success, frame); frame aliases the pooled buffer
+        """
+        buf = self._buffers.get(name)
+        ret, frame = cap.read(image=buf) if buf is not None else cap.read()
+        if ret and frame is not buf:
+            # First read or the stream changed shape; adopt the decoder's array
+            self._buffers[name] = frame
+        return ret, frame
+
+    def clear(self):
+        """Release all pooled buffers."""
+        self._buffers.clear()
+
+    @property
+    def nbytes(self) -> int:
+        """Total bytes held by the pool."""
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+def cached_output(input_args: Tuple[str, ...] = ('input_path',),
+                  key_params: Optional[Callable[[Any, Dict[str, Any]], Dict[str, Any]]] = None):
+    """
+    Serve a VideoProcessor method's output from its VideoCache.
+    
+    The decorated method must take an ``output_path`` argument and return a
+    success bool. Arguments named in input_args are the input files (str or
+    list of str) the output depends on; every other argument, plus the output
+    container extension and the processor's encoder settings, is treated as
+    an operation parameter.
+    
+    Args:
+        input_args: Names of the arguments holding input file paths
+        key_params: Called as key_params(processor, params) with the bound
+            arguments; returns extra parameters for the key, for processor
+            state the output depends on (e.g. the stabilizer's settings)
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+        
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+            
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            params.pop('self')
+            output_path = params.pop('output_path')
+            params['output_format'] = os.path.splitext(output_path)[1].lower()
+            params['encoder'] = getattr(self, 'encoder_settings', None)
+            if key_params is not None:
+                params.update(key_params(self, params))
+            
+            input_paths = []
+            for name in input_args:
+                value = params.pop(name)
+                input_paths.extend(value if isinstance(value, (list, tuple)) else [value])
+            
+            try:
+                key = cache.make_key(method.__name__, input_paths, params)
+            except OSError:
+                # Unreadable input; let the method report the failure
+                return method(self, *args, **kwargs)
+            
+            cached_path = cache.get(key)
+            if cached_path:
+                cache.materialize(cached_path, output_path)
+                self._register_output(output_path)
+                print(f"Cache hit for {method.__name__}: {output_path}")
+                return True
+            
+            success = method(self, *args, **kwargs)
+            if success and os.path.exists(output_path):
+                cache.put(key, output_path, method.__name__)
+            return success
+        
+        return wrapper
+    return decorator
+
+def _stabilizer_params(processor, params: Dict[str, Any]) -> Dict[str, Any]:
+    """The stabilizer's settings, when the enhancement asks for stabilization."""
+    if not (params.get('enhancement_settings') or {}).get('stabilize', False):
+        return {}
+    return {'stabilizer': processor.stabilizer.output_params()}
 
 class VideoProcessor:
     """Advanced video processing utilities for AI-generated videos."""
     
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = 2 * 1024 ** 3, enable_cache: bool = True,
+                 encoder: Optional[Union[EncoderSettings, str]] = 'balanced',
+                 media_store: Optional[MediaStore] = None,
+                 frame_cache: Optional[FrameCache] = None,
+                 stabilizer: Optional[VideoStabilizer] = None,
+                 audio_mixer: Optional[AudioMixer] = None):
+        """
+        Initialize the video processor.
+        
+        Args:
+            cache_dir: Directory for the persistent output cache; defaults to a
+                cache inside the processor's temp dir, removed by cleanup_temp_files
+            cache_max_bytes: Disk budget for cached outputs
+            enable_cache: Set to False to always re-render
+            encoder: EncoderSettings or preset name ('preview', 'balanced',
+                'final', 'hevc', 'webm') for ffmpeg output; None for OpenCV's mp4v writer
+            media_store: Content-addressed store that rendered outputs are
+                ingested into, so identical outputs share one file
+            frame_cache: Decoded-frame cache; when set, each source clip is
+                decoded once and later passes read memory-mapped frames
+            stabilizer: VideoStabilizer used when enhancement settings ask
+                for 'stabilize' (a default one is created if None)
+            audio_mixer: AudioMixer for background music; defaults to one
+                caching decoded tracks in the processor's temp dir
+        """
         self.supported_formats = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
         self.temp_dir = tempfile.mkdtemp()
+        self.probe = VideoProbe()
+        self.media_store = media_store
+        self.frame_cache = frame_cache
+        self.stabilizer = stabilizer or VideoStabilizer()
+        self.audio_mixer = audio_mixer or AudioMixer(os.path.join(self.temp_dir, 'audio'),
+                                                     probe=self.probe)
+        self.set_encoder(encoder)
+        self.cache = None
+        if enable_cache:
+            self.cache = VideoCache(cache_dir or os.path.join(self.temp_dir, 'cache'),
+                                    max_bytes=cache_max_bytes)
+    
+    def set_encoder(self, encoder: Optional[Union[EncoderSettings, str]]):
+        """
+        Choose how processed videos are encoded.
+        
+        Args:
+            encoder: EncoderSettings, a preset name, or None for OpenCV's mp4v writer
+        """
+        if isinstance(encoder, str):
+            encoder = EncoderSettings.from_preset(encoder)
+        self.encoder_settings = encoder
+    
+    def _capture(self, input_path: str):
+        """Open a clip for reading, through the frame cache if one is configured."""
+        if self.frame_cache is not None:
+            return self.frame_cache.capture(input_path)
+        return cv2.VideoCapture(input_path)
+    
+    def read_frame(self, input_path: str, frame_index: int) -> Optional[np.ndarray]:
+        """
+        Fetch a single frame by index.
+        
+        With a frame cache this is a slice of the memory-mapped clip;
+        otherwise the clip is opened and seeked.
+        
+        Args:
+            input_path: Path to input video
+            frame_index: Zero-based frame number
+        
+        Returns:
+            BGR frame (read-only when served from the cache), or None if out of range
+        """
+        if self.frame_cache is not None:
+            cached = self.frame_cache.load(input_path)
+            if cached is not None:
+                return cached[frame_index] if 0 <= frame_index < len(cached) else None
+        
+        cap = cv2.VideoCapture(input_path)
+        try:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
     
+    def _open_writer(self, output_path: str, fps: float, frame_size: Tuple[int, int]):
+        """Open a writer for output_path using the processor's encoder settings."""
+        # Unlink first so an output hardlinked into the cache or media store is never overwritten in place
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        return create_video_writer(output_path, fps, frame_size, self.encoder_settings)
+    
+    def _close_writer(self, out, output_path: str) -> bool:
+        """Release a writer and register its output; False if the ffmpeg encoder failed."""
+        if out.release() is False:
+            return False
+        self._register_output(output_path)
+        return True
+    
+    def _register_output(self, output_path: str):
+        """Ingest a finished output into the media store, if one is configured."""
+        if self.media_store is not None and os.path.exists(output_path):
+            self.media_store.ingest(output_path)
+    
+    @cached_output(key_params=_stabilizer_params)
     def enhance_video_quality(self, input_path: str, output_path: str, 
                             enhancement_settings: Dict[str, Any] = None) -> bool:
         """
@@ -38,7 +287,7 @@ class VideoProcessor:
             }
         
         try:
-            cap = cv2.VideoCapture(input_path)
+            cap = self._capture(input_path)
             if not cap.isOpened():
                 return False
             
@@ -47,48 +296,35 @@ class VideoProcessor:
             width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
+            # Stabilization pass 1: motion estimate -> per-frame warp matrices
+            matrices = None
+            if enhancement_settings.get('stabilize', False):
+                matrices = self.stabilizer.plan(input_path, (width, height), self._capture)
+            
             # Setup video writer
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            out = self._open_writer(output_path, fps, (width, height))
             
+            pool = FrameBufferPool()
             frame_count = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Convert to PIL for enhancement
-                pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                
-                # Apply enhancements
-                if enhancement_settings.get('brightness', 1.0) != 1.0:
-                    enhancer = ImageEnhance.Brightness(pil_image)
-                    pil_image = enhancer.enhance(enhancement_settings['brightness'])
-                
-                if enhancement_settings.get('contrast', 1.0) != 1.0:
-                    enhancer = ImageEnhance.Contrast(pil_image)
-                    pil_image = enhancer.enhance(enhancement_settings['contrast'])
-                
-                if enhancement_settings.get('saturation', 1.0) != 1.0:
-                    enhancer = ImageEnhance.Color(pil_image)
-                    pil_image = enhancer.enhance(enhancement_settings['saturation'])
-                
-                if enhancement_settings.get('sharpness', 1.0) != 1.0:
-                    enhancer = ImageEnhance.Sharpness(pil_image)
-                    pil_image = enhancer.enhance(enhancement_settings['sharpness'])
-                
-                # Apply denoising
-                if enhancement_settings.get('denoise', False):
-                    pil_image = pil_image.filter(ImageFilter.MedianFilter(size=3))
-                
-                # Convert back to OpenCV format
-                enhanced_frame = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-                
-                out.write(enhanced_frame)
-                frame_count += 1
-            
-            cap.release()
-            out.release()
+            try:
+                while True:
+                    ret, frame = pool.read(cap)
+                    if not ret:
+                        break
+                    
+                    if matrices is not None and frame_count < len(matrices):
+                        frame = self.stabilizer.warp(frame, matrices[frame_count],
+                                                     dst=pool.get('stabilized', frame.shape))
+                    
+                    enhanced_frame = self._enhance_frame(frame, enhancement_settings, pool)
+                    
+                    out.write(enhanced_frame)
+                    frame_count += 1
+            finally:
+                cap.release()
+                encoded = self._close_writer(out, output_path)
+            if not encoded:
+                return False
             
             print(f"Enhanced video saved: {output_path} ({frame_count} frames processed)")
             return True
@@ -97,93 +333,95 @@ class VideoProcessor:
             print(f"Error enhancing video: {e}")
             return False
     
+    def _enhance_frame(self, frame: np.ndarray, settings: Dict[str, Any],
+                       pool: FrameBufferPool) -> np.ndarray:
+        """
+        Apply enhancement settings to a BGR frame using pooled buffers.
+        
+        Mirrors PIL's ImageEnhance blends (brightness, contrast, color,
+        sharpness) and a 3x3 median denoise, but works in place on the
+        decoded frame so no per-frame arrays are allocated.
+        
+        Args:
+            frame: BGR frame, modified in place
+            settings: Enhancement parameters
+            pool: Buffer pool for intermediate images
+        
+        Returns:
+            np.ndarray: The enhanced frame (a pooled buffer)
+        """
+        height, width = frame.shape[:2]
+        
+        brightness = settings.get('brightness', 1.0)
+        if brightness != 1.0:
+            cv2.addWeighted(frame, brightness, frame, 0.0, 0.0, dst=frame)
+        
+        contrast = settings.get('contrast', 1.0)
+        if contrast != 1.0:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY,
+                                dst=pool.get('gray', (height, width)))
+            mean = int(cv2.mean(gray)[0] + 0.5)
+            cv2.addWeighted(frame, contrast, frame, 0.0, mean * (1.0 - contrast), dst=frame)
+        
+        saturation = settings.get('saturation', 1.0)
+        if saturation != 1.0:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY,
+                                dst=pool.get('gray', (height, width)))
+            gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR,
+                                    dst=pool.get('gray_bgr', frame.shape))
+            cv2.addWeighted(frame, saturation, gray_bgr, 1.0 - saturation, 0.0, dst=frame)
+        
+        sharpness = settings.get('sharpness', 1.0)
+        if sharpness != 1.0:
+            smooth = cv2.filter2D(frame, -1, SMOOTH_KERNEL,
+                                  dst=pool.get('smooth', frame.shape),
+                                  borderType=cv2.BORDER_REPLICATE)
+            cv2.addWeighted(frame, sharpness, smooth, 1.0 - sharpness, 0.0, dst=frame)
+        
+        if settings.get('denoise', False):
+            frame = cv2.medianBlur(frame, 3, dst=pool.get('denoised', frame.shape))
+        
+        return frame
+    
+    @cached_output(input_args=('video_paths',))
     def create_video_montage(self, video_paths: List[str], output_path: str,
                            grid_size: Tuple[int, int] = (2, 2),
                            transition_duration: float = 0.5) -> bool:
         """
         Create a montage/grid of multiple videos.
         
+        Inputs are decoded in parallel and synchronized by timestamp, so clips
+        with different frame rates play at their native speed. If there are
+        more videos than grid cells, each cell plays its videos in turn.
+        
         Args:
             video_paths: List of paths to input videos
             output_path: Path to save montage video
             grid_size: (rows, cols) for the grid layout
-            transition_duration: Duration of transitions between videos
+            transition_duration: Duration of crossfades between videos sharing a cell
         
         Returns:
             bool: Success status
         """
+        engine = MontageEngine(video_paths, grid_size,
+                               cell_size=(640, 360),  # Standard cell size
+                               transition_duration=transition_duration,
+                               video_info=self.get_video_info_many(video_paths))
         try:
-            if len(video_paths) > grid_size[0] * grid_size[1]:
-                print(f"Too many videos for grid size {grid_size}")
-                return False
-            
-            # Open all video captures
-            caps = []
-            video_info = []
-            
-            for path in video_paths:
-                cap = cv2.VideoCapture(path)
-                if not cap.isOpened():
-                    print(f"Could not open video: {path}")
-                    continue
-                
-                caps.append(cap)
-                video_info.append({
-                    'fps': int(cap.get(cv2.CAP_PROP_FPS)),
-                    'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                    'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-                    'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                })
-            
-            if not caps:
+            if not engine.open():
                 return False
             
-            # Calculate output dimensions
-            cell_width = 640  # Standard cell size
-            cell_height = 360
-            output_width = grid_size[1] * cell_width
-            output_height = grid_size[0] * cell_height
-            
-            # Use the highest FPS
-            output_fps = max(info['fps'] for info in video_info)
-            
             # Setup output video
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, output_fps, (output_width, output_height))
+            out = self._open_writer(output_path, engine.fps, engine.frame_size)
             
-            # Find the shortest video duration
-            min_frames = min(info['frame_count'] for info in video_info)
+            try:
+                for montage_frame in engine.frames():
+                    out.write(montage_frame)
+            finally:
+                encoded = self._close_writer(out, output_path)
             
-            for frame_idx in range(min_frames):
-                # Create the montage frame
-                montage_frame = np.zeros((output_height, output_width, 3), dtype=np.uint8)
-                
-                for i, cap in enumerate(caps):
-                    ret, frame = cap.read()
-                    if not ret:
-                        continue
-                    
-                    # Calculate grid position
-                    row = i // grid_size[1]
-                    col = i % grid_size[1]
-                    
-                    # Resize frame to cell size
-                    resized_frame = cv2.resize(frame, (cell_width, cell_height))
-                    
-                    # Place in montage
-                    y_start = row * cell_height
-                    y_end = y_start + cell_height
-                    x_start = col * cell_width
-                    x_end = x_start + cell_width
-                    
-                    montage_frame[y_start:y_end, x_start:x_end] = resized_frame
-                
-                out.write(montage_frame)
-            
-            # Cleanup
-            for cap in caps:
-                cap.release()
-            out.release()
+            if not encoded:
+                return False
             
             print(f"Video montage created: {output_path}")
             return True
@@ -191,6 +429,9 @@ class VideoProcessor:
         except Exception as e:
             print(f"Error creating video montage: {e}")
             return False
+        
+        finally:
+            engine.close()
     
     def add_text_overlay(self, input_path: str, output_path: str,
                         text: str, position: Tuple[int, int] = (50, 50),
@@ -208,52 +449,69 @@ class VideoProcessor:
             color: RGB color of the text
             duration: Duration to show text (None for entire video)
         
+        Returns:
+            bool: Success status
+        """
+        overlay = TextOverlay(text=text, position=position, font_scale=font_scale,
+                              color=color, start=0.0, end=duration or None)
+        return self.burn_overlays(input_path, output_path, [overlay])
+    
+    def burn_overlays(self, input_path: str, output_path: str,
+                      overlays: List[Overlay]) -> bool:
+        """
+        Burn a timeline of text and image overlays into a video in one pass.
+        
+        Each overlay is rasterized once into a sprite (TrueType fonts, shadows
+        and image watermarks included); per frame only the regions of active
+        overlays are alpha-blended.
+        
+        Args:
+            input_path: Path to input video
+            output_path: Path to save video with overlays
+            overlays: TextOverlay/ImageOverlay items with start/end times
+        
         Returns:
             bool: Success status
         """
         try:
-            cap = cv2.VideoCapture(input_path)
+            cap = self._capture(input_path)
             if not cap.isOpened():
                 return False
             
             # Get video properties
-            fps = int(cap.get(cv2.CAP_PROP_FPS))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
             width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             
-            # Calculate frames to show text
-            if duration:
-                text_frames = int(duration * fps)
-            else:
-                text_frames = total_frames
+            timeline = OverlayTimeline(overlays)
+            timeline.prepare(width, height)
             
             # Setup video writer
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            out = self._open_writer(output_path, fps, (width, height))
             
+            pool = FrameBufferPool()
             frame_count = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Add text overlay if within duration
-                if frame_count < text_frames:
-                    cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX,
-                              font_scale, color, 2, cv2.LINE_AA)
-                
-                out.write(frame)
-                frame_count += 1
-            
-            cap.release()
-            out.release()
+            try:
+                while True:
+                    ret, frame = pool.read(cap)
+                    if not ret:
+                        break
+                    
+                    timeline.composite(frame, frame_count / fps)
+                    
+                    out.write(frame)
+                    frame_count += 1
+            finally:
+                cap.release()
+                encoded = self._close_writer(out, output_path)
+            if not encoded:
+                return False
             
-            print(f"Text overlay added: {output_path}")
+            print(f"Overlays burned in: {output_path} ({len(timeline.sprites)} overlays, {frame_count} frames)")
             return True
             
         except Exception as e:
-            print(f"Error adding text overlay: {e}")
+            print(f"Error burning overlays: {e}")
             return False
     
     def extract_frames(self, input_path: str, output_dir: str,
@@ -273,7 +531,7 @@ class VideoProcessor:
         try:
             os.makedirs(output_dir, exist_ok=True)
             
-            cap = cv2.VideoCapture(input_path)
+            cap = self._capture(input_path)
             if not cap.isOpened():
                 return []
             
@@ -281,19 +539,26 @@ class VideoProcessor:
             frame_count = 0
             extracted_count = 0
             
+            pool = FrameBufferPool()
+            
             while extracted_count < max_frames:
-                ret, frame = cap.read()
+                if frame_count % frame_interval != 0:
+                    # Skipped frames only need to be grabbed, not converted
+                    if not cap.grab():
+                        break
+                    frame_count += 1
+                    continue
+                
+                ret, frame = pool.read(cap)
                 if not ret:
                     break
                 
-                if frame_count % frame_interval == 0:
-                    frame_filename = f"frame_{extracted_count:04d}.jpg"
-                    frame_path = os.path.join(output_dir, frame_filename)
-                    
-                    cv2.imwrite(frame_path, frame)
-                    frame_paths.append(frame_path)
-                    extracted_count += 1
+                frame_filename = f"frame_{extracted_count:04d}.jpg"
+                frame_path = os.path.join(output_dir, frame_filename)
                 
+                cv2.imwrite(frame_path, frame)
+                frame_paths.append(frame_path)
+                extracted_count += 1
                 frame_count += 1
             
             cap.release()
@@ -304,6 +569,49 @@ class VideoProcessor:
             print(f"Error extracting frames: {e}")
             return []
     
+    def extract_keyframes(self, input_path: str, output_dir: str,
+                          **extractor_options) -> Dict[str, Any]:
+        """
+        Extract scene-change keyframe thumbnails and a preview strip.
+        
+        Args:
+            input_path: Path to input video
+            output_dir: Directory to save thumbnails and keyframes.json
+            **extractor_options: ThumbnailExtractor settings (thumb_width,
+                max_keyframes, scene_threshold, image_format, sprite_columns, ...)
+        
+        Returns:
+            Dict: Keyframe manifest (times, scores, paths, sprite)
+        """
+        try:
+            return ThumbnailExtractor(**extractor_options).extract(input_path, output_dir)
+        except Exception as e:
+            print(f"Error extracting keyframes: {e}")
+            return {'video': input_path, 'keyframes': [], 'sprite': None}
+    
+    def extract_keyframes_directory(self, input_dir: str, output_dir: str,
+                                    recursive: bool = False,
+                                    **extractor_options) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract keyframe thumbnails for every video in a directory in one call.
+        
+        Args:
+            input_dir: Directory containing videos
+            output_dir: Root directory; each video gets its own subdirectory
+            recursive: Also process subdirectories
+            **extractor_options: ThumbnailExtractor settings
+        
+        Returns:
+            Dict mapping each video path to its keyframe manifest
+        """
+        try:
+            return ThumbnailExtractor(**extractor_options).extract_directory(
+                input_dir, output_dir, recursive=recursive)
+        except Exception as e:
+            print(f"Error extracting keyframes: {e}")
+            return {}
+    
+    @cached_output()
     def create_timelapse(self, input_path: str, output_path: str,
                         speed_factor: float = 4.0) -> bool:
         """
@@ -318,7 +626,7 @@ class VideoProcessor:
             bool: Success status
         """
         try:
-            cap = cv2.VideoCapture(input_path)
+            cap = self._capture(input_path)
             if not cap.isOpened():
                 return False
             
@@ -332,23 +640,31 @@ class VideoProcessor:
             frame_skip = int(speed_factor)
             
             # Setup video writer
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, new_fps, (width, height))
+            out = self._open_writer(output_path, new_fps, (width, height))
             
+            pool = FrameBufferPool()
             frame_count = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Skip frames based on speed factor
-                if frame_count % frame_skip == 0:
+            try:
+                while True:
+                    # Skip frames based on speed factor; skipped frames are
+                    # grabbed without being retrieved into a new array
+                    if frame_count % frame_skip != 0:
+                        if not cap.grab():
+                            break
+                        frame_count += 1
+                        continue
+                    
+                    ret, frame = pool.read(cap)
+                    if not ret:
+                        break
+                    
                     out.write(frame)
-                
-                frame_count += 1
-            
-            cap.release()
-            out.release()
+                    frame_count += 1
+            finally:
+                cap.release()
+                encoded = self._close_writer(out, output_path)
+            if not encoded:
+                return False
             
             print(f"Timelapse created: {output_path} (speed: {speed_factor}x)")
             return True
@@ -357,50 +673,336 @@ class VideoProcessor:
             print(f"Error creating timelapse: {e}")
             return False
     
+    @cached_output()
+    def normalize_video(self, input_path: str, output_path: str,
+                        profile: Union[NormalizationProfile, str] = '720p24') -> bool:
+        """
+        Conform a video to a target resolution, frame rate and pixel format.
+        
+        Uses a single ffmpeg pass when ffmpeg is installed (area/Lanczos
+        scaling, fps/framerate/minterpolate for the frame rate), and an
+        OpenCV resize plus FrameRateConverter pipeline otherwise.
+        
+        Args:
+            input_path: Path to input video
+            output_path: Path to save the normalized video
+            profile: NormalizationProfile or preset name ('480p24', '720p24',
+                '720p30', '1080p24', '1080p30')
+        
+        Returns:
+            bool: Success status
+        """
+        try:
+            profile = resolve_profile(profile)
+            info = self.get_video_info(input_path)
+            if not info:
+                print(f"Could not read video: {input_path}")
+                return False
+            
+            if os.path.lexists(output_path):
+                os.remove(output_path)
+            if ffmpeg_available():
+                if not normalize_ffmpeg(input_path, output_path, info, profile, self.encoder_settings):
+                    return False
+                self._register_output(output_path)
+            else:
+                out = self._open_writer(output_path, profile.fps, (profile.width, profile.height))
+                try:
+                    written = normalize_opencv(input_path, out, profile)
+                finally:
+                    encoded = self._close_writer(out, output_path)
+                if not written or not encoded:
+                    return False
+            
+            print(f"Video normalized to {profile.width}x{profile.height}@{profile.fps:g}: {output_path}")
+            return True
+            
+        except Exception as e:
+            print(f"Error normalizing video: {e}")
+            return False
+    
+    def normalize_videos(self, video_paths: List[str],
+                         profile: Union[NormalizationProfile, str] = '720p24',
+                         output_dir: Optional[str] = None, max_workers: int = 2,
+                         reencode_matching: bool = False) -> List[Optional[str]]:
+        """
+        Conform many clips to one profile, e.g. before a montage or concatenation.
+        
+        Clips that already have the profile's size and frame rate are used
+        as-is; the rest are normalized in parallel. Results go through the
+        output cache, so the same clip is only ever conformed once per profile.
+        
+        Args:
+            video_paths: Paths to input videos
+            profile: NormalizationProfile or preset name
+            output_dir: Directory for normalized copies (defaults to the temp dir)
+            max_workers: Clips normalized concurrently
+            reencode_matching: Also re-encode clips that already match, so
+                every output shares the processor's encoder settings
+        
+        Returns:
+            List of paths to conformed clips, in input order (None for failures)
+        """
+        profile = resolve_profile(profile)
+        output_dir = output_dir or os.path.join(self.temp_dir, 'normalized')
+        os.makedirs(output_dir, exist_ok=True)
+        info = self.get_video_info_many(video_paths)
+        
+        def conform(path):
+            if not reencode_matching and profile.matches(info.get(path) or {}):
+                return path
+            tag = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:10]
+            name = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(
+                output_dir, f"{name}_{tag}_{profile.width}x{profile.height}_{profile.fps:g}.mp4")
+            return output_path if self.normalize_video(path, output_path, profile) else None
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(conform, video_paths))
+    
+    @cached_output(input_args=('video_paths',))
+    def concat_videos(self, video_paths: List[str], output_path: str,
+                      profile: Optional[Union[NormalizationProfile, str]] = None) -> bool:
+        """
+        Join clips end to end.
+        
+        Clips with the same codec, pixel format, size, frame rate and audio
+        layout (e.g. consecutive Runway segments) are joined with the ffmpeg
+        concat demuxer by stream copy, without re-encoding. Mismatched clips
+        are first conformed with normalize_videos (to profile, or to the first
+        clip's size and frame rate; silent clips get a silent track when
+        others have audio) and then joined the same way.
+        
+        Args:
+            video_paths: Clips to join, in order
+            output_path: Path to save the joined video
+            profile: Profile to conform mismatched clips to
+        
+        Returns:
+            bool: Success status
+        """
+        try:
+            if not video_paths:
+                print("No videos to concatenate")
+                return False
+            
+            if not ffmpeg_available():
+                return self._concat_opencv(video_paths, output_path, profile)
+            
+            infos = [self.get_video_info(path) for path in video_paths]
+            if not all(infos):
+                print("Could not read all input videos")
+                return False
+            
+            if profile is None and streams_compatible(infos):
+                sources = video_paths
+            else:
+                if profile is None:
+                    first = infos[0]
+                    profile = NormalizationProfile(first['width'], first['height'], first['fps'] or 24.0)
+                profile = resolve_profile(profile)
+                if any(info.get('audio_codec') for info in infos):
+                    # Silent clips get a silent track, so every clip has the same streams
+                    profile = replace(profile, add_silence=True)
+                sources = self.normalize_videos(video_paths, profile)
+                if None not in sources and not streams_compatible(self.get_video_info_many(sources).values()):
+                    # Clips that already matched the profile still differ in codec,
+                    # pixel format or audio
+                    sources = self.normalize_videos(video_paths, profile, reencode_matching=True)
+                if None in sources:
+                    return False
+            
+            if os.path.lexists(output_path):
+                os.remove(output_path)
+            if not concat_copy(sources, output_path, self.temp_dir):
+                return False
+            
+            self._register_output(output_path)
+            print(f"Concatenated {len(video_paths)} videos: {output_path}")
+            return True
+            
+        except Exception as e:
+            print(f"Error concatenating videos: {e}")
+            return False
+    
+    def _concat_opencv(self, video_paths: List[str], output_path: str,
+                       profile: Optional[Union[NormalizationProfile, str]] = None) -> bool:
+        """
+        Decode-and-re-encode fallback for concat_videos when ffmpeg is unavailable.
+        
+        Every clip is conformed with normalize_opencv (to profile, or to the
+        first clip's size and frame rate) into one shared writer, so clips
+        with another frame rate keep their duration.
+        """
+        if profile is None:
+            info = self.get_video_info(video_paths[0])
+            if not info:
+                print(f"Could not read video: {video_paths[0]}")
+                return False
+            profile = NormalizationProfile(info['width'], info['height'], info['fps'] or 24.0)
+        profile = resolve_profile(profile)
+        
+        out = self._open_writer(output_path, profile.fps, (profile.width, profile.height))
+        try:
+            for path in video_paths:
+                if not normalize_opencv(path, out, profile):
+                    print(f"Could not read video: {path}")
+                    return False
+        finally:
+            encoded = self._close_writer(out, output_path)
+        
+        if encoded:
+            print(f"Concatenated {len(video_paths)} videos: {output_path}")
+        return encoded
+    
+    @cached_output()
+    def trim_video(self, input_path: str, output_path: str, start: float = 0.0,
+                   end: Optional[float] = None, accurate: bool = True) -> bool:
+        """
+        Cut a time range out of a video.
+        
+        With accurate=False the cut is pure stream copy, snapped to the
+        keyframe at or before start (an end that is not on a keyframe may
+        run a few frames long). With accurate=True only the partial GOPs
+        at the two boundaries are re-encoded and the whole GOPs between them
+        are copied, so the cut is frame-exact at a fraction of a full re-encode.
+        
+        Args:
+            input_path: Path to input video
+            output_path: Path to save the trimmed video
+            start: Start time in seconds
+            end: End time in seconds (None for the end of the video)
+            accurate: Frame-accurate cut (re-encodes boundary GOPs)
+        
+        Returns:
+            bool: Success status
+        """
+        try:
+            info = self.get_video_info(input_path)
+            if not info:
+                print(f"Could not read video: {input_path}")
+                return False
+            
+            duration = info.get('duration') or 0.0
+            end = duration if end is None else min(end, duration or end)
+            if start < 0 or end <= start:
+                print(f"Invalid trim range {start}-{end} for {input_path}")
+                return False
+            
+            if not ffmpeg_available():
+                return self._trim_opencv(input_path, output_path, start, end)
+            
+            if os.path.lexists(output_path):
+                os.remove(output_path)
+            keyframes = self.probe.keyframes(input_path)
+            if accurate:
+                ok = trim_spliced(input_path, output_path, start, end, info,
+                                  keyframes, self.encoder_settings, self.temp_dir)
+            else:
+                ok = trim_keyframes(input_path, output_path, start, end, info, keyframes)
+            if not ok:
+                return False
+            
+            self._register_output(output_path)
+            print(f"Video trimmed ({start:g}s-{end:g}s): {output_path}")
+            return True
+            
+        except Exception as e:
+            print(f"Error trimming video: {e}")
+            return False
+    
+    def _trim_opencv(self, input_path: str, output_path: str, start: float, end: float) -> bool:
+        """Decode-and-re-encode fallback for trim_video when ffmpeg is unavailable."""
+        cap = self._capture(input_path)
+        if not cap.isOpened():
+            return False
+        
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 24.0
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            first, last = int(round(start * fps)), int(round(end * fps))
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+            
+            out = self._open_writer(output_path, fps, size)
+            pool = FrameBufferPool()
+            try:
+                for _ in range(last - first):
+                    ret, frame = pool.read(cap)
+                    if not ret:
+                        break
+                    out.write(frame)
+            finally:
+                encoded = self._close_writer(out, output_path)
+        finally:
+            cap.release()
+        
+        if encoded:
+            print(f"Video trimmed ({start:g}s-{end:g}s): {output_path}")
+        return encoded
+    
+    @cached_output(input_args=('video_path', 'audio_path'))
     def add_background_music(self, video_path: str, audio_path: str,
-                           output_path: str, audio_volume: float = 0.5) -> bool:
+                           output_path: str, audio_volume: float = 0.5,
+                           settings: Optional[MusicSettings] = None) -> bool:
         """
         Add background music to video using FFmpeg.
         
+        The video stream is copied; the music is decoded once per track into
+        the mixer's PCM cache, looped or trimmed to the video length, faded
+        and optionally mixed (and ducked) under the video's own audio.
+        
         Args:
             video_path: Path to input video
             audio_path: Path to audio file
             output_path: Path to save video with audio
-            audio_volume: Volume level for the audio (0.0 to 1.0)
+            audio_volume: Volume level for the audio (0.0 to 1.0), used when
+                settings is None
+            settings: MusicSettings (loop, fades, ducking, codec)
         
         Returns:
             bool: Success status
         """
         try:
-            # Use FFmpeg to combine video and audio
-            cmd = [
-                'ffmpeg', '-y',  # -y to overwrite output file
-                '-i', video_path,
-                '-i', audio_path,
-                '-c:v', 'copy',  # Copy video stream
-                '-c:a', 'aac',   # Encode audio as AAC
-                '-filter:a', f'volume={audio_volume}',
-                '-shortest',     # End when shortest input ends
-                output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"Background music added: {output_path}")
-                return True
-            else:
-                print(f"FFmpeg error: {result.stderr}")
+            settings = settings or MusicSettings(volume=audio_volume)
+            if os.path.lexists(output_path):
+                os.remove(output_path)
+            
+            if not self.audio_mixer.mix(video_path, audio_path, output_path, settings):
                 return False
+            
+            self._register_output(output_path)
+            print(f"Background music added: {output_path}")
+            return True
                 
         except Exception as e:
             print(f"Error adding background music: {e}")
             return False
     
+    def add_background_music_many(self, jobs: List[Tuple[str, str, str]],
+                                  settings: Optional[MusicSettings] = None) -> List[bool]:
+        """
+        Add background music to many videos concurrently.
+        
+        Runs on AudioMixer.mix_many (each distinct track decoded once up
+        front, mixes on a pool bounded by the mixer's max_workers), with
+        every job going through add_background_music and so the output cache.
+        
+        Args:
+            jobs: (video_path, audio_path, output_path) tuples
+            settings: MusicSettings shared by every job
+        
+        Returns:
+            List of success flags, in job order
+        """
+        return self.audio_mixer.mix_many(jobs, settings, mix=self.add_background_music)
+    
     def get_video_info(self, video_path: str) -> Dict[str, Any]:
         """
         Get comprehensive information about a video file.
         
+        Metadata is read from container headers (MP4 boxes or ffprobe, with
+        OpenCV as a fallback) and memoized until the file's mtime changes.
+        
         Args:
             video_path: Path to video file
         
@@ -408,31 +1010,43 @@ class VideoProcessor:
             Dict with video information
         """
         try:
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                return {}
-            
-            info = {
-                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-                'fps': cap.get(cv2.CAP_PROP_FPS),
-                'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-                'duration': cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS),
-                'codec': int(cap.get(cv2.CAP_PROP_FOURCC)),
-                'file_size': os.path.getsize(video_path) if os.path.exists(video_path) else 0
-            }
-            
-            cap.release()
-            return info
+            return self.probe.probe(video_path)
             
         except Exception as e:
             print(f"Error getting video info: {e}")
             return {}
     
+    def get_video_info_many(self, video_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get information about many video files, probing them in parallel.
+        
+        Args:
+            video_paths: Paths to video files
+        
+        Returns:
+            Dict mapping each path to its video information ({} if unreadable)
+        """
+        try:
+            return self.probe.probe_many(video_paths)
+            
+        except Exception as e:
+            print(f"Error getting video info: {e}")
+            return {path: {} for path in video_paths}
+    
     def cleanup_temp_files(self):
-        """Clean up temporary files created during processing."""
+        """
+        Clean up temporary files created during processing.
+        
+        The default (temp dir) output cache is emptied with them; a persistent
+        cache_dir is only trimmed to its budget.
+        """
         try:
             import shutil
+            if self.cache is not None:
+                if os.path.abspath(self.cache.cache_dir).startswith(os.path.abspath(self.temp_dir) + os.sep):
+                    self.cache.clear()
+                else:
+                    self.cache.evict()
             if os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir)
                 print("Temporary files cleaned up")
@@ -0,0 +1,298 @@
+import bisect
+import os
+import subprocess
+from dataclasses import replace
+from typing import Iterable, List, Tuple, Optional, Dict, Any
+
+from video_encoder import EncoderSettings, encoder_args
+
+# Source codecs whose boundary GOPs we can re-encode to splice with copied packets
+SPLICE_ENCODERS = {
+    'avc1': 'libx264', 'avc3': 'libx264', 'h264': 'libx264',
+    'hvc1': 'libx265', 'hev1': 'libx265', 'hevc': 'libx265',
+}
+
+# Per splice encoder: the bitstream filter that puts a copied piece's
+# parameter sets in-band, the option repeating the encoder's own before
+# every keyframe, and the MP4 sample entry for streams carrying them in-band
+IN_BAND_PARAMETERS = {
+    'libx264': ('h264_mp4toannexb', '-x264-params', 'avc3'),
+    'libx265': ('hevc_mp4toannexb', '-x265-params', 'hev1'),
+}
+
+def _run_ffmpeg(cmd: List[str], context: str) -> bool:
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"FFmpeg error ({context}): {result.stderr.strip()}")
+        return False
+    return True
+
+def _concat_list_entry(path: str) -> str:
+    # The concat demuxer list quotes with single quotes; escape any in the path
+    return "file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n"
+
+# Probed fields that must match for a stream-copy join; with -map 0 the concat
+# demuxer takes the stream layout (and codec parameters) from the first clip
+COPY_JOIN_FIELDS = ('codec', 'pixel_format', 'width', 'height',
+                    'audio_codec', 'audio_sample_rate', 'audio_channels')
+
+def streams_compatible(infos: Iterable[Dict[str, Any]]) -> bool:
+    """
+    Whether clips can be joined by stream copy (same codec, pixel format,
+    size and frame rate, and the same audio stream or lack of one).
+
+    Args:
+        infos: Probed info of each clip
+
+    Returns:
+        bool
+    """
+    infos = list(infos)
+    if not infos or not all(infos):
+        return False
+    first = infos[0]
+    return all(all(info.get(field) == first.get(field) for field in COPY_JOIN_FIELDS)
+               and abs((info.get('fps') or 0) - (first.get('fps') or 0)) < 0.01
+               for info in infos[1:])
+
+def concat_copy(video_paths: List[str], output_path: str, work_dir: str,
+                extra_args: Optional[List[str]] = None) -> bool:
+    """
+    Join clips with the ffmpeg concat demuxer without re-encoding.
+
+    Only packets are copied, so the cost is I/O. The clips must share
+    codec parameters (see streams_compatible).
+
+    Args:
+        video_paths: Clips to join, in order
+        output_path: Output file
+        work_dir: Directory for the concat list file
+        extra_args: Additional output options
+
+    Returns:
+        bool: Success status
+    """
+    # work_dir may be a processor temp dir that was cleaned up since
+    os.makedirs(work_dir, exist_ok=True)
+    list_path = os.path.join(work_dir, f"concat_{os.getpid()}_{id(video_paths)}.txt")
+    with open(list_path, 'w') as f:
+        f.writelines(_concat_list_entry(path) for path in video_paths)
+
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', list_path,
+           '-map', '0', '-c', 'copy']
+    if output_path.lower().endswith(('.mp4', '.m4v', '.mov')):
+        cmd += ['-movflags', '+faststart']
+    cmd += list(extra_args or [])
+    cmd.append(output_path)
+    try:
+        return _run_ffmpeg(cmd, 'concat')
+    finally:
+        os.remove(list_path)
+
+def copy_range(input_path: str, output_path: str, start: float,
+               duration: Optional[float] = None, frames: Optional[int] = None,
+               extra_args: Optional[List[str]] = None) -> bool:
+    """
+    Stream-copy a time range. ffmpeg starts at the keyframe at or before start.
+
+    Args:
+        input_path: Source clip
+        output_path: Output file
+        start: Start time in seconds
+        duration: Length in seconds (to the end if None)
+        frames: Exact number of video packets to copy. With B-frames, -t alone
+            also lets through the next GOP's leading packets (their decode
+            time precedes the cut), so whole-GOP copies pass the frame count.
+        extra_args: Additional output options
+
+    Returns:
+        bool: Success status
+    """
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{start:.6f}', '-i', input_path]
+    if duration is not None:
+        cmd += ['-t', f'{duration:.6f}']
+    if frames is not None:
+        cmd += ['-frames:v', str(frames)]
+    cmd += ['-map', '0:v:0', '-map', '0:a?', '-c', 'copy', '-avoid_negative_ts', 'make_zero']
+    cmd += list(extra_args or [])
+    cmd.append(output_path)
+    return _run_ffmpeg(cmd, f'copy {input_path}')
+
+def encode_range(input_path: str, output_path: str, start: float, duration: Optional[float],
+                 settings: EncoderSettings, extra_args: Optional[List[str]] = None) -> bool:
+    """
+    Re-encode a time range frame-accurately (input seek, then decode to start).
+
+    Args:
+        input_path: Source clip
+        output_path: Output file
+        start: Start time in seconds
+        duration: Length in seconds (to the end if None)
+        settings: Encoder settings for the video stream
+        extra_args: Additional output options
+
+    Returns:
+        bool: Success status
+    """
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{start:.6f}', '-i', input_path]
+    if duration is not None:
+        cmd += ['-t', f'{duration:.6f}']
+    cmd += ['-map', '0:v:0', '-map', '0:a?', '-c:a', 'aac', '-b:a', '192k']
+    cmd += encoder_args(output_path, settings)
+    cmd += list(extra_args or [])
+    cmd.append(output_path)
+    return _run_ffmpeg(cmd, f'encode {input_path}')
+
+def decoded_frames(path: str) -> Optional[int]:
+    """
+    Decode a clip's video stream end to end.
+
+    Args:
+        path: Clip to decode
+
+    Returns:
+        Number of decoded frames, or None if the decoder reported errors
+    """
+    cmd = ['ffmpeg', '-v', 'error', '-i', path, '-map', '0:v:0', '-f', 'framecrc', '-']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or result.stderr.strip():
+        return None
+    return sum(1 for line in result.stdout.splitlines() if line and not line.startswith('#'))
+
+def plan_trim(keyframes: List[float], start: float, end: float,
+              duration: float, tolerance: float) -> List[Tuple[str, float, Optional[float]]]:
+    """
+    Split a frame-accurate [start, end) cut into encoded and copied pieces.
+
+    The GOP fragment before the first keyframe inside the range and the one
+    after the last keyframe before end are re-encoded; everything between
+    whole keyframes is copied.
+
+    Args:
+        keyframes: Sorted keyframe times of the source
+        start: Cut start in seconds
+        end: Cut end in seconds
+        duration: Source duration in seconds
+        tolerance: Times closer than this count as equal (half a frame)
+
+    Returns:
+        List of ('encode' | 'copy', start, duration or None for "to the end")
+    """
+    first = bisect.bisect_left(keyframes, start - tolerance)
+    inner = [t for t in keyframes[first:] if t < end - tolerance]
+    to_end = end >= duration - tolerance
+    if not inner:
+        return [('encode', start, None if to_end else end - start)]
+
+    pieces = []
+    head, tail = inner[0], inner[-1]
+    if head - start > tolerance:
+        pieces.append(('encode', start, head - start))
+    if to_end:
+        pieces.append(('copy', head, None))
+    else:
+        if tail > head:
+            pieces.append(('copy', head, tail - head))
+        pieces.append(('encode', tail, end - tail))
+    return pieces
+
+def trim_keyframes(input_path: str, output_path: str, start: float, end: float,
+                   info: Dict[str, Any], keyframes: List[float]) -> bool:
+    """
+    Pure stream-copy trim, starting at the keyframe at or before start.
+
+    Args:
+        input_path: Source clip
+        output_path: Output file
+        start: Requested start in seconds (snapped back to a keyframe)
+        end: End time in seconds
+        info: Probed source info (fps, duration)
+        keyframes: Sorted keyframe times of the source
+
+    Returns:
+        bool: Success status
+    """
+    fps = info.get('fps') or 30.0
+    tolerance = 0.5 / fps
+    index = bisect.bisect_right(keyframes, start + tolerance) - 1
+    snapped = keyframes[index] if index >= 0 else start
+    if end >= (info.get('duration') or end) - tolerance:
+        return copy_range(input_path, output_path, snapped)
+
+    # Ending on a keyframe: cap by frame count so the next GOP's leading packets stay out
+    on_keyframe = any(abs(t - end) < tolerance for t in keyframes)
+    frames = int(round((end - snapped) * fps)) if on_keyframe else None
+    return copy_range(input_path, output_path, snapped, end - snapped, frames)
+
+def trim_spliced(input_path: str, output_path: str, start: float, end: float,
+                 info: Dict[str, Any], keyframes: List[float],
+                 settings: Optional[EncoderSettings], work_dir: str) -> bool:
+    """
+    Frame-accurate trim that only re-encodes the boundary GOPs.
+
+    Pieces are written to Matroska intermediates and joined by the concat
+    demuxer with stream copy. Boundary pieces are encoded with the source's
+    codec and pixel format so the decoder can continue across the splice
+    points. The container keeps only the first piece's codec configuration,
+    so every piece carries its parameter sets in-band (mp4toannexb on the
+    copies, repeated headers on the encodes; avc3/hev1 sample entries in
+    MP4). The joined file is then decoded end to end; if the decoder
+    reports errors or drops frames (e.g. open-GOP leading pictures that
+    referenced the cut-away GOP), the whole range is re-encoded instead.
+
+    Args:
+        input_path: Source clip
+        output_path: Output file
+        start: Cut start in seconds
+        end: Cut end in seconds
+        info: Probed source info (codec, fps, duration)
+        keyframes: Sorted keyframe times of the source
+        settings: Encoder settings to base the boundary re-encodes on
+        work_dir: Directory for the intermediate pieces
+
+    Returns:
+        bool: Success status
+    """
+    fps = info.get('fps') or 30.0
+    duration = info.get('duration') or end
+    encoder = SPLICE_ENCODERS.get(str(info.get('codec', '')).lower())
+    settings = settings or EncoderSettings()
+    pieces = plan_trim(keyframes, start, end, duration, 0.5 / fps)
+    length = None if end >= duration else end - start
+
+    if encoder is None or not keyframes or all(kind == 'encode' for kind, _, _ in pieces):
+        # Nothing to splice with (or no whole GOP in range): encode the range in one go
+        return encode_range(input_path, output_path, start, length, settings)
+
+    annexb_filter, params_option, sample_entry = IN_BAND_PARAMETERS[encoder]
+    piece_settings = replace(settings, codec=encoder, pixel_format='', faststart=False,
+                             extra_args=list(settings.extra_args) + [params_option, 'repeat-headers=1'])
+    concat_args = (['-tag:v', sample_entry]
+                   if output_path.lower().endswith(('.mp4', '.m4v', '.mov')) else [])
+    os.makedirs(work_dir, exist_ok=True)
+    piece_paths = []
+    try:
+        for i, (kind, piece_start, piece_length) in enumerate(pieces):
+            piece_path = os.path.join(work_dir, f"trim_{os.getpid()}_{id(pieces)}_{i}.mkv")
+            piece_paths.append(piece_path)
+            if kind == 'copy':
+                frames = None if piece_length is None else int(round(piece_length * fps))
+                ok = copy_range(input_path, piece_path, piece_start, piece_length, frames,
+                                ['-bsf:v', annexb_filter])
+            else:
+                ok = encode_range(input_path, piece_path, piece_start, piece_length, piece_settings)
+            if not ok:
+                return False
+        if not concat_copy(piece_paths, output_path, work_dir, concat_args):
+            return False
+    finally:
+        for piece_path in piece_paths:
+            if os.path.exists(piece_path):
+                os.remove(piece_path)
+
+    expected = int(round((min(end, duration) - start) * fps))
+    if decoded_frames(output_path) == expected:
+        return True
+    print(f"Spliced trim of {input_path} does not decode cleanly; re-encoding the range")
+    return encode_range(input_path, output_path, start, length, settings)
@@ -0,0 +1,243 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple, Optional
+
+import cv2
+import numpy as np
+
+def estimate_motion(input_path: str, start_frame: int = 0, end_frame: Optional[int] = None,
+                    analysis_width: int = 320, max_corners: int = 100,
+                    capture_factory: Callable = cv2.VideoCapture) -> np.ndarray:
+    """
+    Estimate frame-to-frame camera motion over a range of a clip.
+
+    Frames are downscaled and converted to grayscale before tracking, corners
+    are followed with pyramidal Lucas-Kanade flow (and only re-detected when
+    too many are lost), and a similarity transform
+    (translation plus rotation) is fitted to the matches with RANSAC. Only
+    the previous small frame and its corners are kept between iterations.
+
+    Args:
+        input_path: Path to input video
+        start_frame: First frame whose motion (relative to the previous frame)
+            is estimated; frame 0 always has zero motion
+        end_frame: Frame after the last one to estimate (to the end if None)
+        analysis_width: Width frames are downscaled to for tracking
+        max_corners: Maximum corners tracked per frame
+        capture_factory: Callable opening a capture for input_path
+
+    Returns:
+        np.ndarray: (frames, 3) float64 array of (dx, dy, angle) per frame, in
+        full-resolution pixels and radians
+    """
+    cap = capture_factory(input_path)
+    if not cap.isOpened():
+        return np.zeros((0, 3))
+
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if end_frame is None:
+            end_frame = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or np.iinfo(np.int32).max
+        scale = width / float(analysis_width)
+        size = (analysis_width, max(8, int(round(height / scale))))
+
+        # Start one frame early so the first transform of the segment has a reference
+        first = max(start_frame - 1, 0)
+        if first:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+        transforms = []
+        small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        prev_gray = np.empty_like(gray)
+        decode_buf = None
+        prev_points = None
+        have_prev = False
+
+        for frame_index in range(first, end_frame):
+            ret, frame = cap.read(image=decode_buf) if decode_buf is not None else cap.read()
+            if not ret:
+                break
+            decode_buf = frame
+            cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+
+            motion = (0.0, 0.0, 0.0)
+            points = None
+            if have_prev and prev_points is not None and len(prev_points) >= 4:
+                points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, prev_points, None,
+                                                             winSize=(15, 15), maxLevel=2)
+                tracked = status.ravel() == 1
+                points = points[tracked]
+                if len(points) >= 4:
+                    matrix, _ = cv2.estimateAffinePartial2D(prev_points[tracked], points,
+                                                            method=cv2.RANSAC)
+                    if matrix is not None:
+                        motion = (matrix[0, 2] * scale, matrix[1, 2] * scale,
+                                  np.arctan2(matrix[1, 0], matrix[0, 0]))
+            if frame_index >= start_frame:
+                transforms.append(motion)
+
+            prev_gray, gray = gray, prev_gray
+            # Keep following the surviving corners; detect afresh once half are lost
+            if points is None or len(points) < max_corners // 2:
+                points = cv2.goodFeaturesToTrack(prev_gray, max_corners, 0.01, 8, blockSize=3)
+            prev_points = points
+            have_prev = True
+    finally:
+        cap.release()
+
+    return np.array(transforms, dtype=np.float64).reshape(-1, 3)
+
+def smooth_trajectory(transforms: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Per-frame corrections that move the camera path onto its moving average.
+
+    Args:
+        transforms: (frames, 3) per-frame (dx, dy, angle)
+        radius: Averaging window half-width in frames
+
+    Returns:
+        np.ndarray: (frames, 3) correction of each frame (smoothed minus
+        cumulative trajectory)
+    """
+    if not len(transforms) or radius <= 0:
+        return np.zeros_like(transforms)
+    trajectory = np.cumsum(transforms, axis=0)
+    # Moving average as a difference of a padded cumulative sum (one pass, all axes)
+    padded = np.pad(trajectory, ((radius, radius), (0, 0)), mode='edge')
+    window = 2 * radius + 1
+    summed = np.cumsum(np.vstack([np.zeros((1, 3)), padded]), axis=0)
+    smoothed = (summed[window:] - summed[:-window]) / window
+    return smoothed - trajectory
+
+def correction_matrices(transforms: np.ndarray, frame_size: Tuple[int, int],
+                        zoom: float = 1.0) -> np.ndarray:
+    """
+    Build the warp matrix of every frame at once.
+
+    Each matrix applies a frame's correction (dx, dy, angle) and then scales by
+    zoom about the frame centre, so the borders uncovered by the correction fall
+    outside the output.
+
+    Args:
+        transforms: (frames, 3) per-frame corrections
+        frame_size: (width, height)
+        zoom: Scale applied about the centre (>= 1 crops the borders)
+
+    Returns:
+        np.ndarray: (frames, 2, 3) float64 affine matrices for cv2.warpAffine
+    """
+    width, height = frame_size
+    dx, dy, angle = transforms[:, 0], transforms[:, 1], transforms[:, 2]
+    cos = np.cos(angle) * zoom
+    sin = np.sin(angle) * zoom
+    cx, cy = width / 2.0, height / 2.0
+
+    matrices = np.empty((len(transforms), 2, 3))
+    matrices[:, 0, 0] = cos
+    matrices[:, 0, 1] = -sin
+    matrices[:, 1, 0] = sin
+    matrices[:, 1, 1] = cos
+    # Same convention as the estimate (rotation about the origin, then
+    # translation), followed by the zoom about the centre
+    matrices[:, 0, 2] = dx * zoom + cx * (1.0 - zoom)
+    matrices[:, 1, 2] = dy * zoom + cy * (1.0 - zoom)
+    return matrices
+
+class VideoStabilizer:
+    """
+    Two-pass video stabilization with bounded memory.
+
+    Pass 1 estimates inter-frame motion on downscaled grayscale frames; long
+    clips are split into segments that are tracked in parallel (each segment
+    re-reads the frame before it, so no transform is lost at the seams).
+    Only three floats per frame are kept. The cumulative trajectory is then
+    smoothed and turned into per-frame warp matrices in one vectorized step.
+    Pass 2 streams the frames again and warps each one into a reused buffer.
+    """
+
+    def __init__(self, smoothing_radius: int = 15, analysis_width: int = 320,
+                 max_corners: int = 100, zoom: float = 1.04,
+                 segment_frames: int = 300, max_workers: int = 4):
+        """
+        Args:
+            smoothing_radius: Trajectory averaging half-width in frames
+            analysis_width: Width frames are downscaled to for tracking
+            max_corners: Maximum corners tracked per frame
+            zoom: Crop zoom that hides the borders uncovered by the correction
+            segment_frames: Frames per motion-estimation segment
+            max_workers: Threads for segment estimation
+        """
+        self.smoothing_radius = smoothing_radius
+        self.analysis_width = analysis_width
+        self.max_corners = max_corners
+        self.zoom = zoom
+        self.segment_frames = segment_frames
+        self.max_workers = max_workers
+
+    def output_params(self) -> Dict[str, Any]:
+        """Settings that change the stabilized frames (segmenting and threads do not)."""
+        return {
+            'smoothing_radius': self.smoothing_radius,
+            'analysis_width': self.analysis_width,
+            'max_corners': self.max_corners,
+            'zoom': self.zoom
+        }
+
+    def estimate(self, input_path: str,
+                 capture_factory: Callable = cv2.VideoCapture) -> np.ndarray:
+        """
+        Estimate per-frame motion of a whole clip (pass 1).
+
+        Args:
+            input_path: Path to input video
+            capture_factory: Callable opening a capture for input_path
+
+        Returns:
+            np.ndarray: (frames, 3) per-frame (dx, dy, angle)
+        """
+        cap = capture_factory(input_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        cap.release()
+
+        if frame_count <= self.segment_frames or self.max_workers <= 1:
+            return estimate_motion(input_path, 0, None, self.analysis_width,
+                                   self.max_corners, capture_factory)
+
+        bounds = [(start, min(start + self.segment_frames, frame_count))
+                  for start in range(0, frame_count, self.segment_frames)]
+
+        def run(bound):
+            return estimate_motion(input_path, bound[0], bound[1], self.analysis_width,
+                                   self.max_corners, capture_factory)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            segments: List[np.ndarray] = list(executor.map(run, bounds))
+        return np.concatenate(segments) if segments else np.zeros((0, 3))
+
+    def matrices(self, transforms: np.ndarray, frame_size: Tuple[int, int]) -> np.ndarray:
+        """
+        Smooth the trajectory and build the per-frame warp matrices.
+
+        Args:
+            transforms: (frames, 3) output of estimate()
+            frame_size: (width, height)
+
+        Returns:
+            np.ndarray: (frames, 2, 3) affine matrices
+        """
+        corrections = smooth_trajectory(transforms, self.smoothing_radius)
+        return correction_matrices(corrections, frame_size, self.zoom)
+
+    def plan(self, input_path: str, frame_size: Tuple[int, int],
+             capture_factory: Callable = cv2.VideoCapture) -> np.ndarray:
+        """Run pass 1 and return the warp matrices for pass 2."""
+        return self.matrices(self.estimate(input_path, capture_factory), frame_size)
+
+    @staticmethod
+    def warp(frame: np.ndarray, matrix: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Apply one frame's correction, writing into dst when given."""
+        height, width = frame.shape[:2]
+        return cv2.warpAffine(frame, matrix, (width, height), dst=dst,
+                              flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)